@@ -0,0 +1,2 @@
+# Performance benchmarks for the API services.
+# Run from the repository root, e.g.: python -m api.benchmarks.bench_prediction_service --help
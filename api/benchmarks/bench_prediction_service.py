@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from ..services import prediction_service
+
+# Benchmark suite for the prediction service hot path.
+#
+# Each dataset size runs in its own interpreter so peak RSS is measured per size.
+# MongoDB is replaced by a synthetic `waste_readings` collection (mocked get_collection),
+# so runs are reproducible and need no database. Results are written as JSON; pass
+# --compare to print the change against a previous results file.
+#
+#   python -m api.benchmarks.bench_prediction_service --rows 10000 1000000 10000000 --output bench.json
+#   python -m api.benchmarks.bench_prediction_service --rows 10000 --compare bench.json
+
+DEFAULT_ROWS = [10_000, 1_000_000, 10_000_000]
+GENERATOR_CHUNK_ROWS = 100_000
+SYNTHETIC_START = datetime(2023, 1, 1)
+
+class SyntheticReadingsCollection:
+    """
+    Stand-in for the waste_readings collection producing deterministic synthetic readings.
+    Fill levels follow a daily/weekly pattern plus noise; one reading per bin every 15 minutes.
+    Supports the subset of find() the prediction service uses (projection, $gt on reading_timestamp).
+    """
+    def __init__(self, n_rows: int, n_bins: int = 500, seed: int = 42):
+        self.n_rows = n_rows
+        self.n_bins = n_bins
+        self.seed = seed
+
+    def _chunks(self) -> Iterator[Dict[str, np.ndarray]]:
+        rng = np.random.default_rng(self.seed)
+        for start in range(0, self.n_rows, GENERATOR_CHUNK_ROWS):
+            index = np.arange(start, min(start + GENERATOR_CHUNK_ROWS, self.n_rows))
+            minutes = (index // self.n_bins) * 15
+            timestamps = np.datetime64(SYNTHETIC_START, "ms") + minutes.astype("timedelta64[m]")
+            hour = (minutes // 60) % 24
+            day = (minutes // 1440) % 7
+            fill = 20 + 2.5 * hour + 4 * day + rng.normal(0, 8, len(index))
+            yield {
+                "bin_id": index % self.n_bins,
+                "reading_timestamp": timestamps,
+                "fill_level_percent": np.clip(fill, 0, 100),
+            }
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, int]] = None, batch_size: Optional[int] = None):
+        after = (query or {}).get("reading_timestamp", {}).get("$gt")
+        after = np.datetime64(after, "ms") if after is not None else None
+        fields = [name for name, include in (projection or {}).items() if include and name != "_id"] or [
+            "bin_id", "reading_timestamp", "fill_level_percent"]
+        for chunk in self._chunks():
+            if after is not None:
+                mask = chunk["reading_timestamp"] > after
+                chunk = {name: column[mask] for name, column in chunk.items()}
+            # Decode like pymongo would: plain Python values per document
+            decoded = {}
+            for name in fields:
+                if name == "reading_timestamp":
+                    decoded[name] = chunk[name].astype("datetime64[us]").tolist() # datetime objects
+                elif name == "bin_id":
+                    decoded[name] = [f"GH-ACC-BIN-{bin_number:04d}" for bin_number in chunk[name].tolist()]
+                else:
+                    decoded[name] = chunk[name].tolist()
+            for row in zip(*decoded.values()):
+                yield dict(zip(fields, row))
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+def _latency_summary(samples: List[float]) -> Dict[str, float]:
+    samples_ms = sorted(sample * 1000 for sample in samples)
+    return {
+        "p50_ms": round(statistics.median(samples_ms), 4),
+        "p95_ms": round(samples_ms[int(0.95 * (len(samples_ms) - 1))], 4),
+        "mean_ms": round(statistics.fmean(samples_ms), 4),
+    }
+
+def run_single_size(n_rows: int, latency_iterations: int = 200, batch_size: int = 5000) -> Dict[str, Any]:
+    """Runs all measurements for one dataset size in the current process and returns the results."""
+    collection = SyntheticReadingsCollection(n_rows)
+    prediction_service.get_collection = lambda name: collection # Mocked database access
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        prediction_service.MODEL_DIR = model_dir
+        prediction_service.MODEL_PATH = os.path.join(model_dir, "waste_predictor_bench.joblib")
+        rss_before_mb = _peak_rss_mb()
+
+        df, fetch_seconds = _timed(prediction_service.fetch_waste_readings_data)
+        _, feature_seconds = _timed(prediction_service.engineer_features, df)
+        del df
+
+        trained, train_seconds = _timed(prediction_service.train_waste_prediction_model)
+        if not trained:
+            raise RuntimeError("Model training failed during benchmark")
+        train_peak_rss_mb = _peak_rss_mb()
+
+        # Single-prediction latency, distinct timestamps with memo cleared (model path, not memo)
+        base = SYNTHETIC_START + timedelta(days=400)
+        uncached = []
+        for i in range(latency_iterations):
+            prediction_service.prediction_memo.clear()
+            _, seconds = _timed(prediction_service.predict_fill_levels, "GH-ACC-BIN-0001", base + timedelta(hours=i))
+            uncached.append(seconds)
+        # ...and the memoized path (same timestamp every time)
+        memoized = [_timed(prediction_service.predict_fill_levels, "GH-ACC-BIN-0001", base)[1] for _ in range(latency_iterations)]
+
+        # Batch throughput: distinct timestamps so every row reaches the model
+        items = [(f"GH-ACC-BIN-{i % 500:04d}", base + timedelta(minutes=15 * i)) for i in range(batch_size)]
+        prediction_service.prediction_memo.clear()
+        _, batch_seconds = _timed(prediction_service.predict_fill_levels_batch, items)
+
+        return {
+            "rows": n_rows,
+            "fetch_seconds": round(fetch_seconds, 4),
+            "engineer_features_seconds": round(feature_seconds, 4),
+            "train_seconds": round(train_seconds, 4),
+            "peak_rss_mb": round(train_peak_rss_mb, 1),
+            "peak_rss_growth_mb": round(train_peak_rss_mb - rss_before_mb, 1),
+            "single_prediction": _latency_summary(uncached),
+            "single_prediction_memoized": _latency_summary(memoized),
+            "batch_size": batch_size,
+            "batch_seconds": round(batch_seconds, 4),
+            "batch_predictions_per_second": round(batch_size / batch_seconds, 1) if batch_seconds else None,
+        }
+
+def _environment() -> Dict[str, Any]:
+    def package_version(name):
+        try:
+            module = __import__(name)
+            return getattr(module, "__version__", None)
+        except ImportError:
+            return None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": package_version("numpy"),
+        "pandas": package_version("pandas"),
+        "sklearn": package_version("sklearn"),
+    }
+
+def run_suite(rows: List[int], latency_iterations: int = 200, batch_size: int = 5000) -> Dict[str, Any]:
+    """Runs each dataset size in a fresh interpreter (isolated peak RSS) and collects the results."""
+    results = []
+    for n_rows in rows:
+        completed = subprocess.run(
+            [sys.executable, "-m", __spec__.name, "--single-size", str(n_rows),
+             "--latency-iterations", str(latency_iterations), "--batch-size", str(batch_size)],
+            capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"Benchmark for {n_rows} rows failed:\n{completed.stderr}")
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        print(f"{n_rows:>12,} rows: train {results[-1]['train_seconds']:.2f}s, peak RSS {results[-1]['peak_rss_mb']:.0f} MB", file=sys.stderr)
+    return {"environment": _environment(), "results": results}
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> List[str]:
+    """Returns human-readable lines with the relative change of the key metrics per dataset size."""
+    metrics = [
+        ("train_seconds", lambda r: r["train_seconds"]),
+        ("peak_rss_mb", lambda r: r["peak_rss_mb"]),
+        ("single_prediction.p50_ms", lambda r: r["single_prediction"]["p50_ms"]),
+        ("batch_predictions_per_second", lambda r: r["batch_predictions_per_second"]),
+    ]
+    previous_by_rows = {result["rows"]: result for result in previous.get("results", [])}
+    lines = []
+    for result in current["results"]:
+        baseline = previous_by_rows.get(result["rows"])
+        if baseline is None:
+            continue
+        for name, extract in metrics:
+            old, new = extract(baseline), extract(result)
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            lines.append(f"{result['rows']:>12,} rows  {name:<30} {old:>12} -> {new:<12} ({change})")
+    return lines
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the prediction service hot path.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="Synthetic waste_readings sizes")
+    parser.add_argument("--latency-iterations", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    parser.add_argument("--single-size", type=int, help=argparse.SUPPRESS) # Internal: one size, JSON to stdout
+    args = parser.parse_args(argv)
+
+    if args.single_size is not None:
+        print(json.dumps(run_single_size(args.single_size, args.latency_iterations, args.batch_size)))
+        return
+
+    report = run_suite(args.rows, args.latency_iterations, args.batch_size)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as out_file:
+            out_file.write(output)
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as previous_file:
+            for line in compare(report, json.load(previous_file)):
+                print(line)
+
+if __name__ == "__main__":
+    main()
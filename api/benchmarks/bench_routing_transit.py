@@ -0,0 +1,94 @@
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from ..services import distance_providers, vrp_solver
+
+# Search throughput of the CVRP solver with Python transit callbacks (how routing_service and
+# ml/core_routing_ortools registered costs and demands before) versus matrix/vector registration
+# (vrp_solver.create_routing_model). Both variants solve the same synthetic instance with the same
+# search parameters for the same time; we report solutions, branches and accepted local-search
+# neighbors per second, and the objective reached.
+#
+#   python -m api.benchmarks.bench_routing_transit --stops 500 --seconds 10 --output transit.json
+
+DEFAULT_STOPS = 500
+
+def synthetic_problem(n_stops: int, num_vehicles: int = 10, time_limit_seconds: float = 10, seed: int = 42) -> Dict[str, Any]:
+    """A depot plus `n_stops` bins scattered over ~15 km of Accra, with haversine distances."""
+    rng = random.Random(seed)
+    points = [(5.6037, -0.1870)] + [(5.53 + rng.random() * 0.15, -0.27 + rng.random() * 0.15) for _ in range(n_stops)]
+    demands = [0] + [rng.randint(5, 40) for _ in range(n_stops)]
+    capacity = int(sum(demands) / num_vehicles * 1.2) + 1
+    return {
+        "distance_matrix": distance_providers.HaversineDistanceProvider().matrix(points, points).tolist(),
+        "demands": demands,
+        "vehicle_capacities": [capacity] * num_vehicles,
+        "num_vehicles": num_vehicles,
+        "depot": 0,
+        "time_limit_seconds": time_limit_seconds,
+    }
+
+def _callback_routing_model(problem: Dict[str, Any]):
+    """The previous setup: costs and demands looked up by Python closures."""
+    from ortools.constraint_solver import pywrapcp
+
+    manager = pywrapcp.RoutingIndexManager(len(problem["distance_matrix"]), problem["num_vehicles"], problem["depot"])
+    routing = pywrapcp.RoutingModel(manager)
+    distance_matrix, demands = problem["distance_matrix"], problem["demands"]
+
+    def distance_callback(from_index, to_index):
+        return distance_matrix[manager.IndexToNode(from_index)][manager.IndexToNode(to_index)]
+
+    def demand_callback(from_index):
+        return demands[manager.IndexToNode(from_index)]
+
+    routing.SetArcCostEvaluatorOfAllVehicles(routing.RegisterTransitCallback(distance_callback))
+    routing.AddDimensionWithVehicleCapacity(routing.RegisterUnaryTransitCallback(demand_callback), 0,
+                                            problem["vehicle_capacities"], True, 'Capacity')
+    return manager, routing
+
+def bench_variant(problem: Dict[str, Any], create_model) -> Dict[str, Any]:
+    _, routing = create_model(problem)
+    started = time.perf_counter()
+    solution = routing.SolveWithParameters(vrp_solver.create_search_parameters(problem["time_limit_seconds"]))
+    seconds = time.perf_counter() - started
+    solver = routing.solver()
+    return {
+        "seconds": round(seconds, 3),
+        "objective": solution.ObjectiveValue() if solution else None,
+        "solutions_per_second": round(solver.Solutions() / seconds, 1),
+        "branches_per_second": round(solver.Branches() / seconds, 1),
+        "accepted_neighbors_per_second": round(solver.AcceptedNeighbors() / seconds, 1),
+    }
+
+def run(n_stops: int, seconds: float) -> Dict[str, Any]:
+    problem = synthetic_problem(n_stops, time_limit_seconds=seconds)
+    callbacks = bench_variant(problem, _callback_routing_model)
+    matrix = bench_variant(problem, vrp_solver.create_routing_model)
+    return {
+        "stops": n_stops,
+        "time_limit_seconds": seconds,
+        "python_callbacks": callbacks,
+        "registered_matrix": matrix,
+        "solutions_per_second_speedup": round(matrix["solutions_per_second"] / max(callbacks["solutions_per_second"], 1e-9), 2),
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark OR-Tools search throughput: Python callbacks vs registered matrices.")
+    parser.add_argument("--stops", type=int, default=DEFAULT_STOPS, help="Bins in the synthetic instance (plus one depot)")
+    parser.add_argument("--seconds", type=float, default=10, help="Search time limit per variant")
+    parser.add_argument("--output", help="Write results JSON to this file")
+    args = parser.parse_args(argv)
+
+    output = json.dumps(run(args.stops, args.seconds), indent=2)
+    if args.output:
+        with open(args.output, "w") as out_file:
+            out_file.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
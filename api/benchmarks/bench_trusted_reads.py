@@ -0,0 +1,107 @@
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from ..models_pydantic import BinDocument, OptimizationResponse
+from ..responses import ModelJSONResponse
+from ..services import data_service
+
+# Per-document overhead of reading our own documents and of serializing large responses.
+#
+# Reads: Pydantic validation (BinDocument(**doc), what get_all_bins does), unvalidated
+# model_construct for reference, and the trusted-read records (data_service.bin_record on a
+# projected document, what get_all_bin_records does). Responses: an OptimizationResponse with
+# N stops, encoded the classic FastAPI way (validate against response_model, jsonable_encoder,
+# json.dumps), via a TypeAdapter dump_json (FastAPI's own fast path), and via ModelJSONResponse.
+# No database is involved; documents are synthetic.
+#
+#   python -m api.benchmarks.bench_trusted_reads --documents 10000 --output trusted_reads.json
+
+DEFAULT_DOCUMENTS = 10_000
+
+def synthetic_bin_documents(n: int) -> List[Dict[str, Any]]:
+    """Bin documents as stored in the 'bins' collection."""
+    return [{
+        "bin_id": f"BIN_{i:06d}",
+        "location": {"type": "Point", "coordinates": [-0.2 + i * 1e-5, 5.5 + i * 1e-5]},
+        "capacity_liters": 240,
+        "capacity_kg": 100,
+        "bin_type": "general",
+        "metadata": {"area": f"Area {i % 25}"},
+        "created_at": datetime(2024, 1, 1) + timedelta(minutes=i),
+    } for i in range(n)]
+
+def synthetic_optimization_response(n_stops: int, n_routes: int = 10) -> OptimizationResponse:
+    stops = [{"requestId": f"BIN_{i:06d}", "latitude": 5.5 + i * 1e-5, "longitude": -0.2 + i * 1e-5,
+              "approxGarbageWeight": 50.0 + i % 40} for i in range(n_stops)]
+    per_route = max(1, n_stops // n_routes)
+    routes = [{"vehicle_id": f"GH-TRUCK-{r + 1:02d}", "stops": stops[r * per_route:(r + 1) * per_route]} for r in range(n_routes)]
+    return OptimizationResponse(routes=routes, status="success")
+
+def _us_per_item(fn: Callable[[], Any], n_items: int, repeat: int) -> float:
+    """Best of `repeat` runs, in microseconds per item."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return round(best / n_items * 1e6, 3)
+
+def bench_reads(n_documents: int, repeat: int = 5) -> Dict[str, float]:
+    documents = synthetic_bin_documents(n_documents)
+    # What the server returns for data_service.BIN_RECORD_PROJECTION
+    projected = [{"bin_id": doc["bin_id"], "location": {"coordinates": doc["location"]["coordinates"]},
+                  "capacity_kg": doc["capacity_kg"], "capacity_liters": doc["capacity_liters"],
+                  "metadata": {"area": doc["metadata"]["area"]}} for doc in documents]
+    return {
+        "validated_model_us": _us_per_item(lambda: [BinDocument(**doc) for doc in documents], n_documents, repeat),
+        "model_construct_us": _us_per_item(lambda: [BinDocument.model_construct(**doc) for doc in documents], n_documents, repeat),
+        "trusted_record_us": _us_per_item(lambda: [data_service.bin_record(doc) for doc in projected], n_documents, repeat),
+    }
+
+def bench_responses(n_stops: int, repeat: int = 5) -> Dict[str, float]:
+    response = synthetic_optimization_response(n_stops)
+    adapter = TypeAdapter(OptimizationResponse)
+
+    def classic():
+        validated = adapter.validate_python(response, from_attributes=True)
+        return json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+    return {
+        "jsonable_encoder_json_dumps_us": _us_per_item(classic, n_stops, repeat),
+        "type_adapter_dump_json_us": _us_per_item(lambda: adapter.dump_json(adapter.validate_python(response, from_attributes=True)), n_stops, repeat),
+        "model_json_response_us": _us_per_item(lambda: ModelJSONResponse(response).body, n_stops, repeat),
+    }
+
+def run(n_documents: int, repeat: int = 5) -> Dict[str, Any]:
+    reads = bench_reads(n_documents, repeat)
+    responses = bench_responses(n_documents, repeat)
+    return {
+        "documents": n_documents,
+        "reads_us_per_document": reads,
+        "read_speedup": round(reads["validated_model_us"] / reads["trusted_record_us"], 1),
+        "responses_us_per_stop": responses,
+        "response_speedup": round(responses["jsonable_encoder_json_dumps_us"] / responses["model_json_response_us"], 1),
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark trusted reads and large JSON responses.")
+    parser.add_argument("--documents", type=int, default=DEFAULT_DOCUMENTS, help="Bin documents / route stops per run")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+    parser.add_argument("--output", help="Write results JSON to this file")
+    args = parser.parse_args(argv)
+
+    output = json.dumps(run(args.documents, args.repeat), indent=2)
+    if args.output:
+        with open(args.output, "w") as out_file:
+            out_file.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,85 @@ class Settings:
     MONGODB_URI: str = os.getenv("MONGODB_URI")
     MAPS_API_KEY_GHANA: str = os.getenv("MAPS_API_KEY_GHANA")
     RETRAIN_API_KEY: str = os.getenv("RETRAIN_API_KEY")
+    # How often (seconds) a cached prediction model re-checks its file on disk for changes
+    MODEL_RELOAD_CHECK_SECONDS: float = float(os.getenv("MODEL_RELOAD_CHECK_SECONDS", "5"))
+    # Bounded LRU/TTL memo of predictions keyed by (model, feature vector)
+    PREDICTION_CACHE_MAX_ENTRIES: int = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "100000"))
+    PREDICTION_CACHE_TTL_SECONDS: float = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "900"))
+    # Finished retrain job records are evicted (TTL index) after this many seconds
+    RETRAIN_JOB_TTL_SECONDS: int = int(os.getenv("RETRAIN_JOB_TTL_SECONDS", str(7 * 24 * 3600)))
+    # The training process refreshes its job's heartbeat every RETRAIN_JOB_HEARTBEAT_SECONDS; an active job
+    # without a heartbeat for RETRAIN_JOB_TIMEOUT_SECONDS is treated as crashed and no longer blocks new jobs
+    RETRAIN_JOB_HEARTBEAT_SECONDS: float = float(os.getenv("RETRAIN_JOB_HEARTBEAT_SECONDS", "30"))
+    RETRAIN_JOB_TIMEOUT_SECONDS: int = int(os.getenv("RETRAIN_JOB_TIMEOUT_SECONDS", "600"))
+    # Load ML/routing dependencies and the model at startup (long-running servers only;
+    # leave off on serverless so cold starts don't pay for pandas/sklearn/OR-Tools)
+    WARM_UP_ON_STARTUP: bool = os.getenv("WARM_UP_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+    # MongoDB connection pool and timeouts (shared by the sync and async clients).
+    # A slow or unreachable server fails fast instead of holding a request (and a pool slot) open.
+    MONGODB_MAX_POOL_SIZE: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", "50"))
+    MONGODB_MIN_POOL_SIZE: int = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+    MONGODB_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "60000"))
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    MONGODB_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+    MONGODB_SOCKET_TIMEOUT_MS: int = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "20000"))
+    # Bulk reading ingestion: readings per insert batch, and batches written concurrently per request
+    # (reading the request body pauses while this many batches are in flight)
+    INGEST_BATCH_SIZE: int = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
+    INGEST_MAX_IN_FLIGHT_BATCHES: int = int(os.getenv("INGEST_MAX_IN_FLIGHT_BATCHES", "4"))
+    # Optional shared key for sensor gateways (X-Ingest-Key header); ingestion is open when unset
+    INGEST_API_KEY: str = os.getenv("INGEST_API_KEY")
+    # Raw waste_readings expire after this many days (0 keeps them forever); hourly/daily rollups are kept
+    RAW_READINGS_TTL_DAYS: float = float(os.getenv("RAW_READINGS_TTL_DAYS", "0"))
+    # Training data source: "raw" (waste_readings) or "hourly" (rollups; required once raw readings expire)
+    TRAINING_DATA_SOURCE: str = os.getenv("TRAINING_DATA_SOURCE", "raw").lower()
+    # In-memory bin registry: without a change stream (standalone mongod, serverless) bins are
+    # re-read at most this many seconds after they were last known to be in sync
+    BIN_REGISTRY_POLL_SECONDS: float = float(os.getenv("BIN_REGISTRY_POLL_SECONDS", "30"))
+    # Documents per keyset page of the NDJSON export endpoints (the most an export holds in memory)
+    EXPORT_PAGE_SIZE: int = int(os.getenv("EXPORT_PAGE_SIZE", "5000"))
+    # Google Distance Matrix: elements per request (100 on standard plans), concurrent requests,
+    # and retries with exponential backoff on OVER_QUERY_LIMIT / transient errors
+    DISTANCE_MATRIX_MAX_ELEMENTS: int = int(os.getenv("DISTANCE_MATRIX_MAX_ELEMENTS", "100"))
+    DISTANCE_MATRIX_CONCURRENCY: int = int(os.getenv("DISTANCE_MATRIX_CONCURRENCY", "8"))
+    DISTANCE_MATRIX_MAX_RETRIES: int = int(os.getenv("DISTANCE_MATRIX_MAX_RETRIES", "5"))
+    DISTANCE_MATRIX_BACKOFF_SECONDS: float = float(os.getenv("DISTANCE_MATRIX_BACKOFF_SECONDS", "0.5"))
+    DISTANCE_MATRIX_TIMEOUT_SECONDS: float = float(os.getenv("DISTANCE_MATRIX_TIMEOUT_SECONDS", "10"))
+    # Persistent (SQLite) cache of fetched distances; set DISTANCE_CACHE_PATH to "" to disable
+    # (serverless: point it at a writable location such as /tmp)
+    DISTANCE_CACHE_PATH: str = os.getenv("DISTANCE_CACHE_PATH", "api/cache/distance_cache.sqlite3")
+    DISTANCE_CACHE_TTL_DAYS: float = float(os.getenv("DISTANCE_CACHE_TTL_DAYS", "30"))
+    DISTANCE_CACHE_MAX_ENTRIES: int = int(os.getenv("DISTANCE_CACHE_MAX_ENTRIES", "2000000"))
+    # Coordinates are rounded to this many decimals for cache keys (5 decimals is ~1 m)
+    DISTANCE_CACHE_PRECISION: int = int(os.getenv("DISTANCE_CACHE_PRECISION", "5"))
+    # Distance provider for route optimization: "google", "haversine" or "road_graph" (overridable per
+    # request), and the one used when it fails, e.g. no Maps key or API outage ("" disables the fallback)
+    DISTANCE_PROVIDER: str = os.getenv("DISTANCE_PROVIDER", "google").lower()
+    DISTANCE_PROVIDER_FALLBACK: str = os.getenv("DISTANCE_PROVIDER_FALLBACK", "haversine").lower()
+    # Offline street extract for "road_graph": GeoJSON street lines, or a .npz saved by RoadGraph.save_npz
+    ROAD_GRAPH_PATH: str = os.getenv("ROAD_GRAPH_PATH", "")
+    # Scales straight-line distances towards road distances for "haversine"
+    HAVERSINE_CIRCUITY_FACTOR: float = float(os.getenv("HAVERSINE_CIRCUITY_FACTOR", "1.0"))
+    # OR-Tools solves run in a pool of this many worker processes (0 solves in-process, for platforms
+    # without multiprocessing); up to ROUTING_SOLVER_MAX_QUEUED more wait, beyond that requests get a 503
+    ROUTING_SOLVER_WORKERS: int = int(os.getenv("ROUTING_SOLVER_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))
+    ROUTING_SOLVER_MAX_QUEUED: int = int(os.getenv("ROUTING_SOLVER_MAX_QUEUED", "8"))
+    ROUTING_TIME_LIMIT_SECONDS: float = float(os.getenv("ROUTING_TIME_LIMIT_SECONDS", "10"))
+    # Warm starts: search from the previous plan of the same fleet and zone (stored in route_plans),
+    # with this shorter time limit, when at least ROUTING_WARM_START_MIN_OVERLAP of today's stops are in it
+    ROUTING_WARM_START: bool = os.getenv("ROUTING_WARM_START", "true").lower() in ("1", "true", "yes")
+    ROUTING_WARM_START_TIME_LIMIT_SECONDS: float = float(os.getenv("ROUTING_WARM_START_TIME_LIMIT_SECONDS", "3"))
+    ROUTING_WARM_START_MIN_OVERLAP: float = float(os.getenv("ROUTING_WARM_START_MIN_OVERLAP", "0.5"))
+    # Cluster-first decomposition (route_decomposition) for more than ROUTING_DECOMPOSE_ABOVE_STOPS stops:
+    # clusters of at most ROUTING_CLUSTER_MAX_STOPS stops, each solved for ROUTING_CLUSTER_SECONDS_PER_STOP
+    # per stop (at least ROUTING_CLUSTER_MIN_SECONDS); ROUTING_BOUNDARY_REPAIR_ROUTES routes per side of
+    # each cluster boundary are then re-solved together
+    ROUTING_DECOMPOSE_ABOVE_STOPS: int = int(os.getenv("ROUTING_DECOMPOSE_ABOVE_STOPS", "400"))
+    ROUTING_CLUSTER_MAX_STOPS: int = int(os.getenv("ROUTING_CLUSTER_MAX_STOPS", "150"))
+    ROUTING_CLUSTER_SECONDS_PER_STOP: float = float(os.getenv("ROUTING_CLUSTER_SECONDS_PER_STOP", "0.02"))
+    ROUTING_CLUSTER_MIN_SECONDS: float = float(os.getenv("ROUTING_CLUSTER_MIN_SECONDS", "1"))
+    ROUTING_BOUNDARY_REPAIR_ROUTES: int = int(os.getenv("ROUTING_BOUNDARY_REPAIR_ROUTES", "2"))
 
     # Add other future configurations here, e.g.:
     # WMS_API_URL: str = os.getenv("WMS_API_URL")
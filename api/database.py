@@ -1,13 +1,49 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, AsyncMongoClient
 from pymongo.database import Database
 from pymongo.collection import Collection
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.asynchronous.collection import AsyncCollection
 from .config import settings # Import the settings instance
 
 class MongoDBConnection:
     client: MongoClient = None
     db: Database = None
 
+class AsyncMongoDBConnection:
+    client: AsyncMongoClient = None
+    db: AsyncDatabase = None
+
 db_connection = MongoDBConnection() # Global instance to hold the client and db
+async_db_connection = AsyncMongoDBConnection() # Same for the asyncio client used by async endpoints
+
+def mongo_client_options() -> dict:
+    """
+    Pool size and timeout options passed to both MongoClient and AsyncMongoClient.
+    Tuned through the MONGODB_* settings in config.py.
+    """
+    return {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGODB_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGODB_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGODB_SOCKET_TIMEOUT_MS,
+    }
+
+def _resolve_default_database(client):
+    """
+    Returns the default database of the URI, falling back to the path segment of MONGODB_URI.
+    Works for both the sync and the async client.
+    """
+    db = client.get_default_database(default=None)
+    if db is None:
+        db_name_from_uri = settings.MONGODB_URI.split('/')[-1].split('?')[0]
+        if db_name_from_uri and db_name_from_uri != "<database_name>":
+            db = client[db_name_from_uri]
+        else:
+            raise ValueError("MongoDB default database not found in URI and no DB_NAME specified.")
+    return db
 
 def connect_to_mongo():
     """
@@ -18,30 +54,13 @@ def connect_to_mongo():
     if db_connection.client is None: # Connect only if not already connected
         try:
             print(f"Attempting to connect to MongoDB URI: {settings.MONGODB_URI[:50]}...") # Log partial URI for security
-            db_connection.client = MongoClient(settings.MONGODB_URI)
+            db_connection.client = MongoClient(settings.MONGODB_URI, **mongo_client_options())
             # Ping the server to verify connection
             db_connection.client.admin.command('ping')
 
-            # Extract database name from URI if possible, or use a default/specific one
-            # For simplicity, let's assume the DB name is part of the URI or we can use client.get_default_database()
-            # If your MONGODB_URI includes the database name (e.g. .../MyDatabase?retryWrites...),
-            # client.get_database() without arguments will get it.
-            # Otherwise, you might need another env var for DB_NAME or parse it from URI.
             # The URI provided by user includes /WMS, so get_default_database() should work.
-            db_connection.db = db_connection.client.get_default_database()
-
-            if db_connection.db is None:
-                # This case might occur if the URI doesn't specify a default DB
-                # and the user intends to select DBs dynamically.
-                # For this app, we expect a default DB.
-                # Fallback to parsing if needed, or require DB_NAME in settings.
-                # For now, let's rely on get_default_database()
-                db_name_from_uri = settings.MONGODB_URI.split('/')[-1].split('?')[0]
-                if db_name_from_uri and db_name_from_uri != "<database_name>":
-                     db_connection.db = db_connection.client[db_name_from_uri]
-                else:
-                    # If still no DB, raise an error or use a hardcoded default if appropriate
-                    raise ValueError("MongoDB default database not found in URI and no DB_NAME specified.")
+            # Otherwise the database name is parsed from the URI (see _resolve_default_database).
+            db_connection.db = _resolve_default_database(db_connection.client)
 
             print(f"Successfully connected to MongoDB. Database: {db_connection.db.name}")
         except Exception as e:
@@ -82,6 +101,48 @@ def get_collection(collection_name: str) -> Collection:
     db = get_db()
     return db[collection_name]
 
+# --- Async client (used by async endpoints so DB round-trips don't block the event loop) ---
+
+async def connect_to_mongo_async():
+    """
+    Creates the AsyncMongoClient and verifies the connection.
+    Called from the FastAPI lifespan; must run on the event loop that serves requests.
+    """
+    if async_db_connection.client is None:
+        try:
+            async_db_connection.client = AsyncMongoClient(settings.MONGODB_URI, **mongo_client_options())
+            await async_db_connection.client.admin.command('ping')
+            async_db_connection.db = _resolve_default_database(async_db_connection.client)
+            print(f"Successfully connected async MongoDB client. Database: {async_db_connection.db.name}")
+        except Exception as e:
+            print(f"Failed to connect async MongoDB client: {e}")
+            async_db_connection.client = None
+            async_db_connection.db = None
+            raise
+
+async def close_mongo_connection_async():
+    """Closes the async MongoDB client (on application shutdown)."""
+    if async_db_connection.client:
+        await async_db_connection.client.close()
+        async_db_connection.client = None
+        async_db_connection.db = None
+        print("Async MongoDB connection closed.")
+
+def get_async_db() -> AsyncDatabase:
+    """
+    Returns the async database instance.
+    If the lifespan did not connect it, the client is created here without a ping:
+    AsyncMongoClient connects lazily on the first operation.
+    """
+    if async_db_connection.db is None:
+        async_db_connection.client = AsyncMongoClient(settings.MONGODB_URI, **mongo_client_options())
+        async_db_connection.db = _resolve_default_database(async_db_connection.client)
+    return async_db_connection.db
+
+def get_async_collection(collection_name: str) -> AsyncCollection:
+    """Returns a specific collection from the async MongoDB database."""
+    return get_async_db()[collection_name]
+
 # Example usage (optional, for testing this module directly):
 # if __name__ == "__main__":
 #     connect_to_mongo()
@@ -1,10 +1,12 @@
 import logging
 import sys # Required for basic StreamHandler (though Uvicorn might override)
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import JSONResponse
-from .database import connect_to_mongo, close_mongo_connection
-from .routers import prediction_router, routing_router # Import the new routers
-from .services import data_service # Import the new data_service
+from .database import connect_to_mongo, close_mongo_connection, connect_to_mongo_async, close_mongo_connection_async
+from .routers import prediction_router, routing_router, readings_router, export_router # Import the new routers
+from .config import settings
+from .services import bin_registry, data_service, routing_service, training_job_service
 
 # Configure logger
 # Uvicorn will handle the basic configuration and output.
@@ -14,7 +16,54 @@ from .services import data_service # Import the new data_service
 logger = logging.getLogger(__name__)
 # Example: logger.info("This is an info message from module level.")
 
-app = FastAPI(title="StaGreen Predictive Fleet API - Ghana")
+# --- Lifespan (Startup/Shutdown) ---
+
+async def startup():
+    logger.info("FastAPI application startup commencing...")
+    try:
+        connect_to_mongo()
+        logger.info("Successfully connected to MongoDB.")
+        # Async client for request handlers; created here so it is bound to the serving event loop
+        await connect_to_mongo_async()
+        logger.info("Successfully connected async MongoDB client.")
+        # Ensure sample data (one-off synchronous checks before the app starts serving)
+        data_service.ensure_sample_fleet_vehicles()
+        logger.info("Sample fleet vehicle check complete.")
+        data_service.ensure_sample_bins() # Add this line
+        logger.info("Sample bins check complete.")
+        data_service.ensure_indexes()
+        logger.info("Collection index check complete.")
+        data_service.check_bin_state_backfill()
+        training_job_service.ensure_retrain_job_indexes()
+        logger.info("Retrain job indexes check complete.")
+        bin_registry.start() # Loads bins in the background and keeps them in sync
+        if settings.WARM_UP_ON_STARTUP:
+            # Optional warm-up hook for long-running servers (see WARM_UP_ON_STARTUP)
+            from .services import prediction_service
+            prediction_service.warm_up()
+            routing_service.warm_up()
+    except Exception as e:
+        logger.critical(f"Error during startup: {e}", exc_info=True)
+        # Depending on policy, you might want to exit or prevent app from fully starting
+    logger.info("FastAPI application startup complete.")
+
+async def shutdown():
+    logger.info("FastAPI application shutdown commencing...")
+    training_job_service.shutdown_executor()
+    routing_service.shutdown_solver_executor()
+    bin_registry.stop()
+    await routing_service.close_http_client()
+    await close_mongo_connection_async()
+    close_mongo_connection()
+    logger.info("FastAPI application shutdown complete.")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup()
+    yield
+    await shutdown()
+
+app = FastAPI(title="StaGreen Predictive Fleet API - Ghana", lifespan=lifespan)
 
 # --- Global Exception Handlers ---
 
@@ -42,30 +91,6 @@ async def global_exception_handler(request: Request, exc: Exception):
         content={"detail": "An unexpected internal server error occurred."},
     )
 
-# --- Lifespan Events (Startup/Shutdown) ---
-
-@app.on_event("startup")
-async def startup_event():
-    logger.info("FastAPI application startup commencing...")
-    try:
-        connect_to_mongo()
-        logger.info("Successfully connected to MongoDB.")
-        # Ensure sample data (synchronous call, FastAPI handles it in a thread)
-        data_service.ensure_sample_fleet_vehicles()
-        logger.info("Sample fleet vehicle check complete.")
-        data_service.ensure_sample_bins() # Add this line
-        logger.info("Sample bins check complete.")
-    except Exception as e:
-        logger.critical(f"Error during startup: {e}", exc_info=True)
-        # Depending on policy, you might want to exit or prevent app from fully starting
-    logger.info("FastAPI application startup complete.")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("FastAPI application shutdown commencing...")
-    close_mongo_connection()
-    logger.info("FastAPI application shutdown complete.")
-
 # --- Root Endpoint ---
 
 @app.get("/", tags=["Root"])
@@ -76,5 +101,7 @@ async def read_root():
 # Further routers will be added here (e.g., for predictions, routing)
 app.include_router(prediction_router.router)
 app.include_router(routing_router.router) # Include the new routing router
+app.include_router(readings_router.router)
+app.include_router(export_router.router)
 # Example: from .routers import another_router
 # app.include_router(another_router.router, prefix="/another", tags=["Another Section"])
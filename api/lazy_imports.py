@@ -0,0 +1,38 @@
+import importlib
+import importlib.util
+from types import ModuleType
+
+# Heavy optional dependencies (numpy, pandas, sklearn, joblib, OR-Tools, httpx) are only
+# needed by some endpoints. Importing them eagerly makes every cold start pay for them,
+# so services reference them through these helpers instead of top-level imports.
+
+class LazyModule(ModuleType):
+    """Module proxy that imports the real module on first attribute access."""
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._lazy_target = None
+
+    def _load(self) -> ModuleType:
+        if self._lazy_target is None:
+            self._lazy_target = importlib.import_module(self.__name__)
+        return self._lazy_target
+
+    def __getattr__(self, attr: str):
+        # Only called for attributes not found on the proxy itself, i.e. the real module's
+        return getattr(self._load(), attr)
+
+def lazy_module(name: str) -> LazyModule:
+    """Returns a proxy for `name` that defers the import until it is first used."""
+    return LazyModule(name)
+
+def is_available(name: str) -> bool:
+    """Checks whether a package can be imported, without importing it."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+def preload(*modules: LazyModule):
+    """Forces the import of lazy modules now (used by warm-up hooks)."""
+    for module in modules:
+        module._load()
@@ -0,0 +1,39 @@
+import argparse
+import logging
+from typing import List, Optional
+
+from .database import connect_to_mongo, close_mongo_connection
+
+# Maintenance commands, run from the repository root:
+#   python -m api.manage rebuild-bin-state
+#   python -m api.manage rebuild-rollups
+
+def rebuild_bin_state():
+    from .services import data_service
+    bins_written = data_service.rebuild_bin_state()
+    print(f"bin_state rebuilt for {bins_written} bins.")
+
+def rebuild_rollups():
+    from .services import data_service
+    readings_folded = data_service.rebuild_reading_rollups()
+    print(f"Hourly/daily rollups rebuilt from {readings_folded} raw readings.")
+
+COMMANDS = {
+    "rebuild-bin-state": rebuild_bin_state,
+    "rebuild-rollups": rebuild_rollups,
+}
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="StaGreen API maintenance commands.")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    connect_to_mongo()
+    try:
+        COMMANDS[args.command]()
+    finally:
+        close_mongo_connection()
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, HttpUrl # HttpUrl might be useful later
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, NamedTuple
 from datetime import datetime
 from bson import ObjectId # For handling MongoDB ObjectId if needed in responses
 
@@ -97,7 +97,7 @@ class RouteStop(BaseModel):
 
 class OptimizedRoute(BaseModel):
     # route_id: Optional[str] = None # If we assign IDs to routes
-    vehicle_id: Optional[int] = None # If we assign vehicle to route
+    vehicle_id: Optional[str] = None # e.g. "GH-TRUCK-01" (or "Truck_N" when more routes than vehicles)
     stops: List[RouteStop]
     total_distance_km: Optional[float] = None # To be added by routing service
     total_time_minutes: Optional[float] = None # To be added by routing service
@@ -108,6 +108,62 @@ class OptimizationResponse(BaseModel):
     status: str = Field(..., example="success")
     # any other metadata, like total fleet distance, time, etc.
 
+# For bulk sensor ingestion (POST /readings/bulk)
+class IngestItemError(BaseModel):
+    position: int # Line number (NDJSON, 1-based) or array index (JSON, 0-based)
+    error: str
+
+class IngestBatchResult(BaseModel):
+    batch: int
+    received: int
+    accepted: int
+    rejected: int
+    errors: List[IngestItemError] = [] # First few rejections only
+
+class IngestResponse(BaseModel):
+    received: int
+    accepted: int
+    rejected: int
+    batches: List[IngestBatchResult]
+
+# For reading trends (GET /readings/trends/{bin_id}), served from the hourly/daily rollups
+class ReadingRollup(BaseModel):
+    bucket_start: datetime
+    count: int
+    avg_fill_level_percent: float
+    min_fill_level_percent: float
+    max_fill_level_percent: float
+
+class ReadingTrendResponse(BaseModel):
+    bin_id: str
+    granularity: str
+    buckets: List[ReadingRollup]
+
+# --- Trusted Read Records ---
+# Plain typed tuples for documents read from our own collections on hot paths
+# (e.g. route optimization over every bin). The data was validated when it was written,
+# so these skip Pydantic validation, which otherwise dominates the cost per document.
+# Built by the *_records functions in data_service / async_data_service.
+
+class BinRecord(NamedTuple):
+    bin_id: str
+    longitude: float
+    latitude: float
+    capacity_kg: Optional[int]
+    capacity_liters: Optional[int]
+    area: Optional[str]
+
+class FleetVehicleRecord(NamedTuple):
+    vehicle_id: str
+    capacity_kg: int
+    depot_latitude: Optional[float]
+    depot_longitude: Optional[float]
+
+class WasteReadingRecord(NamedTuple):
+    bin_id: str
+    fill_level_percent: float
+    reading_timestamp: datetime
+
 # This file will grow as more API endpoints and services are defined.
 # These initial models align with the MongoDB structures provided by the user
 # and provide examples for future API I/O.
@@ -132,3 +188,11 @@ class FleetVehicleDocument(BaseModel):
     class Config:
         json_encoders = {ObjectId: str}
         allow_population_by_field_name = True
+
+# --- Service Zones (geospatial bin selection for route optimization) ---
+
+class ServiceZone(BaseModel):
+    # Either a polygon or a radius; the radius is around `center`, or the depot when omitted
+    polygon: Optional[List[List[float]]] = Field(None, example=[[-0.21, 5.59], [-0.17, 5.59], [-0.17, 5.62], [-0.21, 5.62]]) # [longitude, latitude] vertices
+    radius_km: Optional[float] = Field(None, gt=0, example=3.0)
+    center: Optional[FleetVehicleDepot] = None
@@ -0,0 +1,29 @@
+import json
+from typing import Any, Callable, Optional
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from .lazy_imports import is_available, lazy_module
+
+orjson = lazy_module("orjson")
+HAS_ORJSON = is_available("orjson")
+
+def dumps_json(content: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """Compact UTF-8 JSON: orjson when installed, the stdlib json module otherwise."""
+    if HAS_ORJSON:
+        return orjson.dumps(content, default=default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+# JSON response for large payloads (e.g. OptimizationResponse with every stop of every route).
+# Endpoints return it with an already-built response model, which is serialized once in
+# pydantic-core (model_dump_json) instead of FastAPI re-validating the model against
+# response_model and then encoding it. Keep response_model on the route for the OpenAPI schema.
+
+class ModelJSONResponse(JSONResponse):
+    """JSONResponse serializing Pydantic models with model_dump_json (other content via orjson when installed)."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.model_dump_json().encode("utf-8")
+        return dumps_json(content)
@@ -0,0 +1,77 @@
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import datetime, timedelta
+import logging
+
+from ..services import export_service
+
+logger = logging.getLogger(__name__)
+router = APIRouter(
+    prefix="/export",
+    tags=["Export"]
+)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Bulk NDJSON exports for dashboards. Responses stream page by page (see export_service), are
+# gzip-compressed when the client sends `Accept-Encoding: gzip`, and can be resumed after a broken
+# download by passing the key of the last line received (`after`, or `after_timestamp`+`after_id`).
+
+def _fields(fields: Optional[str]):
+    return [field.strip() for field in fields.split(",")] if fields else None
+
+def _ndjson_response(request: Request, pages) -> StreamingResponse:
+    compress = "gzip" in request.headers.get("accept-encoding", "").lower()
+    headers = {"Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(export_service.ndjson_stream(pages, compress), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+@router.get("/bins")
+async def export_bins(
+    request: Request,
+    after: Optional[str] = Query(None, description="Resume after this bin_id"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields (default: all); bin_id is always included"),
+    limit: Optional[int] = Query(None, gt=0),
+):
+    """Streams bins as NDJSON, ordered by bin_id."""
+    try:
+        pages = export_service.iter_bin_pages(after, _fields(fields), limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _ndjson_response(request, pages)
+
+@router.get("/readings")
+async def export_readings(
+    request: Request,
+    bin_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    after_timestamp: Optional[datetime] = Query(None, description="Resume after this reading_timestamp (with after_id)"),
+    after_id: Optional[str] = Query(None, description="Resume after this reading _id (with after_timestamp)"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields (default: all); _id and reading_timestamp are always included"),
+    limit: Optional[int] = Query(None, gt=0),
+):
+    """Streams waste readings in [start, end) as NDJSON, ordered by (reading_timestamp, _id)."""
+    if (after_timestamp is None) != (after_id is None):
+        raise HTTPException(status_code=400, detail="after_timestamp and after_id must be given together")
+    after = (after_timestamp, after_id) if after_id is not None else None
+    try:
+        pages = export_service.iter_reading_pages(bin_id, start, end, after, _fields(fields), limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _ndjson_response(request, pages)
+
+@router.get("/predictions")
+async def export_predictions(
+    request: Request,
+    target_timestamp: Optional[datetime] = Query(None, description="Default: now + horizon_hours"),
+    horizon_hours: int = Query(12, gt=0),
+    after: Optional[str] = Query(None, description="Resume after this bin_id"),
+    limit: Optional[int] = Query(None, gt=0),
+):
+    """Streams the predicted fill level of every bin as NDJSON, ordered by bin_id (-1 marks a failed prediction)."""
+    target_timestamp = target_timestamp or datetime.utcnow() + timedelta(hours=horizon_hours)
+    logger.info(f"Prediction export requested for {target_timestamp} (after={after}, limit={limit}).")
+    return _ndjson_response(request, export_service.iter_prediction_pages(target_timestamp, after, limit))
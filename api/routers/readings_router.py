@@ -0,0 +1,73 @@
+from fastapi import APIRouter, HTTPException, Request, Depends, Header, Query
+from typing import Optional
+from datetime import datetime
+import logging
+
+from ..models_pydantic import IngestResponse, ReadingRollup, ReadingTrendResponse
+from ..services import async_data_service, ingest_service
+from ..config import settings
+from ..responses import ModelJSONResponse
+
+logger = logging.getLogger(__name__)
+
+# Optional API key for sensor gateways; ingestion stays open when INGEST_API_KEY is not configured
+async def verify_ingest_api_key(x_ingest_key: Optional[str] = Header(None)):
+    if settings.INGEST_API_KEY and x_ingest_key != settings.INGEST_API_KEY:
+        logger.warning("Unauthorized attempt to access the readings ingest endpoint.")
+        raise HTTPException(status_code=401, detail="Not authenticated or invalid API key")
+    return True
+
+router = APIRouter(
+    prefix="/readings",
+    tags=["Readings"]
+)
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+
+@router.post("/bulk", response_model=IngestResponse)
+async def ingest_waste_readings(request: Request, is_authenticated: bool = Depends(verify_ingest_api_key)):
+    """
+    Bulk-ingests waste readings (`bin_id`, `fill_level_percent`, `reading_timestamp`).
+    Send NDJSON (`Content-Type: application/x-ndjson`, one reading per line; streamed, preferred
+    for large uploads) or a JSON array (`application/json`). Readings are validated and stored in
+    batches; the response reports accepted/rejected counts per batch with the first errors of each.
+    Invalid readings are rejected individually and never fail the rest of the upload.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_CONTENT_TYPES:
+        result = await ingest_service.ingest_ndjson(request.stream())
+    else:
+        try:
+            result = await ingest_service.ingest_json_array(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid request body: {e}")
+
+    logger.info(f"Ingested {result.accepted}/{result.received} readings in {len(result.batches)} batches.")
+    return result
+
+@router.get("/trends/{bin_id}", response_model=ReadingTrendResponse)
+async def get_reading_trend(
+    bin_id: str,
+    granularity: str = Query("daily", pattern="^(hourly|daily)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    """
+    Fill-level trend of one bin as hourly or daily buckets (count, average, min, max) in [start, end).
+    Served from the rollup collections, so the cost depends on the number of buckets, not readings.
+    """
+    buckets = await async_data_service.get_reading_rollups(bin_id, granularity, start, end)
+    return ModelJSONResponse(ReadingTrendResponse(
+        bin_id=bin_id,
+        granularity=granularity,
+        buckets=[
+            ReadingRollup(
+                bucket_start=bucket["bucket_start"],
+                count=bucket["count"],
+                avg_fill_level_percent=round(bucket["sum_fill"] / bucket["count"], 2),
+                min_fill_level_percent=bucket["min_fill"],
+                max_fill_level_percent=bucket["max_fill"],
+            )
+            for bucket in buckets if bucket.get("count")
+        ],
+    ))
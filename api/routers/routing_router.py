@@ -1,10 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Request
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import logging
 
-from ..models_pydantic import OptimizationResponse, PredictionInputItem, GeoLocation, PredictionOutputItem, RouteStop
-from ..services import data_service, prediction_service, routing_service
+from ..models_pydantic import OptimizationResponse, PredictionInputItem, GeoLocation, PredictionOutputItem, RouteStop, ServiceZone
+from ..responses import ModelJSONResponse
+from ..services import async_data_service, bin_registry, data_service, distance_cache, prediction_service, routing_service
 # from ..config import settings
 
 logger = logging.getLogger(__name__)
@@ -18,10 +20,18 @@ class OptimizeRoutesRequest(BaseModel):
     target_date_str: Optional[str] = None
     prediction_horizon_hours: int = Field(default=12, gt=0)
     fill_level_threshold: float = Field(default=75.0, ge=0, le=100)
+    # Only bins in this zone are loaded, predicted and routed (default: the whole city)
+    zone: Optional[ServiceZone] = None
+    # "google", "haversine" or "road_graph" (default: the server's DISTANCE_PROVIDER)
+    distance_provider: Optional[str] = None
+    # Start the solver from the previous plan of this fleet and zone (see ROUTING_WARM_START)
+    warm_start: bool = True
+    # Cluster-first decomposition for city-scale stop counts (default: above ROUTING_DECOMPOSE_ABOVE_STOPS)
+    decompose: Optional[bool] = None
 
 
 @router.post("/optimize", response_model=OptimizationResponse)
-async def optimize_vehicle_routes(request_data: OptimizeRoutesRequest):
+async def optimize_vehicle_routes(request_data: OptimizeRoutesRequest, request: Request):
     """
     Orchestrates the generation of optimized vehicle routes.
     Fetches vehicle data, predicts waste levels for relevant bins,
@@ -30,36 +40,44 @@ async def optimize_vehicle_routes(request_data: OptimizeRoutesRequest):
     try:
         logger.info(f"Route optimization requested with params: {request_data.dict()}")
 
-        # 1. Fetch active fleet vehicles
-        # Note: data_service functions are synchronous, FastAPI handles them in a threadpool.
-        # If data_service were async, we'd await here.
-        active_vehicles = data_service.get_active_fleet_vehicles() # Corrected to sync call
+        # 1. Fetch active fleet vehicles (async driver: the event loop keeps serving other requests meanwhile).
+        # Vehicles and bins are trusted reads (plain records, no per-document Pydantic validation).
+        active_vehicles = await async_data_service.get_active_fleet_vehicle_records()
         if not active_vehicles:
             logger.warning("No active vehicles available for routing.")
             # Return Pydantic model directly
-            return OptimizationResponse(routes=[], status="error_no_active_vehicles")
+            return ModelJSONResponse(OptimizationResponse(routes=[], status="error_no_active_vehicles"))
 
-        if not active_vehicles[0].start_depot:
+        if active_vehicles[0].depot_latitude is None or active_vehicles[0].depot_longitude is None:
             raise HTTPException(status_code=500, detail="First active vehicle has no start_depot defined.")
 
         depot_location_dict = {
             "bin_id": "DEPOT_01",
-            "latitude": active_vehicles[0].start_depot.latitude,
-            "longitude": active_vehicles[0].start_depot.longitude,
+            "latitude": active_vehicles[0].depot_latitude,
+            "longitude": active_vehicles[0].depot_longitude,
             "type": "Depot"
         }
         vehicle_capacities = [v.capacity_kg for v in active_vehicles]
+        vehicle_ids = [v.vehicle_id for v in active_vehicles]
         num_vehicles = len(active_vehicles)
 
         # 2. Identify bins requiring service
-        # Fetch all bins from the database
-        all_bins_from_db = data_service.get_all_bins() # Corrected to sync call
+        if request_data.zone:
+            # Bins of the requested zone only (2dsphere query), so the work below scales with the zone
+            try:
+                zone_query = data_service.service_zone_query(request_data.zone, depot_location_dict["latitude"], depot_location_dict["longitude"])
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid zone: {e}")
+            all_bins_from_db = await async_data_service.get_bin_records_in_zone(zone_query)
+        else:
+            # All bins, served from the in-memory bin registry (kept in sync with the bins collection)
+            all_bins_from_db = await asyncio.to_thread(bin_registry.get_all_bin_records) # The first load reads MongoDB
         if not all_bins_from_db:
             logger.info("No bins found in the database to consider for routing.")
-            return OptimizationResponse(routes=[], status="success_no_bins_to_route")
+            return ModelJSONResponse(OptimizationResponse(routes=[], status="success_no_bins_to_route"))
 
         all_bin_ids_to_consider = [b.bin_id for b in all_bins_from_db]
-        bin_details_map = {b.bin_id: b for b in all_bins_from_db} # Map for easy lookup
+        bin_details_map = {b.bin_id: b for b in all_bins_from_db} # Map for easy lookup (BinRecord)
 
         # 3. Get predicted fill levels for these bins
         target_datetime_predict = datetime.utcnow()
@@ -71,44 +89,44 @@ async def optimize_vehicle_routes(request_data: OptimizeRoutesRequest):
 
         prediction_target_timestamp = target_datetime_predict + timedelta(hours=request_data.prediction_horizon_hours)
 
-        # Iteratively call prediction_service.predict_fill_levels
+        # Predict all bins with a single vectorized model call
+        predicted_levels = prediction_service.predict_fill_levels_batch(
+            [(bin_id_to_predict, prediction_target_timestamp) for bin_id_to_predict in all_bin_ids_to_consider]
+        )
         predicted_results_list = []
-        for bin_id_to_predict in all_bin_ids_to_consider:
-            predicted_level = prediction_service.predict_fill_levels(
-                bin_id=bin_id_to_predict,
-                future_timestamp=prediction_target_timestamp
-            )
-            if predicted_level is not None: # Can be 0.0, which is a valid prediction
-                predicted_results_list.append(PredictionOutputItem(
+        if predicted_levels is None:
+            logger.warning(f"Prediction service returned None for {len(all_bin_ids_to_consider)} bins at {prediction_target_timestamp}.")
+        else:
+            predicted_results_list = [
+                PredictionOutputItem(
                     bin_id=bin_id_to_predict,
                     timestamp=prediction_target_timestamp, # The timestamp we asked for
                     predicted_fill_level_percent=predicted_level
-                ))
-            else:
-                 logger.warning(f"Prediction service returned None for bin {bin_id_to_predict} at {prediction_target_timestamp}.")
-                 # Optionally skip or add with a failure indicator if the model supports it
+                )
+                for bin_id_to_predict, predicted_level in zip(all_bin_ids_to_consider, predicted_levels)
+            ]
 
         bins_for_routing_details = []
         # bin_details_map is already created above from all_bins_from_db
 
         for pred_item in predicted_results_list:
             if pred_item.predicted_fill_level_percent >= request_data.fill_level_threshold:
-                bin_doc = bin_details_map.get(pred_item.bin_id) # Use the map with BinDocument objects
+                bin_doc = bin_details_map.get(pred_item.bin_id)
                 if bin_doc:
-                    # Use capacity_kg from the BinDocument, provide a default if None
+                    # Use the bin's capacity_kg, provide a default if None
                     bin_capacity_kg = bin_doc.capacity_kg if bin_doc.capacity_kg is not None else 100 # Default if not set
                     predicted_weight = (pred_item.predicted_fill_level_percent / 100.0) * bin_capacity_kg
 
                     bins_for_routing_details.append({
                         "bin_id": pred_item.bin_id,
-                        "latitude": bin_doc.location.coordinates[1], # GeoJSON: lon, lat; Pydantic: lat, lon
-                        "longitude": bin_doc.location.coordinates[0],
+                        "latitude": bin_doc.latitude,
+                        "longitude": bin_doc.longitude,
                         "approxGarbageWeight": int(max(1, predicted_weight))
                     })
 
         if not bins_for_routing_details:
             logger.info("No bins meet the threshold for collection after prediction.")
-            return OptimizationResponse(routes=[], status="success_no_bins_meet_threshold")
+            return ModelJSONResponse(OptimizationResponse(routes=[], status="success_no_bins_meet_threshold"))
 
         # 4. Prepare data for OR-Tools solver
         locations_with_ids_for_or_tools = [depot_location_dict] + bins_for_routing_details
@@ -120,7 +138,12 @@ async def optimize_vehicle_routes(request_data: OptimizeRoutesRequest):
             locations_with_ids=locations_with_ids_for_or_tools,
             demands=demands_for_or_tools,
             vehicle_capacities=vehicle_capacities,
-            num_vehicles=num_vehicles
+            num_vehicles=num_vehicles,
+            distance_provider=request_data.distance_provider,
+            is_disconnected=request.is_disconnected, # Cancels the solve if the client goes away
+            vehicle_ids=vehicle_ids,
+            plan_key=data_service.route_plan_key(vehicle_ids, request_data.zone) if request_data.warm_start else None,
+            decompose=request_data.decompose,
         )
 
         final_routes_for_response = []
@@ -132,7 +155,7 @@ async def optimize_vehicle_routes(request_data: OptimizeRoutesRequest):
             })
 
         logger.info(f"OR-Tools optimization complete. Generated {len(final_routes_for_response)} routes.")
-        return OptimizationResponse(routes=final_routes_for_response, status="success")
+        return ModelJSONResponse(OptimizationResponse(routes=final_routes_for_response, status="success"))
 
     except HTTPException as http_exc:
         logger.error(f"HTTPException during route optimization: {http_exc.detail}", exc_info=True)
@@ -140,3 +163,17 @@ async def optimize_vehicle_routes(request_data: OptimizeRoutesRequest):
     except Exception as e:
         logger.error(f"Unexpected error during route optimization: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+@router.get("/bin-registry/stats", response_model=Dict[str, Any])
+async def get_bin_registry_stats():
+    """
+    Returns the in-memory bin registry's counters: mode (change_stream, polling or lazy), size,
+    hits/misses, reloads, change events applied, and seconds since it was last known to be in sync.
+    """
+    return bin_registry.get_bin_registry_stats()
+
+@router.get("/distance-cache/stats", response_model=Dict[str, Any])
+async def get_distance_cache_stats():
+    """Returns hit/miss/store/eviction counters of the persistent distance cache (empty when disabled)."""
+    cache = distance_cache.get_distance_cache()
+    return cache.stats() if cache else {}
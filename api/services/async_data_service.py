@@ -0,0 +1,232 @@
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+from ..database import get_async_collection
+from ..models_pydantic import (
+    FleetVehicleDocument, WasteReadingDocument, BinDocument, BinRecord, FleetVehicleRecord, WasteReadingRecord,
+)
+from .data_service import (
+    FLEET_VEHICLES_COLLECTION, WASTE_READINGS_COLLECTION, BINS_COLLECTION, BIN_STATE_COLLECTION, BIN_STATE_PROJECTION,
+    ROUTE_PLANS_COLLECTION, ROLLUP_GRANULARITIES, ROLLUP_PROJECTION, BIN_RECORD_PROJECTION, VEHICLE_RECORD_PROJECTION,
+    plan_bin_state_writes, plan_rollup_writes, bin_record, fleet_vehicle_record, waste_reading_record,
+    _is_stale_state_error, _reading_dicts, route_plan_document,
+)
+
+logger = logging.getLogger(__name__)
+
+# Async counterparts of the read functions in data_service, built on pymongo's AsyncMongoClient.
+# Async endpoints await these so a slow query suspends only its own request instead of
+# blocking the event loop (and every other request on the worker). Same queries, same
+# Pydantic validation and same "empty result on error" behaviour as the sync versions.
+
+# --- Fleet Vehicle Management ---
+
+async def get_active_fleet_vehicles() -> List[FleetVehicleDocument]:
+    """Fetches all active fleet vehicles from the database."""
+    try:
+        vehicle_collection = get_async_collection(FLEET_VEHICLES_COLLECTION)
+        vehicles_list = await vehicle_collection.find({"is_active": True}).to_list(length=None)
+        return [FleetVehicleDocument(**vehicle) for vehicle in vehicles_list]
+    except Exception as e:
+        logger.error(f"Error fetching active fleet vehicles: {e}", exc_info=True)
+        return []
+
+async def get_fleet_vehicle_by_id(vehicle_id: str) -> Optional[FleetVehicleDocument]:
+    """Fetches a single fleet vehicle by its ID."""
+    try:
+        vehicle_collection = get_async_collection(FLEET_VEHICLES_COLLECTION)
+        vehicle_data = await vehicle_collection.find_one({"vehicle_id": vehicle_id, "is_active": True})
+        if vehicle_data:
+            return FleetVehicleDocument(**vehicle_data)
+        return None
+    except Exception as e:
+        logger.error(f"Error fetching vehicle {vehicle_id}: {e}", exc_info=True)
+        return None
+
+# --- Waste Reading Management ---
+
+async def get_latest_waste_readings_for_bins(bin_ids: List[str]) -> List[WasteReadingDocument]:
+    """Fetches the most recent waste reading for each specified bin ID (point lookups on bin_state)."""
+    if not bin_ids:
+        return []
+    try:
+        state_collection = get_async_collection(BIN_STATE_COLLECTION)
+        states_list = await state_collection.find({"bin_id": {"$in": bin_ids}}, BIN_STATE_PROJECTION).to_list(length=None)
+        return [WasteReadingDocument(**state) for state in states_list]
+    except Exception as e:
+        logger.error(f"Error fetching latest waste readings for bins {bin_ids}: {e}", exc_info=True)
+        return []
+
+async def update_bin_state(readings: List[WasteReadingDocument]) -> int:
+    """Async counterpart of data_service.update_bin_state. Returns the number of bins advanced."""
+    if not readings:
+        return 0
+    state_collection = get_async_collection(BIN_STATE_COLLECTION)
+    bin_ids = list({reading.bin_id for reading in readings})
+    current_states = await state_collection.find({"bin_id": {"$in": bin_ids}}, BIN_STATE_PROJECTION).to_list(length=None)
+    operations = plan_bin_state_writes(current_states, readings)
+    if operations:
+        try:
+            await state_collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            if not _is_stale_state_error(e):
+                raise
+    return len(operations)
+
+async def record_waste_readings(readings: List[WasteReadingDocument]) -> Tuple[int, Dict[int, str]]:
+    """
+    Inserts readings with one unordered insert_many (a bad document doesn't stop the rest)
+    and advances bin_state for the ones stored. Returns (inserted count, {index: error} for
+    readings that were not stored).
+    """
+    if not readings:
+        return 0, {}
+    failed: Dict[int, str] = {}
+    try:
+        readings_collection = get_async_collection(WASTE_READINGS_COLLECTION)
+        await readings_collection.insert_many([reading.dict() for reading in readings], ordered=False)
+    except BulkWriteError as e:
+        failed = {write_error["index"]: write_error.get("errmsg", "write error") for write_error in e.details.get("writeErrors", [])}
+    except Exception as e:
+        logger.error(f"Error recording {len(readings)} waste readings: {e}", exc_info=True)
+        return 0, {index: "database write failed" for index in range(len(readings))}
+
+    stored = [reading for index, reading in enumerate(readings) if index not in failed]
+    try:
+        await update_bin_state(stored)
+        await update_reading_rollups(stored)
+    except Exception as e:
+        # The readings are stored; derived data can be repaired with `python -m api.manage rebuild-bin-state`
+        # and `python -m api.manage rebuild-rollups`
+        logger.error(f"Error updating bin_state/rollups for {len(stored)} readings: {e}", exc_info=True)
+    return len(stored), failed
+
+async def update_reading_rollups(readings: List[WasteReadingDocument]) -> int:
+    """Async counterpart of data_service.update_reading_rollups. Returns the number of buckets touched."""
+    if not readings:
+        return 0
+    touched = 0
+    for collection_name, operations in plan_rollup_writes(_reading_dicts(readings)).items():
+        if operations:
+            await get_async_collection(collection_name).bulk_write(operations, ordered=False)
+            touched += len(operations)
+    return touched
+
+async def get_reading_rollups(bin_id: str, granularity: str, start: Optional[datetime] = None,
+                              end: Optional[datetime] = None) -> List[Dict]:
+    """Hourly or daily buckets of one bin, oldest first (index range scan on bin_id, bucket_start)."""
+    try:
+        query: Dict = {"bin_id": bin_id}
+        time_range = {}
+        if start:
+            time_range["$gte"] = start
+        if end:
+            time_range["$lt"] = end
+        if time_range:
+            query["bucket_start"] = time_range
+        rollup_collection = get_async_collection(ROLLUP_GRANULARITIES[granularity])
+        return await rollup_collection.find(query, ROLLUP_PROJECTION).sort("bucket_start", 1).to_list(length=None)
+    except Exception as e:
+        logger.error(f"Error fetching {granularity} rollups for bin {bin_id}: {e}", exc_info=True)
+        return []
+
+# --- Bin Information ---
+
+async def get_bins_by_ids(bin_ids: List[str]) -> List[BinDocument]:
+    """Fetches bin details for a list of bin IDs."""
+    if not bin_ids:
+        return []
+    try:
+        bins_collection = get_async_collection(BINS_COLLECTION)
+        bins_list = await bins_collection.find({"bin_id": {"$in": bin_ids}}).to_list(length=None)
+        return [BinDocument(**bin_data) for bin_data in bins_list]
+    except Exception as e:
+        logger.error(f"Error fetching bins by IDs {bin_ids}: {e}", exc_info=True)
+        return []
+
+async def get_all_bins() -> List[BinDocument]:
+    """Fetches all bins from the 'bins' collection."""
+    try:
+        bins_collection = get_async_collection(BINS_COLLECTION)
+        bins_list = await bins_collection.find({}).to_list(length=None)
+        return [BinDocument(**bin_data) for bin_data in bins_list]
+    except Exception as e:
+        logger.error(f"Error fetching all bins: {e}", exc_info=True)
+        return []
+
+# --- Trusted Read Fast Path (see data_service) ---
+
+async def get_active_fleet_vehicle_records() -> List[FleetVehicleRecord]:
+    """Trusted-read variant of get_active_fleet_vehicles."""
+    try:
+        vehicle_collection = get_async_collection(FLEET_VEHICLES_COLLECTION)
+        vehicles_list = await vehicle_collection.find({"is_active": True}, VEHICLE_RECORD_PROJECTION).to_list(length=None)
+        return [fleet_vehicle_record(vehicle) for vehicle in vehicles_list]
+    except Exception as e:
+        logger.error(f"Error fetching active fleet vehicle records: {e}", exc_info=True)
+        return []
+
+async def get_all_bin_records() -> List[BinRecord]:
+    """Trusted-read variant of get_all_bins."""
+    try:
+        bins_list = await get_async_collection(BINS_COLLECTION).find({}, BIN_RECORD_PROJECTION).to_list(length=None)
+        return [bin_record(bin_data) for bin_data in bins_list]
+    except Exception as e:
+        logger.error(f"Error fetching all bin records: {e}", exc_info=True)
+        return []
+
+async def get_bin_records_by_ids(bin_ids: List[str]) -> List[BinRecord]:
+    """Trusted-read variant of get_bins_by_ids."""
+    if not bin_ids:
+        return []
+    try:
+        bins_collection = get_async_collection(BINS_COLLECTION)
+        bins_list = await bins_collection.find({"bin_id": {"$in": bin_ids}}, BIN_RECORD_PROJECTION).to_list(length=None)
+        return [bin_record(bin_data) for bin_data in bins_list]
+    except Exception as e:
+        logger.error(f"Error fetching bin records by IDs {bin_ids}: {e}", exc_info=True)
+        return []
+
+async def get_latest_waste_reading_records(bin_ids: List[str]) -> List[WasteReadingRecord]:
+    """Trusted-read variant of get_latest_waste_readings_for_bins."""
+    if not bin_ids:
+        return []
+    try:
+        state_collection = get_async_collection(BIN_STATE_COLLECTION)
+        states_list = await state_collection.find({"bin_id": {"$in": bin_ids}}, BIN_STATE_PROJECTION).to_list(length=None)
+        return [waste_reading_record(state) for state in states_list]
+    except Exception as e:
+        logger.error(f"Error fetching latest waste reading records for bins {bin_ids}: {e}", exc_info=True)
+        return []
+
+async def get_bin_records_in_zone(zone_query: Dict) -> List[BinRecord]:
+    """Trusted-read bins matching a geo filter (see data_service.service_zone_query)."""
+    try:
+        bins_list = await get_async_collection(BINS_COLLECTION).find(zone_query, BIN_RECORD_PROJECTION).to_list(length=None)
+        return [bin_record(bin_data) for bin_data in bins_list]
+    except Exception as e:
+        logger.error(f"Error fetching bin records in zone {zone_query}: {e}", exc_info=True)
+        return []
+
+# --- Route Plans (see data_service) ---
+
+async def get_route_plan(plan_key: str) -> Optional[Dict]:
+    """The last stored plan for a (fleet, zone) key, or None."""
+    try:
+        return await get_async_collection(ROUTE_PLANS_COLLECTION).find_one({"plan_key": plan_key}, {"_id": 0})
+    except Exception as e:
+        logger.error(f"Error fetching route plan {plan_key}: {e}", exc_info=True)
+        return None
+
+async def save_route_plan(plan_key: str, vehicle_ids: List[str], routes: List[List[str]], objective: Optional[int]) -> bool:
+    """Replaces the stored plan for a (fleet, zone) key. Returns False on error."""
+    try:
+        await get_async_collection(ROUTE_PLANS_COLLECTION).replace_one(
+            {"plan_key": plan_key}, route_plan_document(plan_key, vehicle_ids, routes, objective), upsert=True)
+        return True
+    except Exception as e:
+        logger.error(f"Error saving route plan {plan_key}: {e}", exc_info=True)
+        return False
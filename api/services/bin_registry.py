@@ -0,0 +1,326 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from pydantic import ValidationError
+from pymongo.errors import OperationFailure, PyMongoError
+
+from ..config import settings
+from ..database import get_collection
+from ..models_pydantic import BinDocument, BinRecord
+from .data_service import BINS_COLLECTION, bin_record
+
+logger = logging.getLogger(__name__)
+
+# Process-level registry of the `bins` collection.
+# Bins change rarely but every route optimization needs all of them, so they are read and
+# validated once and then served from memory (dict keyed by bin_id). A background thread keeps
+# the registry fresh from a MongoDB change stream; where change streams are unavailable
+# (standalone mongod, local stand-ins) it re-reads the collection every BIN_REGISTRY_POLL_SECONDS.
+# When a read finds the registry older than that without a live change stream (e.g. a serverless
+# instance whose background thread was frozen between requests), it keeps serving the in-memory
+# copy and starts a reload in a background thread; only the very first load blocks the caller.
+# Requested ids the database doesn't know are remembered for BIN_REGISTRY_POLL_SECONDS.
+
+# Server error code for "$changeStream is only supported on replica sets"
+CHANGE_STREAMS_UNSUPPORTED = 40573
+# Longest time a change stream read blocks before the watcher re-checks its stop flag
+CHANGE_STREAM_MAX_AWAIT_MS = 1000
+WATCH_RETRY_SECONDS = 5.0
+
+class _BinIndex:
+    """The registry's maps; replaced as a whole on reload."""
+    def __init__(self):
+        self.documents: Dict[str, BinDocument] = {}
+        self.records: Dict[str, BinRecord] = {}
+        self.bin_ids_by_object_id: Dict[Any, str] = {} # Change stream deletes only carry _id
+        self.unknown_ids: Dict[str, float] = {} # bin_id -> monotonic time the database reported it missing
+
+    def put(self, doc: Dict[str, Any]):
+        try:
+            document, record = BinDocument(**doc), bin_record(doc)
+        except (ValidationError, KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Skipping invalid bin document {doc.get('bin_id', doc.get('_id'))!r} in bin registry: {e}")
+            return
+        previous_bin_id = self.bin_ids_by_object_id.get(doc.get("_id"))
+        if previous_bin_id is not None and previous_bin_id != document.bin_id:
+            self.remove(previous_bin_id)
+        self.documents[document.bin_id] = document
+        self.records[document.bin_id] = record
+        self.unknown_ids.pop(document.bin_id, None)
+        if "_id" in doc:
+            self.bin_ids_by_object_id[doc["_id"]] = document.bin_id
+
+    def remove(self, bin_id: str):
+        self.documents.pop(bin_id, None)
+        self.records.pop(bin_id, None)
+
+class BinRegistry:
+    """
+    In-memory bins keyed by bin_id, holding both the validated BinDocument and its BinRecord.
+    Thread-safe; lookups are O(1) per bin. `hits` counts bins served from memory, `misses`
+    requested bins that were not in memory and had to be looked up in the database, and
+    `unknown_hits` requested ids recently reported missing, answered without a lookup.
+    """
+    def __init__(self, poll_seconds: float = settings.BIN_REGISTRY_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drops all bins and zeroes the counters."""
+        with self._lock:
+            self._index = _BinIndex()
+            self._loaded = False
+            self._last_synced = 0.0 # monotonic time the registry was last known to match the database
+            self.mode = "lazy" # "lazy" (reads reload when stale), "change_stream" or "polling"
+            self._refreshing = False # A background reload started by a read is running
+            self.hits = 0
+            self.misses = 0
+            self.unknown_hits = 0
+            self.reloads = 0
+            self.changes_applied = 0
+
+    # --- Loading and change application ---
+
+    def replace_all(self, docs: Iterable[Dict[str, Any]]):
+        """Swaps in a full copy of the collection."""
+        index = _BinIndex()
+        for doc in docs:
+            index.put(doc)
+        with self._lock:
+            self._index = index
+            self._loaded = True
+            self._last_synced = time.monotonic()
+            self.reloads += 1
+
+    def reload(self):
+        """Re-reads the whole bins collection."""
+        self.replace_all(get_collection(BINS_COLLECTION).find({}))
+        logger.info(f"Bin registry loaded {len(self._index.documents)} bins (reload #{self.reloads}, mode {self.mode}).")
+
+    def apply_change(self, change: Dict[str, Any]) -> bool:
+        """
+        Applies one change stream event. Returns False for events that end the stream
+        (drop, rename, invalidate); the caller then reloads and reopens the stream.
+        """
+        operation = change.get("operationType")
+        with self._lock:
+            if operation in ("insert", "update", "replace"):
+                # fullDocument is None when the bin was deleted before the update could be looked up;
+                # the delete event follows
+                if change.get("fullDocument") is not None:
+                    self._index.put(change["fullDocument"])
+            elif operation == "delete":
+                bin_id = self._index.bin_ids_by_object_id.pop(change.get("documentKey", {}).get("_id"), None)
+                if bin_id is not None:
+                    self._index.remove(bin_id)
+            elif operation in ("drop", "rename", "dropDatabase", "invalidate"):
+                return False
+            self.changes_applied += 1
+            self._last_synced = time.monotonic()
+        return True
+
+    def mark_synced(self):
+        """Records that the change stream is caught up (no pending events)."""
+        with self._lock:
+            self._last_synced = time.monotonic()
+
+    # --- Reads ---
+
+    def _reload_logging_errors(self):
+        try:
+            self.reload()
+        except Exception as e:
+            # Keep serving the last copy; an unloaded registry serves nothing until the database is back
+            logger.error(f"Error reloading bin registry: {e}", exc_info=True)
+
+    def _background_reload(self):
+        try:
+            self._reload_logging_errors()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _ensure_fresh(self):
+        # A live change stream marks the registry synced every CHANGE_STREAM_MAX_AWAIT_MS, so this
+        # only refreshes when unloaded, polling is due, or the watcher is not running
+        with self._lock:
+            loaded = self._loaded
+            refresh = loaded and not self._refreshing and time.monotonic() - self._last_synced > self.poll_seconds
+            if refresh:
+                self._refreshing = True
+        if not loaded: # Nothing to serve yet
+            self._reload_logging_errors()
+        elif refresh: # Serve the current copy; the next reads see the reloaded one
+            threading.Thread(target=self._background_reload, name="bin-registry-refresh", daemon=True).start()
+
+    def get_all_bins(self) -> List[BinDocument]:
+        self._ensure_fresh()
+        with self._lock:
+            self.hits += len(self._index.documents)
+            return list(self._index.documents.values())
+
+    def get_all_bin_records(self) -> List[BinRecord]:
+        self._ensure_fresh()
+        with self._lock:
+            self.hits += len(self._index.records)
+            return list(self._index.records.values())
+
+    def _lookup(self, bin_ids: List[str], entries_attr: str) -> List[Any]:
+        if not bin_ids:
+            return []
+        self._ensure_fresh()
+        unique_ids = list(dict.fromkeys(bin_ids))
+        now = time.monotonic()
+        with self._lock:
+            missing = [bin_id for bin_id in unique_ids if bin_id not in self._index.documents]
+            unknown_ids = self._index.unknown_ids
+            to_fetch = [bin_id for bin_id in missing
+                        if bin_id not in unknown_ids or now - unknown_ids[bin_id] >= self.poll_seconds]
+            self.hits += len(unique_ids) - len(missing)
+            self.misses += len(to_fetch)
+            self.unknown_hits += len(missing) - len(to_fetch)
+        if to_fetch:
+            # Bins created since the last sync (or unknown ids): read them once and keep them
+            try:
+                docs = list(get_collection(BINS_COLLECTION).find({"bin_id": {"$in": to_fetch}}))
+            except Exception as e:
+                logger.error(f"Error fetching bins {to_fetch} missing from the bin registry: {e}", exc_info=True)
+                docs = None
+            with self._lock:
+                for doc in docs or []:
+                    self._index.put(doc)
+                if docs is not None: # Ids still absent don't exist: don't ask again for poll_seconds
+                    unknown_ids = self._index.unknown_ids
+                    for bin_id, checked_at in list(unknown_ids.items()):
+                        if now - checked_at >= self.poll_seconds:
+                            del unknown_ids[bin_id]
+                    for bin_id in to_fetch:
+                        if bin_id not in self._index.documents:
+                            unknown_ids[bin_id] = now
+        with self._lock:
+            entries = getattr(self._index, entries_attr)
+            return [entries[bin_id] for bin_id in unique_ids if bin_id in entries]
+
+    def get_bins_by_ids(self, bin_ids: List[str]) -> List[BinDocument]:
+        """Bins for `bin_ids`, each id once; ids unknown to the database are skipped."""
+        return self._lookup(bin_ids, "documents")
+
+    def get_bin_records_by_ids(self, bin_ids: List[str]) -> List[BinRecord]:
+        return self._lookup(bin_ids, "records")
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss/reload counters and staleness for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "mode": self.mode,
+                "size": len(self._index.documents),
+                "loaded": self._loaded,
+                "hits": self.hits,
+                "misses": self.misses,
+                "unknown_hits": self.unknown_hits,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "reloads": self.reloads,
+                "changes_applied": self.changes_applied,
+                "staleness_seconds": round(time.monotonic() - self._last_synced, 3) if self._loaded else None,
+                "poll_seconds": self.poll_seconds,
+            }
+
+class BinRegistryWatcher:
+    """Background thread keeping a BinRegistry in sync (change stream, else polling)."""
+    def __init__(self, registry: BinRegistry):
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="bin-registry-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.registry.mode = "lazy"
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._watch()
+            except OperationFailure as e:
+                if e.code != CHANGE_STREAMS_UNSUPPORTED:
+                    self._on_stream_error(e)
+                    continue
+                logger.info("Change streams are not supported by this deployment; polling the bins collection instead.")
+                self._poll()
+            except PyMongoError as e:
+                self._on_stream_error(e)
+            except Exception as e:
+                # Not a MongoDB deployment with change streams (e.g. a local stand-in)
+                logger.info(f"Bin change stream unavailable ({e}); polling the bins collection instead.")
+                self._poll()
+
+    def _on_stream_error(self, e: Exception):
+        logger.warning(f"Bin registry change stream failed, reopening in {WATCH_RETRY_SECONDS}s: {e}")
+        self.registry.mode = "lazy" # Reads fall back to reloading when stale meanwhile
+        self._stop.wait(WATCH_RETRY_SECONDS)
+
+    def _watch(self):
+        collection = get_collection(BINS_COLLECTION)
+        # Open the stream before the full reload so no change between the two is lost
+        # (events already contained in the reload are re-applied harmlessly)
+        with collection.watch(full_document="updateLookup", max_await_time_ms=CHANGE_STREAM_MAX_AWAIT_MS) as stream:
+            self.registry.reload()
+            self.registry.mode = "change_stream"
+            while not self._stop.is_set():
+                change = stream.try_next()
+                if change is None:
+                    self.registry.mark_synced()
+                elif not self.registry.apply_change(change):
+                    logger.info(f"Bins change stream ended ({change.get('operationType')}); reloading.")
+                    return
+
+    def _poll(self):
+        self.registry.mode = "polling"
+        while not self._stop.is_set():
+            try:
+                self.registry.reload()
+            except Exception as e:
+                logger.error(f"Error polling the bins collection: {e}", exc_info=True)
+            self._stop.wait(self.registry.poll_seconds)
+
+bin_registry = BinRegistry() # Global instance shared by all requests in this process
+_watcher = BinRegistryWatcher(bin_registry)
+
+def start():
+    """Loads the registry and starts keeping it fresh in the background (called on app startup)."""
+    _watcher.start()
+
+def stop():
+    """Stops the background watcher (called on app shutdown)."""
+    _watcher.stop()
+
+def get_all_bins() -> List[BinDocument]:
+    """All bins, from memory."""
+    return bin_registry.get_all_bins()
+
+def get_bins_by_ids(bin_ids: List[str]) -> List[BinDocument]:
+    """Bins for the given IDs, from memory (unknown IDs are looked up in the database once)."""
+    return bin_registry.get_bins_by_ids(bin_ids)
+
+def get_all_bin_records() -> List[BinRecord]:
+    """All bins as trusted-read records, from memory."""
+    return bin_registry.get_all_bin_records()
+
+def get_bin_records_by_ids(bin_ids: List[str]) -> List[BinRecord]:
+    return bin_registry.get_bin_records_by_ids(bin_ids)
+
+def get_bin_registry_stats() -> Dict[str, Any]:
+    return bin_registry.stats()
@@ -0,0 +1,180 @@
+import os
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Compiled ("flat array") format for the fill-level model.
+# The fitted GradientBoostingRegressor is exported as plain NumPy arrays (node feature,
+# threshold, children and leaf values for every tree) and evaluated here with NumPy only,
+# so serving predictions does not need sklearn, pandas or unpickling an estimator.
+
+COMPILED_FORMAT_VERSION = 1
+# Upper bound on the size of the precomputed threshold-grid lookup table (float64 cells)
+MAX_LOOKUP_TABLE_CELLS = 2_000_000
+# Rows evaluated per chunk by the tree-traversal path (bounds the (rows x trees) index arrays)
+TRAVERSAL_CHUNK_ROWS = 8192
+
+def _flatten_trees(model) -> Dict[str, np.ndarray]:
+    """Concatenates every tree of a fitted gradient boosting regressor into flat node arrays."""
+    trees = [stage[0].tree_ for stage in model.estimators_]
+    n_features = int(model.n_features_in_)
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees[:-1]])
+
+    feature, threshold, left, right, value = [], [], [], [], []
+    for tree, offset in zip(trees, offsets):
+        is_leaf = tree.children_left < 0
+        node_ids = np.arange(tree.node_count) + offset
+        # Leaves loop onto themselves so every tree can be walked for a fixed number of levels
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+        left.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+        right.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+        value.append(tree.value[:, 0, 0])
+
+    # Constant raw prediction of the init estimator (mean of the target for squared error)
+    init_value = float(np.asarray(model._raw_predict_init(np.zeros((1, n_features))))[0, 0])
+    feature_names = getattr(model, "feature_names_in_", None)
+
+    return {
+        "format_version": np.array(COMPILED_FORMAT_VERSION),
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "children_left": np.concatenate(left).astype(np.int32),
+        "children_right": np.concatenate(right).astype(np.int32),
+        "value": np.concatenate(value).astype(np.float64),
+        "roots": offsets.astype(np.int32),
+        "init_value": np.array(init_value),
+        "learning_rate": np.array(float(model.learning_rate)),
+        "max_depth": np.array(max(tree.max_depth for tree in trees)),
+        "n_features": np.array(n_features),
+        "feature_names": np.array([str(name) for name in feature_names] if feature_names is not None else [], dtype=str),
+    }
+
+class CompiledTreeEnsemble:
+    """
+    NumPy-only evaluator for an exported gradient boosting model.
+    When the model's split thresholds form a small enough grid, predictions are a
+    per-feature searchsorted plus one table lookup; otherwise all trees are walked
+    level by level for the whole batch at once.
+    """
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.children_left = arrays["children_left"]
+        self.children_right = arrays["children_right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.init_value = float(arrays["init_value"])
+        self.learning_rate = float(arrays["learning_rate"])
+        self.max_depth = int(arrays["max_depth"])
+        self.n_features = int(arrays["n_features"])
+        self.feature_names: List[str] = [str(name) for name in arrays.get("feature_names", [])]
+        # Optional threshold-grid lookup table (see build_lookup_table)
+        self.split_points = arrays.get("split_points")
+        self.split_offsets = arrays.get("split_offsets")
+        self.cell_table = arrays.get("cell_table")
+
+    @classmethod
+    def from_file(cls, path: str) -> "CompiledTreeEnsemble":
+        """Loads an exported model (.npz) without pickle."""
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        if int(arrays.get("format_version", -1)) != COMPILED_FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled model format in {path}")
+        return cls(arrays)
+
+    def _traverse(self, X: np.ndarray) -> np.ndarray:
+        """Walks all trees for all rows (X already float64) and returns raw predictions."""
+        predictions = np.empty(len(X), dtype=np.float64)
+        n_trees = len(self.roots)
+        for start in range(0, len(X), TRAVERSAL_CHUNK_ROWS):
+            chunk = X[start:start + TRAVERSAL_CHUNK_ROWS]
+            rows = np.arange(len(chunk))[:, None]
+            nodes = np.broadcast_to(self.roots, (len(chunk), n_trees)).copy()
+            for _ in range(self.max_depth):
+                go_left = chunk[rows, self.feature[nodes]] <= self.threshold[nodes]
+                nodes = np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+            predictions[start:start + len(chunk)] = self.value[nodes].sum(axis=1)
+        return self.init_value + self.learning_rate * predictions
+
+    def build_lookup_table(self, max_cells: int = MAX_LOOKUP_TABLE_CELLS) -> bool:
+        """
+        Precomputes predictions for every cell of the grid formed by the split thresholds.
+        The ensemble is constant inside each cell, so lookups are exact. Returns False
+        (and keeps tree traversal) if the grid would exceed `max_cells`.
+        """
+        is_split = self.children_left != np.arange(len(self.children_left))
+        per_feature = [np.unique(self.threshold[is_split & (self.feature == f)]) for f in range(self.n_features)]
+        n_cells = int(np.prod([len(points) + 1 for points in per_feature], dtype=np.float64))
+        if n_cells > max_cells:
+            logger.info(f"Skipping lookup table: {n_cells} cells exceeds limit of {max_cells}.")
+            return False
+
+        # One representative value per cell: each threshold (x <= t goes left), plus one above the last
+        representatives = [
+            np.append(points, points[-1] + 1.0) if len(points) else np.zeros(1)
+            for points in per_feature
+        ]
+        grid = np.stack(np.meshgrid(*representatives, indexing="ij"), axis=-1).reshape(-1, self.n_features)
+        self.cell_table = self._traverse(grid)
+        self.split_points = np.concatenate(per_feature) if per_feature else np.zeros(0)
+        self.split_offsets = np.cumsum([0] + [len(points) for points in per_feature]).astype(np.int64)
+        return True
+
+    def _lookup(self, X: np.ndarray) -> np.ndarray:
+        """Maps each row to its grid cell and returns the precomputed prediction."""
+        cell_index = np.zeros(len(X), dtype=np.int64)
+        for f in range(self.n_features):
+            points = self.split_points[self.split_offsets[f]:self.split_offsets[f + 1]]
+            # Number of thresholds strictly below x == index of the cell containing x
+            cell_index = cell_index * (len(points) + 1) + np.searchsorted(points, X[:, f], side="left")
+        return self.cell_table[cell_index]
+
+    def predict(self, X) -> np.ndarray:
+        """Predicts raw fill levels for a 2-D feature matrix (rows x n_features)."""
+        # Trees compare float32 feature values, as sklearn does
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected a matrix with {self.n_features} feature columns, got shape {X.shape}")
+        if self.cell_table is not None:
+            return self._lookup(X)
+        return self._traverse(X)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Returns the arrays written to disk (tree arrays plus the lookup table if built)."""
+        arrays = {
+            "format_version": np.array(COMPILED_FORMAT_VERSION),
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "children_left": self.children_left,
+            "children_right": self.children_right,
+            "value": self.value,
+            "roots": self.roots,
+            "init_value": np.array(self.init_value),
+            "learning_rate": np.array(self.learning_rate),
+            "max_depth": np.array(self.max_depth),
+            "n_features": np.array(self.n_features),
+            "feature_names": np.array(self.feature_names, dtype=str),
+        }
+        if self.cell_table is not None:
+            arrays.update(split_points=self.split_points, split_offsets=self.split_offsets, cell_table=self.cell_table)
+        return arrays
+
+def compile_gradient_boosting(model) -> CompiledTreeEnsemble:
+    """Builds a CompiledTreeEnsemble (with lookup table when small enough) from a fitted model."""
+    compiled = CompiledTreeEnsemble(_flatten_trees(model))
+    compiled.build_lookup_table()
+    return compiled
+
+def export_gradient_boosting(model, path: str) -> CompiledTreeEnsemble:
+    """Writes the compiled form of a fitted GradientBoostingRegressor to `path` (.npz)."""
+    compiled = compile_gradient_boosting(model)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as out_file:
+        np.savez(out_file, **compiled.to_arrays())
+    os.replace(tmp_path, path) # Readers never see a half-written artifact
+    logger.info(f"Exported compiled model ({len(compiled.roots)} trees) to {path}")
+    return compiled
@@ -1,16 +1,79 @@
+import hashlib
+import json
 import logging
-from typing import List, Dict, Optional
-from datetime import datetime
+from typing import Any, List, Dict, Optional
+from datetime import datetime, timezone
 
+from pymongo import IndexModel, UpdateOne, ASCENDING, DESCENDING, GEOSPHERE
+from pymongo.errors import BulkWriteError
+
+from ..config import settings
 from ..database import get_collection
 # Assuming Pydantic models are in api.models_pydantic
-from ..models_pydantic import FleetVehicleDocument, WasteReadingDocument, GeoLocation, BinDocument
+from ..models_pydantic import (
+    FleetVehicleDocument, WasteReadingDocument, GeoLocation, BinDocument,
+    BinRecord, FleetVehicleRecord, WasteReadingRecord, ServiceZone,
+)
 
 logger = logging.getLogger(__name__)
 
 FLEET_VEHICLES_COLLECTION = "fleet_vehicles"
 WASTE_READINGS_COLLECTION = "waste_readings"
 BINS_COLLECTION = "bins" # Added for fetching bin locations if needed
+BIN_STATE_COLLECTION = "bin_state" # Latest reading per bin (see update_bin_state)
+WASTE_READINGS_HOURLY_COLLECTION = "waste_readings_hourly" # Per-bin buckets (see update_reading_rollups)
+WASTE_READINGS_DAILY_COLLECTION = "waste_readings_daily"
+ROUTE_PLANS_COLLECTION = "route_plans" # Last optimized routes per fleet and zone (route warm starts)
+
+# --- Index Plan ---
+# Indexes backing the hot queries below, applied at startup by ensure_indexes().
+# Explicit names keep create_indexes idempotent across deploys.
+INDEX_SPECS: Dict[str, List[IndexModel]] = {
+    WASTE_READINGS_COLLECTION: [
+        # Per-bin history, newest first (also walked backwards by rebuild_bin_state)
+        IndexModel([("bin_id", ASCENDING), ("reading_timestamp", DESCENDING)], name="bin_id_reading_timestamp_desc"),
+        # Keyset pages of the readings export (see export_service)
+        IndexModel([("reading_timestamp", ASCENDING), ("_id", ASCENDING)], name="reading_timestamp_id"),
+    ],
+    BINS_COLLECTION: [
+        IndexModel([("bin_id", ASCENDING)], name="bin_id_unique", unique=True),
+        IndexModel([("location", GEOSPHERE)], name="location_2dsphere"),
+    ],
+    BIN_STATE_COLLECTION: [
+        # Point lookups by bin; uniqueness also makes concurrent state upserts safe
+        IndexModel([("bin_id", ASCENDING)], name="bin_id_unique", unique=True),
+    ],
+    WASTE_READINGS_HOURLY_COLLECTION: [
+        # Bucket upserts and per-bin trend ranges; unique so racing upserts can't create duplicate buckets
+        IndexModel([("bin_id", ASCENDING), ("bucket_start", ASCENDING)], name="bin_id_bucket_start_unique", unique=True),
+        # Training scans (incremental: bucket_start > watermark)
+        IndexModel([("bucket_start", ASCENDING)], name="bucket_start"),
+    ],
+    WASTE_READINGS_DAILY_COLLECTION: [
+        IndexModel([("bin_id", ASCENDING), ("bucket_start", ASCENDING)], name="bin_id_bucket_start_unique", unique=True),
+    ],
+    FLEET_VEHICLES_COLLECTION: [
+        IndexModel([("is_active", ASCENDING)], name="is_active"),
+    ],
+    ROUTE_PLANS_COLLECTION: [
+        # One plan per (fleet, zone); replaced by every successful optimization
+        IndexModel([("plan_key", ASCENDING)], name="plan_key_unique", unique=True),
+    ],
+}
+
+def ensure_indexes():
+    """
+    Creates the indexes declared in INDEX_SPECS (no-op for indexes that already exist).
+    Each collection is handled separately so one failure (e.g. duplicate bin_ids blocking
+    the unique index) doesn't prevent the others from being created.
+    """
+    ensure_waste_readings_storage() # Before any index creation implicitly creates the collection
+    for collection_name, index_models in INDEX_SPECS.items():
+        try:
+            created = get_collection(collection_name).create_indexes(index_models)
+            logger.info(f"Ensured indexes on '{collection_name}': {created}")
+        except Exception as e:
+            logger.error(f"Error ensuring indexes on '{collection_name}': {e}", exc_info=True)
 
 # --- Fleet Vehicle Management ---
 
@@ -72,33 +135,324 @@ def ensure_sample_fleet_vehicles(): # This function can remain synchronous
         logger.error(f"Error ensuring sample fleet vehicles: {e}", exc_info=True)
 
 # --- Waste Reading Management ---
+# `bin_state` holds one document per bin with its latest reading, so "latest fill level"
+# is an indexed point lookup instead of a sort/group over the whole reading history.
+# It is kept current by record_waste_readings() and can be rebuilt with
+# `python -m api.manage rebuild-bin-state`.
+
+BIN_STATE_PROJECTION = {"_id": 0, "bin_id": 1, "fill_level_percent": 1, "reading_timestamp": 1, "last_emptied": 1}
+# A drop of at least this many percentage points between consecutive readings counts as the bin being emptied
+EMPTIED_DROP_PERCENT = 30.0
+BIN_STATE_WRITE_BATCH_SIZE = 1000
+
+def _as_utc_naive(timestamp: datetime) -> datetime:
+    """MongoDB returns naive UTC datetimes; normalize aware ones so they compare with stored values."""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def _advance_bin_state(state: Optional[Dict], reading: Dict) -> Dict:
+    """Applies one reading (newer than `state`) to a bin's latest-state document."""
+    last_emptied = state.get("last_emptied") if state else None
+    if state and state["fill_level_percent"] - reading["fill_level_percent"] >= EMPTIED_DROP_PERCENT:
+        last_emptied = reading["reading_timestamp"]
+    return {
+        "bin_id": reading["bin_id"],
+        "fill_level_percent": reading["fill_level_percent"],
+        "reading_timestamp": reading["reading_timestamp"],
+        "last_emptied": last_emptied,
+    }
+
+def _bin_state_write(state: Dict, replace_equal: bool = False):
+    """
+    Upsert that only moves a bin's state forward in time. If a newer state already exists the
+    filter doesn't match, the upsert collides with the unique bin_id index and the (harmless)
+    duplicate key error is ignored by _apply_bin_state_writes.
+    """
+    operator = "$lte" if replace_equal else "$lt"
+    return UpdateOne(
+        {"bin_id": state["bin_id"], "reading_timestamp": {operator: state["reading_timestamp"]}},
+        {"$set": {**state, "updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+def _is_stale_state_error(error: BulkWriteError) -> bool:
+    """True if every write error is the duplicate key raised by a state upsert that lost to a newer state."""
+    return all(write_error.get("code") == 11000 for write_error in error.details.get("writeErrors", []))
+
+def _apply_bin_state_writes(state_collection, operations: List[UpdateOne]):
+    if not operations:
+        return
+    try:
+        state_collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        if not _is_stale_state_error(e):
+            raise
+
+def plan_bin_state_writes(current_states: List[Dict], readings: List[WasteReadingDocument]) -> List[UpdateOne]:
+    """
+    Folds readings into the bins' current state documents and returns the upserts for the
+    bins that moved forward. Readings older than a bin's current state are ignored.
+    Shared by the sync and async ingest paths.
+    """
+    current = {doc["bin_id"]: doc for doc in current_states}
+    previous_timestamps = {bin_id: doc["reading_timestamp"] for bin_id, doc in current.items()}
+
+    ordered_readings = sorted(
+        ({"bin_id": r.bin_id, "fill_level_percent": r.fill_level_percent, "reading_timestamp": _as_utc_naive(r.reading_timestamp)}
+         for r in readings),
+        key=lambda reading: reading["reading_timestamp"],
+    )
+    for reading in ordered_readings:
+        state = current.get(reading["bin_id"])
+        if state and reading["reading_timestamp"] <= state["reading_timestamp"]:
+            continue
+        current[reading["bin_id"]] = _advance_bin_state(state, reading)
+
+    return [
+        _bin_state_write(state) for bin_id, state in current.items()
+        if state["reading_timestamp"] != previous_timestamps.get(bin_id)
+    ]
+
+def update_bin_state(readings: List[WasteReadingDocument]) -> int:
+    """
+    Folds newly ingested readings into `bin_state` (one indexed read and one bulk write per call).
+    Returns the number of bins advanced.
+    """
+    if not readings:
+        return 0
+    state_collection = get_collection(BIN_STATE_COLLECTION)
+    bin_ids = list({reading.bin_id for reading in readings})
+    current_states = list(state_collection.find({"bin_id": {"$in": bin_ids}}, BIN_STATE_PROJECTION))
+    operations = plan_bin_state_writes(current_states, readings)
+    _apply_bin_state_writes(state_collection, operations)
+    return len(operations)
+
+def record_waste_readings(readings: List[WasteReadingDocument]) -> int:
+    """Stores new readings and advances the affected bins' latest state and rollups. Returns the number inserted."""
+    if not readings:
+        return 0
+    try:
+        readings_collection = get_collection(WASTE_READINGS_COLLECTION)
+        result = readings_collection.insert_many([reading.dict() for reading in readings])
+        update_bin_state(readings)
+        update_reading_rollups(readings)
+        return len(result.inserted_ids)
+    except Exception as e:
+        logger.error(f"Error recording {len(readings)} waste readings: {e}", exc_info=True)
+        return 0
+
+def rebuild_bin_state() -> int:
+    """
+    Recomputes `bin_state` from the full reading history (backfill after deploy or repair).
+    Readings are streamed per bin, oldest first, by walking the (bin_id, reading_timestamp desc)
+    index backwards. A state left without raw readings is kept while its bin is still registered
+    (its readings may have expired, see RAW_READINGS_TTL_DAYS) and removed otherwise.
+    Returns the number of bins written.
+    """
+    readings_collection = get_collection(WASTE_READINGS_COLLECTION)
+    state_collection = get_collection(BIN_STATE_COLLECTION)
+    started_at = datetime.utcnow()
+    cursor = readings_collection.find(
+        {}, {"_id": 0, "bin_id": 1, "fill_level_percent": 1, "reading_timestamp": 1}, batch_size=BIN_STATE_WRITE_BATCH_SIZE,
+    ).sort([("bin_id", DESCENDING), ("reading_timestamp", ASCENDING)])
+
+    operations, bins_written, state = [], 0, None
+    for reading in cursor:
+        if state is not None and state["bin_id"] != reading["bin_id"]:
+            operations.append(_bin_state_write(state, replace_equal=True))
+            state = None
+        if len(operations) >= BIN_STATE_WRITE_BATCH_SIZE:
+            _apply_bin_state_writes(state_collection, operations)
+            bins_written += len(operations)
+            operations = []
+        state = _advance_bin_state(state, reading)
+    if state is not None:
+        operations.append(_bin_state_write(state, replace_equal=True))
+    _apply_bin_state_writes(state_collection, operations)
+    bins_written += len(operations)
+
+    stale_filter = {"updated_at": {"$lt": started_at}}
+    stale_bin_ids = state_collection.distinct("bin_id", stale_filter)
+    registered = set(get_collection(BINS_COLLECTION).distinct("bin_id", {"bin_id": {"$in": stale_bin_ids}}))
+    removed_bin_ids = [bin_id for bin_id in stale_bin_ids if bin_id not in registered]
+    removed = 0
+    if removed_bin_ids:
+        removed = state_collection.delete_many({**stale_filter, "bin_id": {"$in": removed_bin_ids}}).deleted_count
+    logger.info(f"Rebuilt bin_state for {bins_written} bins ({removed} stale entries removed).")
+    return bins_written
+
+def check_bin_state_backfill():
+    """Warns at startup when readings exist but bin_state was never built (latest-reading lookups would be empty)."""
+    try:
+        if get_collection(BIN_STATE_COLLECTION).find_one({}, {"_id": 1}) is None and \
+                get_collection(WASTE_READINGS_COLLECTION).find_one({}, {"_id": 1}) is not None:
+            logger.warning("bin_state is empty but waste_readings has data; run `python -m api.manage rebuild-bin-state`.")
+    except Exception as e:
+        logger.error(f"Error checking bin_state backfill: {e}", exc_info=True)
 
 def get_latest_waste_readings_for_bins(bin_ids: List[str]) -> List[WasteReadingDocument]:
     """
-    Fetches the most recent waste reading for each specified bin ID.
+    Fetches the most recent waste reading for each specified bin ID (point lookups on bin_state).
     """
     if not bin_ids:
         return []
     try:
-        readings_collection = get_collection(WASTE_READINGS_COLLECTION)
-        pipeline = [
-            {"$match": {"bin_id": {"$in": bin_ids}}},
-            {"$sort": {"reading_timestamp": -1}},
-            {"$group": {
-                "_id": "$bin_id",
-                "latest_reading_doc": {"$first": "$$ROOT"}
-            }},
-            {"$replaceRoot": {"newRoot": "$latest_reading_doc"}}
-        ]
-        latest_readings_cursor = readings_collection.aggregate(pipeline) # Synchronous
-        readings_list = list(latest_readings_cursor)
+        state_collection = get_collection(BIN_STATE_COLLECTION)
+        states_list = list(state_collection.find({"bin_id": {"$in": bin_ids}}, BIN_STATE_PROJECTION))
 
         # Validate with Pydantic
-        return [WasteReadingDocument(**reading) for reading in readings_list]
+        return [WasteReadingDocument(**state) for state in states_list]
     except Exception as e:
         logger.error(f"Error fetching latest waste readings for bins {bin_ids}: {e}", exc_info=True)
         return []
 
+# --- Reading Rollups and Raw Retention ---
+# Readings are also folded into per-bin buckets: one hourly document (with the bucket's
+# readings as compact parallel arrays) and one daily document (aggregates only) per bin.
+# Bucket updates are commutative ($inc/$min/$max/$push), so out-of-order and concurrent
+# ingests need no coordination. Raw readings can then expire after RAW_READINGS_TTL_DAYS
+# while training (TRAINING_DATA_SOURCE=hourly) and trend queries read the buckets.
+
+ROLLUP_GRANULARITIES = {"hourly": WASTE_READINGS_HOURLY_COLLECTION, "daily": WASTE_READINGS_DAILY_COLLECTION}
+ROLLUP_PROJECTION = {"_id": 0, "bin_id": 1, "bucket_start": 1, "count": 1, "sum_fill": 1, "min_fill": 1, "max_fill": 1}
+RAW_READINGS_TTL_INDEX = "reading_timestamp_ttl"
+ROLLUP_REBUILD_BATCH_SIZE = 10000
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Start of the hourly/daily bucket containing `timestamp` (naive UTC)."""
+    timestamp = _as_utc_naive(timestamp).replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0) if granularity == "daily" else timestamp
+
+def plan_rollup_writes(readings: List[Dict]) -> Dict[str, List[UpdateOne]]:
+    """
+    Groups readings ({bin_id, reading_timestamp, fill_level_percent} dicts) by bin and bucket
+    and returns one upsert per touched bucket for each rollup collection.
+    """
+    operations = {}
+    for granularity, collection_name in ROLLUP_GRANULARITIES.items():
+        buckets: Dict[tuple, Dict] = {}
+        for reading in readings:
+            timestamp = _as_utc_naive(reading["reading_timestamp"])
+            fill = float(reading["fill_level_percent"])
+            key = (reading["bin_id"], bucket_start(timestamp, granularity))
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {"count": 0, "sum_fill": 0.0, "min_fill": fill, "max_fill": fill,
+                                         "first": timestamp, "last": timestamp, "offsets": [], "fills": []}
+            bucket["count"] += 1
+            bucket["sum_fill"] += fill
+            bucket["min_fill"] = min(bucket["min_fill"], fill)
+            bucket["max_fill"] = max(bucket["max_fill"], fill)
+            bucket["first"] = min(bucket["first"], timestamp)
+            bucket["last"] = max(bucket["last"], timestamp)
+            if granularity == "hourly":
+                bucket["offsets"].append(int((timestamp - key[1]).total_seconds()))
+                bucket["fills"].append(fill)
+
+        collection_operations = []
+        for (bin_id, start), bucket in buckets.items():
+            update = {
+                "$inc": {"count": bucket["count"], "sum_fill": bucket["sum_fill"]},
+                "$min": {"min_fill": bucket["min_fill"], "first_reading_timestamp": bucket["first"]},
+                "$max": {"max_fill": bucket["max_fill"], "last_reading_timestamp": bucket["last"]},
+            }
+            if granularity == "hourly":
+                # Seconds since bucket_start and fill level of every reading, as parallel arrays
+                update["$push"] = {"offsets_s": {"$each": bucket["offsets"]}, "fills": {"$each": bucket["fills"]}}
+            # The unique (bin_id, bucket_start) index makes the server retry racing upserts as updates
+            collection_operations.append(UpdateOne({"bin_id": bin_id, "bucket_start": start}, update, upsert=True))
+        operations[collection_name] = collection_operations
+    return operations
+
+def _reading_dicts(readings: List[WasteReadingDocument]) -> List[Dict]:
+    return [{"bin_id": r.bin_id, "reading_timestamp": r.reading_timestamp, "fill_level_percent": r.fill_level_percent}
+            for r in readings]
+
+def update_reading_rollups(readings: List[WasteReadingDocument]) -> int:
+    """Folds readings into the hourly and daily buckets. Returns the number of buckets touched."""
+    if not readings:
+        return 0
+    touched = 0
+    for collection_name, operations in plan_rollup_writes(_reading_dicts(readings)).items():
+        if operations:
+            get_collection(collection_name).bulk_write(operations, ordered=False)
+            touched += len(operations)
+    return touched
+
+def rebuild_reading_rollups() -> int:
+    """
+    Recomputes the rollups from the raw readings still retained. Buckets older than the
+    oldest raw reading's day are kept as they are (their raw data may have expired).
+    Returns the number of raw readings folded in.
+    """
+    readings_collection = get_collection(WASTE_READINGS_COLLECTION)
+    oldest = readings_collection.find_one({}, {"_id": 0, "reading_timestamp": 1}, sort=[("reading_timestamp", ASCENDING)])
+    if oldest is None:
+        logger.info("No raw readings to rebuild rollups from.")
+        return 0
+    rebuild_from = bucket_start(oldest["reading_timestamp"], "daily")
+    for collection_name in ROLLUP_GRANULARITIES.values():
+        get_collection(collection_name).delete_many({"bucket_start": {"$gte": rebuild_from}})
+
+    cursor = readings_collection.find(
+        {"reading_timestamp": {"$gte": rebuild_from}},
+        {"_id": 0, "bin_id": 1, "reading_timestamp": 1, "fill_level_percent": 1},
+        batch_size=ROLLUP_REBUILD_BATCH_SIZE,
+    )
+    folded, chunk = 0, []
+    def flush():
+        for collection_name, operations in plan_rollup_writes(chunk).items():
+            if operations:
+                get_collection(collection_name).bulk_write(operations, ordered=False)
+    for reading in cursor:
+        chunk.append(reading)
+        if len(chunk) >= ROLLUP_REBUILD_BATCH_SIZE:
+            flush()
+            folded += len(chunk)
+            chunk = []
+    if chunk:
+        flush()
+        folded += len(chunk)
+    logger.info(f"Rebuilt reading rollups from {folded} raw readings (buckets since {rebuild_from}).")
+    return folded
+
+def ensure_waste_readings_storage():
+    """
+    Sets up raw reading storage. A new deployment gets a MongoDB time-series collection
+    (bucketed and compressed by the server, metaField bin_id) expiring after RAW_READINGS_TTL_DAYS;
+    an existing regular collection gets a TTL index instead. A TTL of 0 keeps raw readings forever.
+    """
+    readings_collection = get_collection(WASTE_READINGS_COLLECTION)
+    db = readings_collection.database
+    ttl_seconds = int(settings.RAW_READINGS_TTL_DAYS * 24 * 3600)
+    try:
+        existing = list(db.list_collections(filter={"name": WASTE_READINGS_COLLECTION}))
+        if not existing:
+            options = {"timeseries": {"timeField": "reading_timestamp", "metaField": "bin_id", "granularity": "minutes"}}
+            if ttl_seconds:
+                options["expireAfterSeconds"] = ttl_seconds
+            try:
+                db.create_collection(WASTE_READINGS_COLLECTION, **options)
+                logger.info(f"Created time-series collection '{WASTE_READINGS_COLLECTION}'.")
+                return
+            except Exception as e: # e.g. MongoDB < 5.0
+                logger.warning(f"Could not create '{WASTE_READINGS_COLLECTION}' as a time-series collection ({e}); using a regular collection.")
+        elif existing[0].get("type") == "timeseries":
+            db.command("collMod", WASTE_READINGS_COLLECTION, expireAfterSeconds=ttl_seconds or "off")
+            return
+
+        has_ttl_index = RAW_READINGS_TTL_INDEX in readings_collection.index_information()
+        if not ttl_seconds:
+            if has_ttl_index:
+                readings_collection.drop_index(RAW_READINGS_TTL_INDEX)
+        elif has_ttl_index:
+            db.command("collMod", WASTE_READINGS_COLLECTION, index={"name": RAW_READINGS_TTL_INDEX, "expireAfterSeconds": ttl_seconds})
+        else:
+            readings_collection.create_index("reading_timestamp", name=RAW_READINGS_TTL_INDEX, expireAfterSeconds=ttl_seconds)
+    except Exception as e:
+        logger.error(f"Error ensuring waste_readings storage and retention: {e}", exc_info=True)
+
 # --- Bin Information (Potentially needed by routing service) ---
 SAMPLE_BINS_DATA = [
     {"bin_id": "GH-ACC-BIN-001", "location": {"type": "Point", "coordinates": [-0.187, 5.605]}, "capacity_kg": 100, "capacity_liters": 240, "metadata": {"area": "Osu"}},
@@ -167,3 +521,142 @@ def get_all_bins() -> List[BinDocument]:
     except Exception as e:
         logger.error(f"Error fetching all bins: {e}", exc_info=True)
         return []
+
+# --- Geospatial Bin Queries ---
+# Served by the location_2dsphere index on bins, so a query touches only the bins in its area.
+# Coordinates are GeoJSON order ([longitude, latitude]) throughout.
+
+def bins_within_polygon_query(polygon: List[List[float]]) -> Dict:
+    """$geoWithin filter for bins inside a polygon ([longitude, latitude] vertices; the ring is closed if needed)."""
+    ring = [[float(longitude), float(latitude)] for longitude, latitude in polygon]
+    if ring and ring[0] != ring[-1]:
+        ring.append(ring[0])
+    if len(ring) < 4:
+        raise ValueError("A zone polygon needs at least 3 distinct vertices")
+    return {"location": {"$geoWithin": {"$geometry": {"type": "Polygon", "coordinates": [ring]}}}}
+
+def bins_near_query(longitude: float, latitude: float, max_distance_m: float) -> Dict:
+    """$nearSphere filter for bins within `max_distance_m` metres of a point, nearest first."""
+    return {"location": {"$nearSphere": {
+        "$geometry": {"type": "Point", "coordinates": [float(longitude), float(latitude)]},
+        "$maxDistance": float(max_distance_m),
+    }}}
+
+def service_zone_query(zone: ServiceZone, depot_latitude: Optional[float] = None,
+                       depot_longitude: Optional[float] = None) -> Dict:
+    """
+    Bins filter for a ServiceZone: its polygon, or its radius around `zone.center`
+    (default: the given depot). Raises ValueError if the zone is not usable.
+    """
+    if (zone.polygon is None) == (zone.radius_km is None):
+        raise ValueError("A zone needs exactly one of 'polygon' or 'radius_km'")
+    if zone.polygon is not None:
+        return bins_within_polygon_query(zone.polygon)
+    if zone.center is not None:
+        depot_latitude, depot_longitude = zone.center.latitude, zone.center.longitude
+    if depot_latitude is None or depot_longitude is None:
+        raise ValueError("A radius zone needs a center or a vehicle start_depot")
+    return bins_near_query(depot_longitude, depot_latitude, zone.radius_km * 1000)
+
+def get_bins_within_polygon(polygon: List[List[float]]) -> List[BinDocument]:
+    """Fetches the bins inside a polygon ([longitude, latitude] vertices)."""
+    try:
+        bins_cursor = get_collection(BINS_COLLECTION).find(bins_within_polygon_query(polygon))
+        return [BinDocument(**bin_data) for bin_data in bins_cursor]
+    except Exception as e:
+        logger.error(f"Error fetching bins within polygon {polygon}: {e}", exc_info=True)
+        return []
+
+def get_bins_near(longitude: float, latitude: float, max_distance_m: float) -> List[BinDocument]:
+    """Fetches the bins within `max_distance_m` metres of a point, nearest first."""
+    try:
+        bins_cursor = get_collection(BINS_COLLECTION).find(bins_near_query(longitude, latitude, max_distance_m))
+        return [BinDocument(**bin_data) for bin_data in bins_cursor]
+    except Exception as e:
+        logger.error(f"Error fetching bins within {max_distance_m} m of ({latitude}, {longitude}): {e}", exc_info=True)
+        return []
+
+# --- Trusted Read Fast Path ---
+# Opt-in variants of the reads above returning plain NamedTuple records (see models_pydantic)
+# built straight from projected documents, without Pydantic validation. Use them for large
+# reads from our own collections, whose documents were validated on the way in.
+
+BIN_RECORD_PROJECTION = {"_id": 0, "bin_id": 1, "location.coordinates": 1, "capacity_kg": 1, "capacity_liters": 1, "metadata.area": 1}
+VEHICLE_RECORD_PROJECTION = {"_id": 0, "vehicle_id": 1, "capacity_kg": 1, "start_depot": 1}
+
+def bin_record(doc: Dict) -> BinRecord:
+    longitude, latitude = doc["location"]["coordinates"] # GeoJSON order: [lon, lat]
+    return BinRecord(doc["bin_id"], longitude, latitude, doc.get("capacity_kg"), doc.get("capacity_liters"),
+                     (doc.get("metadata") or {}).get("area"))
+
+def fleet_vehicle_record(doc: Dict) -> FleetVehicleRecord:
+    depot = doc.get("start_depot") or {}
+    return FleetVehicleRecord(doc["vehicle_id"], doc["capacity_kg"], depot.get("latitude"), depot.get("longitude"))
+
+def waste_reading_record(doc: Dict) -> WasteReadingRecord:
+    return WasteReadingRecord(doc["bin_id"], doc["fill_level_percent"], doc["reading_timestamp"])
+
+def get_active_fleet_vehicle_records() -> List[FleetVehicleRecord]:
+    """Trusted-read variant of get_active_fleet_vehicles."""
+    try:
+        vehicles_cursor = get_collection(FLEET_VEHICLES_COLLECTION).find({"is_active": True}, VEHICLE_RECORD_PROJECTION)
+        return [fleet_vehicle_record(vehicle) for vehicle in vehicles_cursor]
+    except Exception as e:
+        logger.error(f"Error fetching active fleet vehicle records: {e}", exc_info=True)
+        return []
+
+def get_all_bin_records() -> List[BinRecord]:
+    """Trusted-read variant of get_all_bins."""
+    try:
+        return [bin_record(bin_data) for bin_data in get_collection(BINS_COLLECTION).find({}, BIN_RECORD_PROJECTION)]
+    except Exception as e:
+        logger.error(f"Error fetching all bin records: {e}", exc_info=True)
+        return []
+
+def get_bin_records_by_ids(bin_ids: List[str]) -> List[BinRecord]:
+    """Trusted-read variant of get_bins_by_ids."""
+    if not bin_ids:
+        return []
+    try:
+        bins_cursor = get_collection(BINS_COLLECTION).find({"bin_id": {"$in": bin_ids}}, BIN_RECORD_PROJECTION)
+        return [bin_record(bin_data) for bin_data in bins_cursor]
+    except Exception as e:
+        logger.error(f"Error fetching bin records by IDs {bin_ids}: {e}", exc_info=True)
+        return []
+
+def get_latest_waste_reading_records(bin_ids: List[str]) -> List[WasteReadingRecord]:
+    """Trusted-read variant of get_latest_waste_readings_for_bins."""
+    if not bin_ids:
+        return []
+    try:
+        states_cursor = get_collection(BIN_STATE_COLLECTION).find({"bin_id": {"$in": bin_ids}}, BIN_STATE_PROJECTION)
+        return [waste_reading_record(state) for state in states_cursor]
+    except Exception as e:
+        logger.error(f"Error fetching latest waste reading records for bins {bin_ids}: {e}", exc_info=True)
+        return []
+
+def get_bin_records_in_zone(zone_query: Dict) -> List[BinRecord]:
+    """Trusted-read bins matching a geo filter (see service_zone_query)."""
+    try:
+        return [bin_record(bin_data) for bin_data in get_collection(BINS_COLLECTION).find(zone_query, BIN_RECORD_PROJECTION)]
+    except Exception as e:
+        logger.error(f"Error fetching bin records in zone {zone_query}: {e}", exc_info=True)
+        return []
+
+# --- Route Plans (warm starts) ---
+
+def route_plan_key(vehicle_ids: List[str], zone: Optional[ServiceZone]) -> str:
+    """Stable key of a (fleet, zone) pair: the same active vehicles and zone map to the same plan."""
+    identity = {"vehicles": sorted(vehicle_ids), "zone": zone.dict() if zone else None}
+    return hashlib.sha1(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+
+def route_plan_document(plan_key: str, vehicle_ids: List[str], routes: List[List[str]], objective: Optional[int]) -> Dict[str, Any]:
+    """A stored plan: bin_ids per vehicle (aligned with vehicle_ids, empty routes included)."""
+    return {
+        "plan_key": plan_key,
+        "vehicle_ids": vehicle_ids,
+        "routes": routes,
+        "objective": objective,
+        "bin_count": sum(len(route) for route in routes),
+        "updated_at": datetime.utcnow(),
+    }
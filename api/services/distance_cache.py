@@ -0,0 +1,171 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Persistent cache of pairwise road distances (meters), stored in SQLite.
+# Bins and depots barely move, so once a pair has been fetched from the Maps API it is reused
+# for DISTANCE_CACHE_TTL_DAYS. Keys are coordinates quantized to DISTANCE_CACHE_PRECISION
+# decimals (5 decimals is ~1 m), so re-geocoded or float-noisy positions still hit.
+# When the cache holds more than DISTANCE_CACHE_MAX_ENTRIES pairs, the oldest are evicted.
+
+Point = Tuple[float, float] # (lat, lon)
+QuantizedPoint = Tuple[int, int]
+
+EVICT_TO_FRACTION = 0.9 # Evict down to this share of max_entries so eviction doesn't run on every write
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS distances (
+    origin_lat INTEGER NOT NULL,
+    origin_lon INTEGER NOT NULL,
+    destination_lat INTEGER NOT NULL,
+    destination_lon INTEGER NOT NULL,
+    meters INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (origin_lat, origin_lon, destination_lat, destination_lon)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS distances_fetched_at ON distances (fetched_at);
+"""
+
+class DistanceCache:
+    """
+    SQLite-backed (origin, destination) -> meters cache with TTL and size-based eviction.
+    Thread-safe (one connection guarded by a lock); callers in async code run it in a thread.
+    """
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int, precision: int = 5):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.scale = 10 ** precision
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL") # Readers don't block the writer (several API workers)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def quantize(self, point: Point) -> QuantizedPoint:
+        return (round(point[0] * self.scale), round(point[1] * self.scale))
+
+    def get_many(self, origins: List[Point], destinations: List[Point]) -> Dict[Tuple[int, int], int]:
+        """Returns {(origin index, destination index): meters} for the pairs cached and not expired."""
+        destination_indexes: Dict[QuantizedPoint, List[int]] = {}
+        for j, destination in enumerate(destinations):
+            destination_indexes.setdefault(self.quantize(destination), []).append(j)
+        origin_indexes: Dict[QuantizedPoint, List[int]] = {}
+        for i, origin in enumerate(origins):
+            origin_indexes.setdefault(self.quantize(origin), []).append(i)
+
+        found: Dict[Tuple[int, int], int] = {}
+        oldest = time.time() - self.ttl_seconds
+        with self._lock:
+            connection = self._connect()
+            for (origin_lat, origin_lon), rows in origin_indexes.items():
+                # Primary key prefix scan: every cached destination of this origin
+                cursor = connection.execute(
+                    "SELECT destination_lat, destination_lon, meters FROM distances "
+                    "WHERE origin_lat = ? AND origin_lon = ? AND fetched_at >= ?",
+                    (origin_lat, origin_lon, oldest),
+                )
+                for destination_lat, destination_lon, meters in cursor:
+                    for j in destination_indexes.get((destination_lat, destination_lon), ()):
+                        for i in rows:
+                            found[(i, j)] = meters
+            self.hits += len(found)
+            self.misses += len(origins) * len(destinations) - len(found)
+        return found
+
+    def put_many(self, entries: Iterable[Tuple[Point, Point, int]]):
+        """Stores (origin, destination, meters) entries, then evicts expired and excess pairs."""
+        now = time.time()
+        rows = [(*self.quantize(origin), *self.quantize(destination), int(meters), now)
+                for origin, destination, meters in entries]
+        if not rows:
+            return
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany("INSERT OR REPLACE INTO distances VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.stores += len(rows)
+            self._evict(connection, now)
+
+    def _evict(self, connection: sqlite3.Connection, now: float):
+        with connection:
+            evicted = connection.execute("DELETE FROM distances WHERE fetched_at < ?", (now - self.ttl_seconds,)).rowcount
+            count = connection.execute("SELECT COUNT(*) FROM distances").fetchone()[0]
+            if count > self.max_entries:
+                excess = count - int(self.max_entries * EVICT_TO_FRACTION)
+                # WITHOUT ROWID table: select the oldest pairs by primary key
+                evicted += connection.execute(
+                    "DELETE FROM distances WHERE (origin_lat, origin_lon, destination_lat, destination_lon) IN "
+                    "(SELECT origin_lat, origin_lon, destination_lat, destination_lon FROM distances ORDER BY fetched_at LIMIT ?)",
+                    (excess,),
+                ).rowcount
+        if evicted:
+            self.evictions += evicted
+            logger.info(f"Distance cache evicted {evicted} pairs.")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "ttl_seconds": self.ttl_seconds,
+                "max_entries": self.max_entries,
+            }
+
+_distance_cache: Optional[DistanceCache] = None
+
+def get_distance_cache() -> Optional[DistanceCache]:
+    """The process-wide cache, or None when DISTANCE_CACHE_PATH is empty (caching disabled)."""
+    global _distance_cache
+    if _distance_cache is None and settings.DISTANCE_CACHE_PATH:
+        _distance_cache = DistanceCache(
+            settings.DISTANCE_CACHE_PATH,
+            ttl_seconds=settings.DISTANCE_CACHE_TTL_DAYS * 86400,
+            max_entries=settings.DISTANCE_CACHE_MAX_ENTRIES,
+            precision=settings.DISTANCE_CACHE_PRECISION,
+        )
+    return _distance_cache
+
+def missing_blocks(n_origins: int, n_destinations: int, cached: Dict[Tuple[int, int], int]) -> List[Tuple[List[int], List[int]]]:
+    """
+    Groups the pairs missing from `cached` into (origin indexes, destination indexes) blocks, one per
+    distinct set of missing destinations. Adding k new points to n cached ones gives two blocks
+    (old origins x new destinations, new origins x all destinations) instead of a full n x n refetch.
+    """
+    groups: Dict[Tuple[int, ...], List[int]] = {}
+    for i in range(n_origins):
+        missing = tuple(j for j in range(n_destinations) if (i, j) not in cached)
+        if missing:
+            groups.setdefault(missing, []).append(i)
+    return [(origins, list(destinations)) for destinations, origins in groups.items()]
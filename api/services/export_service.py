@@ -0,0 +1,139 @@
+import asyncio
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+
+from ..config import settings
+from ..database import get_async_collection
+from ..responses import dumps_json
+from . import prediction_service
+from .data_service import BINS_COLLECTION, WASTE_READINGS_COLLECTION
+
+# Streaming NDJSON exports for dashboards (truck-dashboard, wms).
+# Collections are walked in keyset pages (`key > last key seen`, sorted on the key, limited to
+# EXPORT_PAGE_SIZE) instead of one long-lived cursor, so each query is a short index range scan,
+# no server cursor outlives a page, and a client whose download broke can resume from the key of
+# the last line it received. Only one page (and one gzip window) is held in memory at a time,
+# so memory stays flat however large the export is.
+
+# Fields an export may project; the keyset fields are always included
+BIN_EXPORT_FIELDS = ("bin_id", "location", "capacity_kg", "capacity_liters", "bin_type", "metadata")
+READING_EXPORT_FIELDS = ("_id", "bin_id", "reading_timestamp", "fill_level_percent")
+
+def export_projection(fields: Optional[Iterable[str]], allowed: Tuple[str, ...], keys: Tuple[str, ...]) -> Dict[str, int]:
+    """
+    Projection for the requested `fields` (all allowed fields when empty), always including the
+    keyset `keys`. Raises ValueError for fields that are not exported.
+    """
+    requested = [field for field in (fields or []) if field]
+    unknown = sorted(set(requested) - set(allowed))
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown}; exportable fields are {list(allowed)}")
+    projection = {field: 1 for field in list(keys) + (requested or list(allowed))}
+    if "_id" not in projection:
+        projection["_id"] = 0
+    return projection
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def ndjson_page(documents: List[Dict[str, Any]]) -> bytes:
+    """Encodes a page of documents as NDJSON (one JSON object per line)."""
+    return b"".join(dumps_json(document, default=_json_default) + b"\n" for document in documents)
+
+async def _keyset_pages(collection_name: str, query: Dict[str, Any], sort: List[Tuple[str, int]],
+                        projection: Dict[str, int], key_of, past_key, start_key=None, limit: Optional[int] = None,
+                        page_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yields pages of `query` in `sort` order. `key_of(document)` extracts a document's keyset key and
+    `past_key(key)` is the filter for documents sorting after it; the walk starts after `start_key`.
+    """
+    collection = get_async_collection(collection_name)
+    page_size = page_size or settings.EXPORT_PAGE_SIZE
+    key = start_key
+    remaining = limit
+    while remaining is None or remaining > 0:
+        page_query = query if key is None else ({"$and": [query, past_key(key)]} if query else past_key(key))
+        size = page_size if remaining is None else min(page_size, remaining)
+        page = await collection.find(page_query, projection).sort(sort).limit(size).to_list(length=None)
+        if page:
+            yield page
+        if len(page) < size:
+            return
+        key = key_of(page[-1])
+        if remaining is not None:
+            remaining -= len(page)
+
+def _after_bin_id(bin_id: str) -> Dict[str, Any]:
+    return {"bin_id": {"$gt": bin_id}}
+
+def _after_reading(key: Tuple[datetime, Any]) -> Dict[str, Any]:
+    reading_timestamp, object_id = key
+    return {"$or": [
+        {"reading_timestamp": {"$gt": reading_timestamp}},
+        {"reading_timestamp": reading_timestamp, "_id": {"$gt": object_id}},
+    ]}
+
+def iter_bin_pages(after: Optional[str] = None, fields: Optional[Iterable[str]] = None, limit: Optional[int] = None,
+                   page_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Bins ordered by bin_id (served by bin_id_unique), starting after bin_id `after`."""
+    projection = export_projection(fields, BIN_EXPORT_FIELDS, ("bin_id",))
+    return _keyset_pages(BINS_COLLECTION, {}, [("bin_id", 1)], projection, lambda doc: doc["bin_id"], _after_bin_id,
+                         after, limit, page_size)
+
+def iter_reading_pages(bin_id: Optional[str] = None, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       after: Optional[Tuple[datetime, str]] = None, fields: Optional[Iterable[str]] = None,
+                       limit: Optional[int] = None, page_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Readings in [start, end) ordered by (reading_timestamp, _id), optionally for one bin, starting
+    after the (reading_timestamp, _id) key `after`. Raises ValueError for a malformed `after` _id.
+    """
+    projection = export_projection(fields, READING_EXPORT_FIELDS, ("_id", "reading_timestamp"))
+    query: Dict[str, Any] = {}
+    if bin_id:
+        query["bin_id"] = bin_id
+    time_range = {}
+    if start:
+        time_range["$gte"] = start
+    if end:
+        time_range["$lt"] = end
+    if time_range:
+        query["reading_timestamp"] = time_range
+    if after is not None:
+        if not ObjectId.is_valid(after[1]):
+            raise ValueError(f"Invalid reading _id {after[1]!r}")
+        after = (after[0], ObjectId(after[1]))
+    return _keyset_pages(WASTE_READINGS_COLLECTION, query, [("reading_timestamp", 1), ("_id", 1)], projection,
+                         lambda doc: (doc["reading_timestamp"], doc["_id"]), _after_reading, after, limit, page_size)
+
+async def iter_prediction_pages(target_timestamp: datetime, after: Optional[str] = None, limit: Optional[int] = None,
+                                page_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Predicted fill level of every bin at `target_timestamp`, in bin_id order, one model call per page."""
+    async for page in iter_bin_pages(after, ["bin_id"], limit, page_size):
+        items = [(bin_doc["bin_id"], target_timestamp) for bin_doc in page]
+        # Model calls are CPU-bound; keep the event loop free for other requests meanwhile
+        predicted_levels = await asyncio.to_thread(prediction_service.predict_fill_levels_batch, items)
+        if predicted_levels is None:
+            predicted_levels = [-1.0] * len(items) # Same failure marker as POST /predict/fill-levels
+        yield [
+            {"bin_id": bin_id, "timestamp": timestamp, "predicted_fill_level_percent": predicted_level}
+            for (bin_id, timestamp), predicted_level in zip(items, predicted_levels)
+        ]
+
+async def ndjson_stream(pages: AsyncIterator[List[Dict[str, Any]]], compress: bool = False) -> AsyncIterator[bytes]:
+    """Encodes pages as NDJSON chunks (one chunk per page), gzip-compressed when `compress`."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None # gzip container
+    async for page in pages:
+        chunk = ndjson_page(page)
+        if compressor is not None:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        yield compressor.flush()
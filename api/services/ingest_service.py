@@ -0,0 +1,130 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from ..config import settings
+from ..models_pydantic import WasteReadingDocument, IngestBatchResult, IngestItemError, IngestResponse
+from . import async_data_service
+
+logger = logging.getLogger(__name__)
+
+# Bulk ingestion of sensor readings.
+# Request bodies (NDJSON streamed line by line, or a JSON array) are cut into batches that
+# are validated with one Pydantic call and written with one unordered insert_many each.
+# At most `max_in_flight` batches of a request are being written at a time; while they are,
+# the NDJSON body is not read any further, so a fast sender is slowed to the database's pace.
+
+MAX_REPORTED_ERRORS_PER_BATCH = 20
+
+_readings_adapter = TypeAdapter(List[WasteReadingDocument])
+
+def validate_readings(raw_items: List[Any]) -> Tuple[List[WasteReadingDocument], List[int], Dict[int, str]]:
+    """
+    Validates a batch in one call. Returns (valid readings, their indexes in `raw_items`, {index: error}
+    for invalid items). Only batches containing invalid items pay for a second validation pass.
+    """
+    try:
+        return _readings_adapter.validate_python(raw_items), list(range(len(raw_items))), {}
+    except ValidationError as e:
+        invalid: Dict[int, str] = {}
+        for error in e.errors():
+            index = error["loc"][0]
+            field = ".".join(str(part) for part in error["loc"][1:]) or "item"
+            invalid.setdefault(index, f"{field}: {error['msg']}")
+        valid_indexes = [index for index in range(len(raw_items)) if index not in invalid]
+        valid = _readings_adapter.validate_python([raw_items[index] for index in valid_indexes])
+        return valid, valid_indexes, invalid
+
+async def ingest_batch(batch_number: int, items: List[Tuple[int, Any]], parse_errors: Dict[int, str]) -> IngestBatchResult:
+    """
+    Validates and stores one batch. `items` are (position, decoded JSON value) pairs;
+    `parse_errors` maps positions that could not be decoded to their error.
+    """
+    positions = [position for position, _ in items]
+    readings, valid_indexes, invalid = validate_readings([value for _, value in items])
+    _, failed = await async_data_service.record_waste_readings(readings)
+
+    errors = dict(parse_errors)
+    errors.update({positions[index]: message for index, message in invalid.items()})
+    errors.update({positions[valid_indexes[index]]: message for index, message in failed.items()})
+    received = len(items) + len(parse_errors)
+    return IngestBatchResult(
+        batch=batch_number,
+        received=received,
+        accepted=received - len(errors),
+        rejected=len(errors),
+        errors=[IngestItemError(position=position, error=message)
+                for position, message in sorted(errors.items())[:MAX_REPORTED_ERRORS_PER_BATCH]],
+    )
+
+class _BatchPipeline:
+    """Runs batches concurrently with at most `max_in_flight` being written at once."""
+    def __init__(self, max_in_flight: int):
+        self._slots = asyncio.Semaphore(max(1, max_in_flight))
+        self._tasks: List[asyncio.Task] = []
+
+    async def submit(self, items: List[Tuple[int, Any]], parse_errors: Dict[int, str]):
+        await self._slots.acquire() # Backpressure: the caller stops reading input until a slot frees up
+        self._tasks.append(asyncio.create_task(self._run(len(self._tasks), items, parse_errors)))
+
+    async def _run(self, batch_number: int, items, parse_errors) -> IngestBatchResult:
+        try:
+            return await ingest_batch(batch_number, items, parse_errors)
+        finally:
+            self._slots.release()
+
+    async def results(self) -> IngestResponse:
+        batches = list(await asyncio.gather(*self._tasks))
+        return IngestResponse(
+            received=sum(batch.received for batch in batches),
+            accepted=sum(batch.accepted for batch in batches),
+            rejected=sum(batch.rejected for batch in batches),
+            batches=batches,
+        )
+
+async def ingest_ndjson(chunks: AsyncIterator[bytes], batch_size: int = None, max_in_flight: int = None) -> IngestResponse:
+    """Ingests a streamed NDJSON body (one reading per line; blank lines are skipped)."""
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    pipeline = _BatchPipeline(max_in_flight or settings.INGEST_MAX_IN_FLIGHT_BATCHES)
+    items: List[Tuple[int, Any]] = []
+    parse_errors: Dict[int, str] = {}
+    line_number = 0
+    pending = b""
+
+    async def add_line(line: bytes):
+        nonlocal items, parse_errors
+        if line.strip():
+            try:
+                items.append((line_number, json.loads(line)))
+            except ValueError as e:
+                parse_errors[line_number] = f"invalid JSON: {e}"
+            if len(items) + len(parse_errors) >= batch_size:
+                await pipeline.submit(items, parse_errors)
+                items, parse_errors = [], {}
+
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            line_number += 1
+            await add_line(line)
+    if pending:
+        line_number += 1
+        await add_line(pending)
+    if items or parse_errors:
+        await pipeline.submit(items, parse_errors)
+    return await pipeline.results()
+
+async def ingest_json_array(body: bytes, batch_size: int = None, max_in_flight: int = None) -> IngestResponse:
+    """Ingests a JSON array of readings. Raises ValueError if the body is not a JSON array."""
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    decoded = json.loads(body)
+    if not isinstance(decoded, list):
+        raise ValueError("Expected a JSON array of readings")
+    pipeline = _BatchPipeline(max_in_flight or settings.INGEST_MAX_IN_FLIGHT_BATCHES)
+    for start in range(0, len(decoded), batch_size):
+        await pipeline.submit(list(enumerate(decoded[start:start + batch_size], start)), {})
+    return await pipeline.results()
@@ -1,24 +1,27 @@
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
-
-try:
-    from sklearn.model_selection import train_test_split # If splitting for local validation
-    from sklearn.ensemble import GradientBoostingRegressor
-    SKLEARN_AVAILABLE = True
-except ImportError:
-    SKLEARN_AVAILABLE = False
-
-import joblib
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Dict, Any, List, Tuple
 import os
+import json
+import time
+import itertools
+import threading
+from collections import OrderedDict
 import logging
 
+from ..config import settings # For MODEL_RELOAD_CHECK_SECONDS
 from ..database import get_collection # Assuming get_collection is in database.py
-from ..models_pydantic import WasteReadingDocument # Pydantic model for validation if needed, though service might work with dicts
+from ..lazy_imports import lazy_module, is_available, preload
+from . import data_service # Collection names
+
+# Heavy ML dependencies are imported on first use, not at API import time (cold starts)
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+joblib = lazy_module("joblib")
+sklearn_ensemble = lazy_module("sklearn.ensemble")
+compiled_model = lazy_module(f"{__package__}.compiled_model")
+
+PANDAS_AVAILABLE = is_available("pandas")
+SKLEARN_AVAILABLE = is_available("sklearn")
 
 # Get a logger instance (assuming logger is set up in api.index or a shared logging config)
 logger = logging.getLogger(__name__)
@@ -26,33 +29,299 @@ logger = logging.getLogger(__name__)
 MODEL_DIR = "api/models_ml"
 MODEL_PATH = os.path.join(MODEL_DIR, "waste_predictor_ghana.joblib")
 
-# Ensure MODEL_DIR exists
-os.makedirs(MODEL_DIR, exist_ok=True)
+# Boosting stages added per incremental retrain, and the size at which we compact with a full refit
+INCREMENTAL_ESTIMATORS = 20
+MAX_INCREMENTAL_ESTIMATORS = 500
+
+# Features used both for training and prediction (order matters for the fitted model)
+PREDICTION_FEATURES = ['day_of_week', 'hour_of_day', 'day_of_year']
+
+# --- Process-wide Model Cache ---
+
+# Every model load gets a new token, so memoized predictions never outlive their model
+_model_load_tokens = itertools.count(1)
+
+def _model_file_signature(path: str):
+    """Returns (mtime_ns, size) for the model file, or None if it cannot be stat'ed."""
+    try:
+        stat_result = os.stat(path)
+        return (stat_result.st_mtime_ns, stat_result.st_size)
+    except OSError:
+        return None
 
-def fetch_waste_readings_data():
-    """Fetches all historical data from the waste_readings collection."""
+class ModelCache:
+    """
+    Holds the fill-level model in memory so predictions don't unpickle it on every call.
+    The model is reloaded only when the file's mtime/size changes or when the in-process
+    version is bumped (e.g. after /predict/retrain). The file is re-checked at most once
+    every `check_interval_seconds`, so steady-state predictions never touch the disk.
+    """
+    def __init__(self, check_interval_seconds: float = settings.MODEL_RELOAD_CHECK_SECONDS):
+        self.check_interval_seconds = check_interval_seconds
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drops the cached model and zeroes the counters."""
+        self._model = None
+        self._path: Optional[str] = None
+        self._signature = None
+        self._version = 0
+        self._loaded_version = -1
+        self._last_check = 0.0
+        self._token = None
+        self.hits = 0
+        self.reloads = 0
+        self.misses = 0
+
+    def invalidate(self):
+        """Bumps the model version so the next get() reloads from disk."""
+        with self._lock:
+            self._version += 1
+
+    def get(self, path: str):
+        """Returns the cached model for `path`, (re)loading it only if it changed. None if no model file exists."""
+        return self.get_with_token(path)[0]
+
+    def get_with_token(self, path: str) -> Tuple[Any, Optional[int]]:
+        """Like get(), but also returns a token that changes every time the model is (re)loaded."""
+        now = time.monotonic()
+        with self._lock:
+            if self._model is not None and self._path == path and self._loaded_version == self._version:
+                if now - self._last_check < self.check_interval_seconds:
+                    self.hits += 1
+                    return self._model, self._token
+                self._last_check = now
+                if _model_file_signature(path) == self._signature:
+                    self.hits += 1
+                    return self._model, self._token
+
+            if not self._file_exists(path):
+                self.misses += 1
+                self._model = None
+                return None, None
+
+            signature = _model_file_signature(path)
+            model = self._load(path)
+            self._model = model
+            self._path = path
+            self._signature = signature
+            self._loaded_version = self._version
+            self._last_check = now
+            self._token = next(_model_load_tokens)
+            self.reloads += 1
+            logger.info(f"Loaded prediction model from {path} (version {self._version}, reload #{self.reloads}).")
+            return model, self._token
+
+    def _file_exists(self, path: str) -> bool:
+        return os.path.exists(path)
+
+    def _load(self, path: str):
+        return joblib.load(path)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/reload counters for monitoring."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "reloads": self.reloads,
+                "misses": self.misses,
+                "version": self._version,
+                "loaded": self._model is not None,
+                "model_path": self._path,
+            }
+
+class CompiledModelCache(ModelCache):
+    """ModelCache for the compiled .npz artifact; loading it needs NumPy only (no sklearn/pandas, no unpickling)."""
+    def _file_exists(self, path: str) -> bool:
+        return os.path.isfile(path)
+
+    def _load(self, path: str):
+        return compiled_model.CompiledTreeEnsemble.from_file(path)
+
+class PredictionMemo:
+    """
+    Bounded LRU cache with TTL for predictions, keyed by (model token, engineered feature tuple).
+    Many bins share the same features for a given horizon, and dashboards/optimize runs
+    repeat the same requests, so most lookups avoid the model entirely.
+    """
+    def __init__(self, max_entries: int = settings.PREDICTION_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = settings.PREDICTION_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Drops all memoized predictions and zeroes the counters."""
+        self._entries: "OrderedDict[Tuple, Tuple[float, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple) -> Optional[float]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key] # Expired
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Tuple, value: float):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+model_cache = ModelCache() # Global instance shared by all requests in this process
+compiled_model_cache = CompiledModelCache()
+prediction_memo = PredictionMemo()
+
+def _compiled_model_path() -> str:
+    """Compiled (flat NumPy array) export written next to the joblib artifact."""
+    return os.path.splitext(MODEL_PATH)[0] + ".npz"
+
+def _invalidate_model_caches():
+    """Forces the next prediction to pick up freshly written artifacts."""
+    model_cache.invalidate()
+    compiled_model_cache.invalidate()
+    prediction_memo.clear()
+
+def get_model_cache_stats() -> Dict[str, Any]:
+    """Returns the model cache counters (hits, reloads, misses, version); compiled-model and prediction memo counters are nested."""
+    stats = model_cache.stats()
+    stats["compiled"] = compiled_model_cache.stats()
+    stats["predictions"] = prediction_memo.stats()
+    return stats
+
+# Only the fields training needs; everything else (incl. _id) stays in MongoDB
+TRAINING_DATA_PROJECTION = {"_id": 0, "reading_timestamp": 1, "fill_level_percent": 1}
+ROLLUP_TRAINING_PROJECTION = {"_id": 0, "bucket_start": 1, "count": 1, "sum_fill": 1}
+FETCH_BATCH_SIZE = 10000 # Documents per cursor batch / per NumPy conversion chunk
+
+def _append_chunk(column: "np.ndarray", size: int, chunk: "np.ndarray") -> "np.ndarray":
+    """Writes `chunk` at position `size`, doubling the column's capacity when it is full."""
+    needed = size + len(chunk)
+    if needed > len(column):
+        grown = np.empty(max(needed, 2 * len(column)), dtype=column.dtype)
+        grown[:size] = column[:size]
+        column = grown
+    column[size:needed] = chunk
+    return column
+
+def _rollup_query(query: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Maps a raw-readings query on reading_timestamp onto the hourly buckets' bucket_start."""
+    return {("bucket_start" if field == "reading_timestamp" else field): condition for field, condition in (query or {}).items()}
+
+def _open_hour_start() -> datetime:
+    """Start of the current hour's bucket, the one still receiving readings (naive UTC)."""
+    return data_service.bucket_start(datetime.utcnow(), "hourly")
+
+def _training_query(watermark: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """
+    Readings query for training: newer than `watermark` if given. With hourly rollups, only closed
+    buckets are used: the current hour's bucket keeps growing, and once the watermark reaches a
+    bucket's start it is never fetched again, so readings added to it later would never be trained.
+    """
+    condition: Dict[str, Any] = {}
+    if watermark:
+        condition["$gt"] = watermark
+    if settings.TRAINING_DATA_SOURCE == "hourly":
+        condition["$lt"] = _open_hour_start()
+    return {"reading_timestamp": condition} if condition else None
+
+def fetch_waste_readings_data(query: Optional[Dict[str, Any]] = None, batch_size: int = FETCH_BATCH_SIZE,
+                              source: Optional[str] = None):
+    """
+    Streams training data from the waste_readings collection, or from the hourly rollups
+    when `source` (default: settings.TRAINING_DATA_SOURCE) is "hourly".
+    Projects only the needed fields, pulls from the cursor in large batches and writes each
+    batch straight into growable NumPy columns, so peak memory tracks the numeric columns
+    rather than the raw BSON documents.
+    Rollup rows carry the bucket's mean fill level and a `reading_count` column used as the
+    sample weight: the model's features are constant within an hour, so a weighted fit on
+    hourly means matches a fit on the individual readings under squared error.
+    """
     if not PANDAS_AVAILABLE:
         logger.error("Cannot fetch data: pandas not available in this environment.")
         return None
-        
-    try:
-        waste_readings_collection = get_collection("waste_readings")
-        # Fetch all readings. For very large datasets, consider fetching in chunks or specific ranges.
-        readings_cursor = waste_readings_collection.find({})
-        readings_list = list(readings_cursor)
 
-        if not readings_list:
+    source = source or settings.TRAINING_DATA_SOURCE
+    from_rollups = source == "hourly"
+    try:
+        if from_rollups:
+            rollup_collection = get_collection(data_service.WASTE_READINGS_HOURLY_COLLECTION)
+            cursor = rollup_collection.find(_rollup_query(query), ROLLUP_TRAINING_PROJECTION, batch_size=batch_size)
+            rows = ((bucket.get("bucket_start"), bucket["sum_fill"] / bucket["count"], bucket["count"])
+                    for bucket in cursor if bucket.get("count"))
+        else:
+            waste_readings_collection = get_collection(data_service.WASTE_READINGS_COLLECTION)
+            cursor = waste_readings_collection.find(query or {}, TRAINING_DATA_PROJECTION, batch_size=batch_size)
+            rows = ((reading.get("reading_timestamp"), reading.get("fill_level_percent"), 1) for reading in cursor)
+
+        timestamps = np.empty(batch_size, dtype="datetime64[ms]")
+        fill_levels = np.empty(batch_size, dtype=np.float64)
+        counts = np.empty(batch_size, dtype=np.int64)
+        size = 0
+        # Small per-chunk scalar buffers; converted to NumPy and cleared every batch_size docs
+        chunk_timestamps, chunk_fill_levels, chunk_counts = [], [], []
+
+        def flush():
+            nonlocal timestamps, fill_levels, counts, size
+            timestamps = _append_chunk(timestamps, size, np.array(chunk_timestamps, dtype="datetime64[ms]"))
+            fill_levels = _append_chunk(fill_levels, size, np.array(chunk_fill_levels, dtype=np.float64))
+            counts = _append_chunk(counts, size, np.array(chunk_counts, dtype=np.int64))
+            size += len(chunk_timestamps)
+            chunk_timestamps.clear()
+            chunk_fill_levels.clear()
+            chunk_counts.clear()
+
+        for timestamp, fill_level, count in rows:
+            chunk_timestamps.append(timestamp)
+            chunk_fill_levels.append(fill_level)
+            chunk_counts.append(count)
+            if len(chunk_timestamps) >= batch_size:
+                flush()
+        if chunk_timestamps:
+            flush()
+
+        if size == 0:
             logger.warning("No waste readings found in the database.")
             return pd.DataFrame() # Return empty DataFrame
 
-        logger.info(f"Fetched {len(readings_list)} waste readings from MongoDB.")
-        return pd.DataFrame(readings_list)
+        columns = {
+            "reading_timestamp": timestamps[:size],
+            "fill_level_percent": fill_levels[:size],
+        }
+        if from_rollups:
+            columns["reading_count"] = counts[:size]
+            logger.info(f"Fetched {size} hourly buckets ({int(counts[:size].sum())} readings) from MongoDB.")
+        else:
+            logger.info(f"Fetched {size} waste readings from MongoDB.")
+        return pd.DataFrame(columns, copy=False)
     except Exception as e:
         logger.error(f"Error fetching waste readings: {e}", exc_info=True)
         # Depending on desired behavior, could return empty DF or re-raise
         return pd.DataFrame() if PANDAS_AVAILABLE else None
 
-def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
+def engineer_features(df: "pd.DataFrame") -> "pd.DataFrame":
     """Processes raw data and generates features from reading_timestamp."""
     if df.empty or 'reading_timestamp' not in df.columns: # fill_level_percent not needed for feature engineering only
         logger.warning("DataFrame is empty or missing 'reading_timestamp' for feature engineering.")
@@ -85,49 +354,185 @@ def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
     logger.info("Feature engineering complete.")
     return df
 
-def train_waste_prediction_model():
-    """Trains a GradientBoostingRegressor model and saves it."""
-    if not PANDAS_AVAILABLE or not SKLEARN_AVAILABLE:
-        logger.error("Cannot train model: Required ML libraries (pandas/sklearn) not available in this environment.")
-        return False
-        
-    df = fetch_waste_readings_data()
-    if df.empty:
-        logger.error("Cannot train model: No data fetched.")
-        return False
+def _training_state_path() -> str:
+    """Sidecar JSON next to the model artifact holding the training watermark."""
+    return os.path.splitext(MODEL_PATH)[0] + ".state.json"
 
+def load_training_state() -> Optional[Dict[str, Any]]:
+    """Returns the persisted training state (watermark etc.), or None if there is none."""
+    try:
+        with open(_training_state_path()) as state_file:
+            state = json.load(state_file)
+        if state.get("watermark"):
+            state["watermark"] = datetime.fromisoformat(state["watermark"])
+        return state
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable training state at {_training_state_path()}: {e}")
+        return None
+
+def _save_training_state(watermark: Optional[datetime], mode: str, rows: int, n_estimators: int):
+    """Persists the watermark (last reading_timestamp trained on) alongside the model."""
+    state = {
+        "watermark": watermark.isoformat() if watermark else None,
+        "mode": mode,
+        "rows_trained": rows,
+        "n_estimators": n_estimators,
+        "trained_at": datetime.utcnow().isoformat(),
+    }
+    state_path = _training_state_path()
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w") as state_file:
+        json.dump(state, state_file)
+    os.replace(tmp_path, state_path)
+
+def _save_model(model):
+    """
+    Writes the model artifact atomically: API workers reload it whenever it changes (ModelCache),
+    possibly while the training process is still writing, so they must never see a partial pickle.
+    """
+    tmp_path = f"{MODEL_PATH}.tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, MODEL_PATH)
+
+def _latest_reading_timestamp(df: "pd.DataFrame") -> Optional[datetime]:
+    """Returns the newest reading_timestamp in df as a datetime (None if unavailable)."""
+    if 'reading_timestamp' not in df.columns:
+        return None
+    latest = pd.to_datetime(df['reading_timestamp']).max()
+    return None if pd.isna(latest) else latest.to_pydatetime()
+
+def _export_compiled_model(model):
+    """Writes the compiled inference artifact; on failure removes any stale one so predictions fall back to joblib."""
+    compiled_path = _compiled_model_path()
+    try:
+        compiled_model.export_gradient_boosting(model, compiled_path)
+    except Exception as e:
+        logger.error(f"Error exporting compiled model to {compiled_path}: {e}", exc_info=True)
+        if os.path.exists(compiled_path):
+            os.remove(compiled_path)
+
+def _build_training_matrix(df: "pd.DataFrame"):
+    """
+    Engineers features and returns (X, y, sample_weight), or None if the data is not usable
+    for training. sample_weight is the per-row reading count for rollup data, else None.
+    """
     # Crucially, 'fill_level_percent' must exist in df before this step if it's the target
     if 'fill_level_percent' not in df.columns:
         logger.error("Cannot train model: 'fill_level_percent' target column missing from fetched data.")
-        return False
+        return None
 
-    df_featured = engineer_features(df.copy()) # Use .copy() to avoid SettingWithCopyWarning if df is a slice
+    df_featured = engineer_features(df) # df is not reused, so no defensive copy of the full history
     if df_featured.empty or 'fill_level_percent' not in df_featured.columns: # Check again after potential drops in engineer_features
         logger.error("Cannot train model: Feature engineering failed or target column 'fill_level_percent' missing post-engineering.")
-        return False
+        return None
 
     # Define features and target
     # For now, a simple model using only time-based features.
     # 'bin_id' could be included if properly encoded, or if training per-bin models.
-    features = ['day_of_week', 'hour_of_day', 'day_of_year']
+    features = PREDICTION_FEATURES
     target = 'fill_level_percent'
 
     if not all(feature in df_featured.columns for feature in features):
         logger.error(f"Cannot train model: Missing one or more features in the DataFrame. Required: {features}")
+        return None
+
+    sample_weight = df_featured['reading_count'] if 'reading_count' in df_featured.columns else None
+    return df_featured[features], df_featured[target], sample_weight
+
+def _fit_kwargs(sample_weight) -> Dict[str, Any]:
+    return {} if sample_weight is None else {"sample_weight": sample_weight}
+
+def _train_incremental() -> Optional[bool]:
+    """
+    Warm-starts the saved model on readings newer than the persisted watermark,
+    adding INCREMENTAL_ESTIMATORS boosting stages fitted on the new data only.
+    Returns None when an incremental update is not possible and a full refit is needed.
+    """
+    state = load_training_state()
+    if not state or not state.get("watermark") or not os.path.exists(MODEL_PATH):
+        logger.info("No saved model or training watermark found.")
+        return None
+
+    model = joblib.load(MODEL_PATH)
+    if not isinstance(model, sklearn_ensemble.GradientBoostingRegressor):
+        logger.info(f"Saved model ({type(model).__name__}) does not support warm-start updates.")
+        return None
+    if model.n_estimators + INCREMENTAL_ESTIMATORS > MAX_INCREMENTAL_ESTIMATORS:
+        logger.info(f"Model already has {model.n_estimators} stages (max {MAX_INCREMENTAL_ESTIMATORS}); compacting with a full refit.")
+        return None
+
+    watermark = state["watermark"]
+    df = fetch_waste_readings_data(_training_query(watermark))
+    if df.empty:
+        logger.info(f"No waste readings newer than watermark {watermark}; model is up to date.")
+        return True
+
+    training_matrix = _build_training_matrix(df)
+    if training_matrix is None:
+        return False
+    new_watermark = _latest_reading_timestamp(df) or watermark
+    X, y, sample_weight = training_matrix
+
+    try:
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + INCREMENTAL_ESTIMATORS)
+        model.fit(X, y, **_fit_kwargs(sample_weight))
+        _save_model(model) # Model first: the state (watermark) only ever describes a saved model
+        _export_compiled_model(model)
+        _save_training_state(new_watermark, "incremental", len(X), model.n_estimators)
+        _invalidate_model_caches()
+        logger.info(f"Waste prediction model updated incrementally with {len(X)} new readings (watermark {new_watermark}).")
+        return True
+    except Exception as e:
+        logger.error(f"Error during incremental model training or saving: {e}", exc_info=True)
+        return False
+
+def train_waste_prediction_model(incremental: bool = False):
+    """
+    Trains a GradientBoostingRegressor model and saves it.
+    With incremental=True, only readings newer than the persisted watermark are fetched
+    and the existing model is warm-started on them; this falls back to a full refit
+    when there is no usable saved model/watermark.
+    """
+    if not PANDAS_AVAILABLE or not SKLEARN_AVAILABLE:
+        logger.error("Cannot train model: Required ML libraries (pandas/sklearn) not available in this environment.")
+        return False
+
+    if incremental:
+        try:
+            result = _train_incremental()
+        except Exception as e:
+            logger.error(f"Incremental retraining failed unexpectedly: {e}", exc_info=True)
+            result = None
+        if result is not None:
+            return result
+        logger.info("Falling back to a full model refit.")
+
+    df = fetch_waste_readings_data(_training_query())
+    if df.empty:
+        logger.error("Cannot train model: No data fetched.")
         return False
 
-    X = df_featured[features]
-    y = df_featured[target]
+    watermark = _latest_reading_timestamp(df)
+    training_matrix = _build_training_matrix(df)
+    if training_matrix is None:
+        return False
+    X, y, sample_weight = training_matrix
 
     # Simple train/test split for local validation if desired, though for actual
     # retraining in prod, we might train on all available data.
     # X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     # For this function, let's train on all data passed.
 
-    model = GradientBoostingRegressor(n_estimators=100, learning_rate=0.1, max_depth=3, random_state=42)
+    model = sklearn_ensemble.GradientBoostingRegressor(n_estimators=100, learning_rate=0.1, max_depth=3, random_state=42)
     try:
-        model.fit(X, y)
-        joblib.dump(model, MODEL_PATH)
+        model.fit(X, y, **_fit_kwargs(sample_weight))
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        _save_model(model) # Model first: the state (watermark) only ever describes a saved model
+        _export_compiled_model(model)
+        _save_training_state(watermark, "full", len(X), model.n_estimators)
+        _invalidate_model_caches()
         logger.info(f"Waste prediction model trained and saved to {MODEL_PATH}")
         return True
     except Exception as e:
@@ -136,51 +541,131 @@ def train_waste_prediction_model():
 
 def predict_fill_levels(bin_id: str, future_timestamp: datetime) -> Optional[float]:
     """
-    Loads the saved model and predicts future fill level for a given bin and timestamp.
+    Predicts future fill level for a given bin and timestamp using the cached model.
     For this version, bin_id is logged but not directly used by the general model.
     A more advanced version might load a model specific to bin_id or use bin_id as a feature.
     """
+    predictions = predict_fill_levels_batch([(bin_id, future_timestamp)])
+    if predictions is None:
+        return None
+    logger.info(f"Prediction for bin {bin_id} at {future_timestamp}: {predictions[0]:.2f}%")
+    return predictions[0]
+
+# Timestamp -> feature extractors matching engineer_features (pandas dayofweek/hour/dayofyear)
+_TIME_FEATURE_EXTRACTORS = {
+    'day_of_week': lambda timestamp: timestamp.weekday(),
+    'hour_of_day': lambda timestamp: timestamp.hour,
+    'day_of_year': lambda timestamp: timestamp.timetuple().tm_yday,
+}
+
+def _time_feature_matrix(timestamps: List[datetime]) -> "np.ndarray":
+    """Builds the PREDICTION_FEATURES matrix for the given timestamps without pandas."""
+    extractors = [_TIME_FEATURE_EXTRACTORS[feature] for feature in PREDICTION_FEATURES]
+    return np.array([[extract(timestamp) for extract in extractors] for timestamp in timestamps], dtype=np.float64)
+
+def _compiled_predictor(timestamps: List[datetime]):
+    """
+    Returns (model_key, feature_matrix, predict_fn) for the compiled NumPy model,
+    or None if no usable compiled model is available.
+    """
     try:
-        if not os.path.exists(MODEL_PATH):
-            logger.error(f"Model file not found at {MODEL_PATH}. Train the model first.")
-            return None
+        compiled, token = compiled_model_cache.get_with_token(_compiled_model_path())
+    except Exception as e:
+        logger.warning(f"Could not load compiled model, falling back to joblib model: {e}")
+        return None
+    if compiled is None:
+        return None
+    if compiled.feature_names and compiled.feature_names != PREDICTION_FEATURES:
+        logger.warning(f"Compiled model features {compiled.feature_names} do not match {PREDICTION_FEATURES}; ignoring it.")
+        return None
+    return ("compiled", token), _time_feature_matrix(timestamps), compiled.predict
 
-        model = joblib.load(MODEL_PATH)
+def _joblib_predictor(timestamps: List[datetime]):
+    """
+    Returns (model_key, feature_matrix, predict_fn) for the pickled sklearn model, with
+    features built by engineer_features (needs pandas). None if the model or features are unavailable.
+    """
+    model, token = model_cache.get_with_token(MODEL_PATH)
+    if model is None:
+        logger.error(f"Model file not found at {MODEL_PATH}. Train the model first.")
+        return None
 
-        # Create a DataFrame for the single prediction point
-        features_df = pd.DataFrame([{
-            'reading_timestamp': pd.to_datetime(future_timestamp)
-            # 'bin_id': bin_id # If bin_id was a feature during training
-        }])
-        # Engineer features for this timestamp
-        # Pass only necessary columns to engineer_features if it expects specific ones
-        engineered_features_df = engineer_features(features_df.copy())
+    # One row per requested item; bin_id is not a model feature yet
+    features_df = pd.DataFrame({
+        'reading_timestamp': pd.to_datetime(timestamps)
+    })
+    engineered_features_df = engineer_features(features_df)
 
-        if engineered_features_df.empty:
-            logger.error("Failed to engineer features for prediction input.")
-            return None
+    if engineered_features_df.empty:
+        logger.error("Failed to engineer features for prediction input.")
+        return None
 
-        # Select the same features used for training
-        # (ensure this list matches the one in train_waste_prediction_model)
-        prediction_features = ['day_of_week', 'hour_of_day', 'day_of_year']
-        if not all(feature in engineered_features_df.columns for feature in prediction_features):
-            logger.error(f"Missing features for prediction. Required: {prediction_features}, Available: {engineered_features_df.columns.tolist()}")
-            return None
+    if not all(feature in engineered_features_df.columns for feature in PREDICTION_FEATURES):
+        logger.error(f"Missing features for prediction. Required: {PREDICTION_FEATURES}, Available: {engineered_features_df.columns.tolist()}")
+        return None
 
-        input_features = engineered_features_df[prediction_features]
+    # engineer_features sorts by timestamp; restore the caller's order
+    feature_matrix = engineered_features_df.sort_index()[PREDICTION_FEATURES].to_numpy(dtype=np.float64)
 
-        prediction = model.predict(input_features)
-        predicted_fill_level = prediction[0]
+    def predict(rows):
+        return model.predict(pd.DataFrame(rows, columns=PREDICTION_FEATURES))
 
-        # Ensure prediction is within logical bounds (0-100)
-        predicted_fill_level = max(0.0, min(100.0, predicted_fill_level))
+    return ("joblib", token), feature_matrix, predict
 
-        logger.info(f"Prediction for bin {bin_id} at {future_timestamp}: {predicted_fill_level:.2f}%")
-        return round(predicted_fill_level, 2)
+def predict_fill_levels_batch(items: List[Tuple[str, datetime]]) -> Optional[List[float]]:
+    """
+    Predicts fill levels for many (bin_id, timestamp) pairs with at most one model call.
+    Uses the compiled NumPy model when present (no sklearn/pandas needed), otherwise the
+    joblib model. Predictions are memoized per (model, feature vector): only distinct,
+    not-yet-cached feature rows reach the model. Values are clamped to 0-100 and returned
+    in input order. Returns None if the model or features are unavailable.
+    """
+    if not items:
+        return []
+    try:
+        timestamps = [timestamp for _, timestamp in items]
+        predictor = _compiled_predictor(timestamps) or _joblib_predictor(timestamps)
+        if predictor is None:
+            return None
+        model_key, feature_matrix, predict = predictor
+
+        # Group items by memo key; identical feature vectors are predicted once
+        positions_by_key: Dict[Tuple, List[int]] = {}
+        for position, row in enumerate(feature_matrix.tolist()):
+            positions_by_key.setdefault((model_key, *row), []).append(position)
+
+        predictions: List[Optional[float]] = [None] * len(items)
+        missing_keys = []
+        for key, positions in positions_by_key.items():
+            cached = prediction_memo.get(key)
+            if cached is None:
+                missing_keys.append(key)
+                continue
+            for position in positions:
+                predictions[position] = cached
+
+        if missing_keys:
+            rows = feature_matrix[[positions_by_key[key][0] for key in missing_keys]]
+            # Ensure predictions are within logical bounds (0-100)
+            values = np.round(np.clip(np.asarray(predict(rows), dtype=float), 0.0, 100.0), 2).tolist()
+            for key, value in zip(missing_keys, values):
+                prediction_memo.put(key, value)
+                for position in positions_by_key[key]:
+                    predictions[position] = value
+
+        logger.info(f"Batch prediction complete for {len(items)} items ({len(missing_keys)} computed by the model).")
+        return predictions
 
-    except FileNotFoundError: # This is redundant due to os.path.exists check, but good safeguard
-        logger.error(f"Model file not found (predict_fill_levels) at {MODEL_PATH}. Train the model first.")
-        return None
     except Exception as e:
-        logger.error(f"Error during prediction for bin {bin_id}: {e}", exc_info=True)
+        logger.error(f"Error during batch prediction for {len(items)} items: {e}", exc_info=True)
         return None
+
+def warm_up():
+    """
+    Imports the prediction stack and loads the model ahead of the first request.
+    Meant for long-running servers; serverless deploys skip it to keep cold starts short.
+    """
+    started = time.perf_counter()
+    preload(np, compiled_model)
+    predict_fill_levels_batch([("warm-up", datetime.utcnow())])
+    logger.info(f"Prediction service warmed up in {time.perf_counter() - started:.2f}s.")
@@ -0,0 +1,112 @@
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Cluster-first decomposition of large CVRPs (see routing_service.solve_decomposed).
+#
+# One OR-Tools model over thousands of bins grows superlinearly and gets nowhere near a good
+# solution within its time limit. Instead, stops are swept by angle around the depot and handed
+# to the vehicles in turn, each taking its capacity-proportional share of the total demand.
+# Consecutive vehicles are grouped into clusters of at most `max_cluster_stops` stops, and each
+# cluster is solved as its own small CVRP. The routes on either side of each boundary between
+# neighbouring clusters are then re-solved together, warm-started from the stitched routes, so
+# stops can move across the cut. Plain Python, like vrp_solver: no API imports.
+
+Point = Tuple[float, float] # (lat, lon)
+
+def sweep_positions(points: Sequence[Point], depot: int = 0) -> Dict[int, float]:
+    """
+    Angle (radians, 0 to 2*pi) of every stop around the depot, measured from the end of the widest
+    empty sector so that the sweep starts and ends where there are no stops to split.
+    """
+    lat0, lon0 = points[depot]
+    lon_scale = math.cos(math.radians(lat0)) # Equirectangular: a degree of longitude is shorter
+    angles = {node: math.atan2(lat - lat0, (lon - lon0) * lon_scale)
+              for node, (lat, lon) in enumerate(points) if node != depot}
+    if not angles:
+        return {}
+    ordered = sorted(angles.values())
+    gaps = [(ordered[(i + 1) % len(ordered)] - ordered[i]) % (2 * math.pi) for i in range(len(ordered))]
+    start = ordered[(max(range(len(gaps)), key=gaps.__getitem__) + 1) % len(ordered)]
+    return {node: (angle - start) % (2 * math.pi) for node, angle in angles.items()}
+
+def assign_vehicles(positions: Dict[int, float], demands: Sequence[int], capacities: Sequence[int]) -> Optional[List[List[int]]]:
+    """
+    Stops per vehicle, handed out in sweep order: each vehicle takes stops until it holds its share
+    of the total demand (capacity * total demand / total capacity) or the next one doesn't fit.
+    None when the stops don't all fit this way (demand too close to the fleet's total capacity).
+    """
+    order = sorted(positions, key=positions.__getitem__)
+    total_demand = sum(demands[node] for node in order)
+    total_capacity = sum(capacities)
+    if not capacities or total_demand > total_capacity:
+        return None
+    targets = [capacity * total_demand / total_capacity for capacity in capacities]
+
+    vehicle_stops: List[List[int]] = [[] for _ in capacities]
+    vehicle, load = 0, 0
+    for node in order:
+        demand = demands[node]
+        while vehicle < len(capacities) and (load + demand > capacities[vehicle] or (vehicle_stops[vehicle] and load >= targets[vehicle])):
+            vehicle, load = vehicle + 1, 0
+        if vehicle == len(capacities):
+            return None
+        vehicle_stops[vehicle].append(node)
+        load += demand
+    return vehicle_stops
+
+def group_clusters(vehicle_stops: List[List[int]], max_cluster_stops: int) -> List[List[int]]:
+    """Groups consecutive vehicles (sweep neighbours) into clusters of at most `max_cluster_stops` stops."""
+    clusters: List[List[int]] = []
+    current: List[int] = []
+    size = 0
+    for vehicle, stops in enumerate(vehicle_stops):
+        if current and size + len(stops) > max_cluster_stops:
+            clusters.append(current)
+            current, size = [], 0
+        current.append(vehicle)
+        size += len(stops)
+    if current:
+        clusters.append(current)
+    return clusters
+
+def boundary_vehicles(left: List[int], right: List[int], routes: List[List[int]], positions: Dict[int, float],
+                      per_side: int) -> List[int]:
+    """
+    The vehicles whose routes meet at the boundary between clusters `left` and `right`: the
+    `per_side` routes of `left` furthest along the sweep and the `per_side` of `right` least far.
+    """
+    def mean_position(vehicle):
+        return sum(positions[node] for node in routes[vehicle]) / len(routes[vehicle])
+    left_side = sorted((vehicle for vehicle in left if routes[vehicle]), key=mean_position)[-per_side:]
+    right_side = sorted((vehicle for vehicle in right if routes[vehicle]), key=mean_position)[:per_side]
+    return left_side + right_side
+
+def build_subproblem(depot: int, stops: List[int], vehicles: List[int], demands: Sequence[int], capacities: Sequence[int],
+                     distance_matrix: List[List[int]], time_limit_seconds: float,
+                     routes: Optional[List[List[int]]] = None) -> Dict[str, Any]:
+    """
+    A vrp_solver problem over the depot and `stops` (node indexes of the full problem) for
+    `vehicles`; `distance_matrix` covers [depot] + stops in that order. With `routes` (full-problem
+    nodes, one list per vehicle), the search is warm-started from them.
+    """
+    problem = {
+        "distance_matrix": distance_matrix,
+        "demands": [0] + [demands[node] for node in stops],
+        "vehicle_capacities": [capacities[vehicle] for vehicle in vehicles],
+        "num_vehicles": len(vehicles),
+        "depot": 0,
+        "time_limit_seconds": time_limit_seconds,
+    }
+    if routes is not None:
+        local_node = {node: i for i, node in enumerate(stops, start=1)}
+        problem["initial_routes"] = [[local_node[node] for node in route] for route in routes]
+        problem["warm_start_time_limit_seconds"] = time_limit_seconds
+    return problem
+
+def route_cost(distance_matrix: List[List[int]], route: List[int], depot: int = 0) -> int:
+    """Length of depot -> route -> depot."""
+    cost, previous = 0, depot
+    for node in route + [depot]:
+        cost += distance_matrix[previous][node]
+        previous = node
+    return cost
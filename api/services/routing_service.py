@@ -1,96 +1,554 @@
-import httpx # For Google Maps API call
+import asyncio
 import math
+import random
+import threading
+import time
 import logging
-from typing import List, Dict, Tuple, Any, Optional
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Dict, Tuple, Any, Optional
 from fastapi import HTTPException # For raising HTTP errors within service
 
-try:
-    from ortools.constraint_solver import routing_enums_pb2
-    from ortools.constraint_solver import pywrapcp
-    ORTOOLS_AVAILABLE = True
-except ImportError:
-    ORTOOLS_AVAILABLE = False
-    # Create dummy classes for type hints when ortools is not available
-    routing_enums_pb2 = None
-    pywrapcp = None
-
 from ..config import settings # For MAPS_API_KEY_GHANA
 # Assuming Pydantic models for input/output clarity if complex, or use TypedDicts
 from ..models_pydantic import RouteStop
+from ..lazy_imports import lazy_module, is_available, preload
+from . import async_data_service, distance_cache, distance_providers, route_decomposition, vrp_solver
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+# OR-Tools and httpx are imported on first use, not at API import time (cold starts)
+httpx = lazy_module("httpx") # For Google Maps API call
+routing_enums_pb2 = lazy_module("ortools.constraint_solver.routing_enums_pb2")
+pywrapcp = lazy_module("ortools.constraint_solver.pywrapcp")
+ORTOOLS_AVAILABLE = is_available("ortools")
 
 logger = logging.getLogger(__name__)
 
+def warm_up():
+    """Imports OR-Tools and httpx and starts the solver processes ahead of the first optimization request (long-running servers)."""
+    started = time.perf_counter()
+    preload(httpx)
+    if ORTOOLS_AVAILABLE:
+        preload(routing_enums_pb2, pywrapcp)
+        if settings.ROUTING_SOLVER_WORKERS > 0:
+            executor = _get_solver_executor()
+            for _ in range(settings.ROUTING_SOLVER_WORKERS):
+                executor.submit(vrp_solver.warm_up) # Spawns the workers and imports OR-Tools in them
+    logger.info(f"Routing service warmed up in {time.perf_counter() - started:.2f}s.")
+
+# --- Google Distance Matrix ---
+# Large matrices are split into tiles within the API's per-request limits (origins, destinations,
+# elements, URL length), fetched concurrently through one pooled keep-alive client and stitched
+# back together. OVER_QUERY_LIMIT (rate limit) and transient HTTP errors retry with backoff.
+
+DISTANCE_MATRIX_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+# Origins (or destinations) per request; 25 + 25 coordinates also keep the URL far below its 8192 character limit
+MAX_DISTANCE_MATRIX_DIMENSION = 25
+NO_ROUTE_PENALTY = distance_providers.NO_ROUTE_PENALTY # Distance used when Google finds no route between two points
+RETRYABLE_MATRIX_STATUSES = ("OVER_QUERY_LIMIT", "UNKNOWN_ERROR")
+RETRYABLE_HTTP_STATUSES = (429, 500, 502, 503, 504)
+
+class DistanceMatrixError(Exception):
+    """A distance matrix request failed for good (non-retryable status, or retries exhausted)."""
+
+_http_client: Optional["httpx.AsyncClient"] = None
+_http_client_loop = None
+
+def _new_http_client() -> "httpx.AsyncClient":
+    return httpx.AsyncClient(
+        timeout=settings.DISTANCE_MATRIX_TIMEOUT_SECONDS,
+        limits=httpx.Limits(max_connections=settings.DISTANCE_MATRIX_CONCURRENCY,
+                            max_keepalive_connections=settings.DISTANCE_MATRIX_CONCURRENCY),
+    )
+
+def get_http_client() -> "httpx.AsyncClient":
+    """Process-wide pooled client for the Maps APIs (recreated if the event loop changed)."""
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        _http_client = _new_http_client()
+        _http_client_loop = loop
+    return _http_client
+
+async def close_http_client():
+    """Closes the shared client (called on app shutdown)."""
+    global _http_client, _http_client_loop
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client, _http_client_loop = None, None
+
+def _format_locations(points: List[Tuple[float, float]]) -> str:
+    return "|".join(f"{lat:.6f},{lng:.6f}" for lat, lng in points)
+
+def plan_distance_matrix_tiles(n_origins: int, n_destinations: int, max_elements: Optional[int] = None,
+                               max_dimension: int = MAX_DISTANCE_MATRIX_DIMENSION) -> List[Tuple[range, range]]:
+    """
+    Splits an n_origins x n_destinations matrix into (origin range, destination range) tiles of at
+    most `max_elements` elements and `max_dimension` origins/destinations each, as square as possible.
+    """
+    max_elements = max_elements or settings.DISTANCE_MATRIX_MAX_ELEMENTS
+    side = max(1, min(max_dimension, math.isqrt(max_elements)))
+    rows = min(n_origins, side)
+    cols = min(n_destinations, max_dimension, max_elements // max(rows, 1))
+    rows = min(n_origins, max_dimension, max_elements // max(cols, 1)) # Use the room a narrow matrix leaves
+    return [(range(row, min(row + rows, n_origins)), range(col, min(col + cols, n_destinations)))
+            for row in range(0, n_origins, rows) for col in range(0, n_destinations, cols)]
+
+async def _fetch_distance_tile(client: "httpx.AsyncClient", semaphore: asyncio.Semaphore,
+                               origins: List[Tuple[float, float]], destinations: List[Tuple[float, float]],
+                               api_key: str, region: str) -> List[List[int]]:
+    """Fetches one tile (distances in meters), retrying rate-limit and transient errors with backoff."""
+    params = {"origins": _format_locations(origins), "destinations": _format_locations(destinations),
+              "key": api_key, "region": region, "units": "metric"}
+    for attempt in range(settings.DISTANCE_MATRIX_MAX_RETRIES + 1):
+        retry_reason = None
+        async with semaphore: # Held for the request only, never while backing off
+            try:
+                response = await client.get(DISTANCE_MATRIX_URL, params=params)
+            except httpx.TransportError as e:
+                retry_reason = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code in RETRYABLE_HTTP_STATUSES:
+                    retry_reason = f"HTTP {response.status_code}"
+                else:
+                    response.raise_for_status()
+                    data = response.json()
+                    status = data.get("status")
+                    if status == "OK":
+                        return [
+                            [element["distance"]["value"] if element.get("status") == "OK" else NO_ROUTE_PENALTY
+                             for element in row["elements"]]
+                            for row in data["rows"]
+                        ]
+                    if status not in RETRYABLE_MATRIX_STATUSES:
+                        raise DistanceMatrixError(f"Google Maps API Error: {status}. {data.get('error_message', '')}")
+                    retry_reason = status
+        if attempt == settings.DISTANCE_MATRIX_MAX_RETRIES:
+            break
+        delay = settings.DISTANCE_MATRIX_BACKOFF_SECONDS * (2 ** attempt) * (1 + random.random()) # Jitter spreads retries out
+        logger.warning(f"Distance matrix tile {len(origins)}x{len(destinations)} failed ({retry_reason}); retry {attempt + 1} in {delay:.2f}s.")
+        await asyncio.sleep(delay)
+    raise DistanceMatrixError(f"Distance matrix request failed after {settings.DISTANCE_MATRIX_MAX_RETRIES + 1} attempts: {retry_reason}")
+
 async def get_distance_matrix(
     origins: List[Tuple[float, float]], # List of (lat, lon) tuples
     destinations: List[Tuple[float, float]],
     api_key: str,
-    region: str = "GH" # Ghana localization
+    region: str = "GH", # Ghana localization
+    semaphore: Optional[asyncio.Semaphore] = None, # Shared by concurrent calls to bound their combined requests
 ) -> List[List[int]]: # Returns matrix of distances in meters
     """
-    Fetches a distance matrix from Google Maps Distance Matrix API.
-    Returns distances in meters.
+    Fetches a distance matrix from Google Maps Distance Matrix API, in concurrent tiles.
+    Returns distances in meters (NO_ROUTE_PENALTY where Google finds no route).
     """
     if not origins or not destinations:
         logger.warning("Origins or destinations list is empty for distance matrix.")
         return [[]]
 
-    # Format origins and destinations for API: "lat,lng|lat,lng|..."
-    origins_str = "|".join([f"{lat},{lng}" for lat, lng in origins])
-    destinations_str = "|".join([f"{lat},{lng}" for lat, lng in destinations])
-
-    # Max elements (origins x destinations) is typically 100 for standard API users,
-    # or origins + destinations <= 25. Check current Google Docs for limits.
-    # If num_origins * num_destinations > 100 (e.g. 10x10), batching is needed.
-    # For a single matrix (all origins to all destinations), num_origins = num_destinations.
-    # So, if len(origins) > 10 for a square matrix, batching would be needed.
-    # This PoC assumes the number of locations is within typical free tier limits (e.g. up to 25x25 for some APIs or 10x10 for others).
-    # For a real application, robust batching logic is crucial.
-
-    url = (
-        f"https://maps.googleapis.com/maps/api/distancematrix/json?"
-        f"origins={origins_str}&destinations={destinations_str}"
-        f"&key={api_key}&region={region}&units=metric" # units=metric for meters/km
-    )
-
-    matrix = [[0] * len(destinations) for _ in range(len(origins))]
-
+    tiles = plan_distance_matrix_tiles(len(origins), len(destinations))
+    client = get_http_client()
+    semaphore = semaphore or asyncio.Semaphore(settings.DISTANCE_MATRIX_CONCURRENCY)
+    started = time.perf_counter()
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            response.raise_for_status() # Raise an exception for HTTP errors 4xx/5xx
-            data = response.json()
-
-        if data['status'] != 'OK':
-            error_message = data.get('error_message', '')
-            logger.error(f"Google Maps Distance Matrix API error: {data['status']} - {error_message}")
-            # Fallback to Haversine or raise error based on policy
-            raise Exception(f"Google Maps API Error: {data['status']}. {error_message}")
-
-        for i, row in enumerate(data['rows']):
-            if row['elements'][0].get('status') == 'ZERO_RESULTS': # Check if entire row has no results
-                 logger.warning(f"Google Maps API returned ZERO_RESULTS for origin {i} ({origins[i]}). Using large penalty for all destinations from this origin.")
-                 for j_idx in range(len(destinations)):
-                     matrix[i][j_idx] = 999999999 # Large penalty
-                 continue
-
-            for j, element in enumerate(row['elements']):
-                if element['status'] == 'OK':
-                    # Get distance in meters
-                    matrix[i][j] = element['distance']['value']
-                else:
-                    # Handle cases where a route between two points is not found
-                    logger.warning(f"No route found by Google Maps between origin {i} ({origins[i]}) and destination {j} ({destinations[j]}). Status: {element['status']}. Using large penalty.")
-                    matrix[i][j] = 999999999 # Large penalty for no route
-        return matrix
-    except httpx.RequestError as e:
-        logger.error(f"HTTPX Request error calling Google Maps API: {e}", exc_info=True)
-        raise # Re-raise to be handled by the calling function
+        results = await asyncio.gather(*[
+            _fetch_distance_tile(client, semaphore, [origins[i] for i in rows], [destinations[j] for j in cols], api_key, region)
+            for rows, cols in tiles
+        ])
     except httpx.HTTPStatusError as e:
         logger.error(f"HTTP Status error calling Google Maps API: {e.response.status_code} - {e.response.text}", exc_info=True)
         raise
     except Exception as e:
-        logger.error(f"Error processing Google Maps API response: {e}", exc_info=True)
-        raise # Re-raise
+        logger.error(f"Error fetching distance matrix: {e}", exc_info=True)
+        raise
+
+    matrix = [[0] * len(destinations) for _ in range(len(origins))]
+    for (rows, cols), tile in zip(tiles, results):
+        for row_index, tile_row in zip(rows, tile):
+            matrix[row_index][cols.start:cols.stop] = tile_row
+    logger.info(f"Fetched {len(origins)}x{len(destinations)} distance matrix in {len(tiles)} tiles ({time.perf_counter() - started:.2f}s).")
+    return matrix
+
+async def get_cached_distance_matrix(
+    origins: List[Tuple[float, float]],
+    destinations: List[Tuple[float, float]],
+    api_key: str,
+    region: str = "GH",
+    semaphore: Optional[asyncio.Semaphore] = None, # As in get_distance_matrix
+) -> List[List[int]]:
+    """
+    get_distance_matrix backed by the persistent distance cache: only pairs missing from the
+    cache (or expired) are requested from the Maps API, and the fetched ones are stored.
+    """
+    cache = distance_cache.get_distance_cache()
+    if cache is None or not origins or not destinations:
+        return await get_distance_matrix(origins, destinations, api_key, region, semaphore=semaphore)
+
+    try:
+        cached = await asyncio.to_thread(cache.get_many, origins, destinations)
+    except Exception as e:
+        logger.error(f"Distance cache lookup failed, fetching the full matrix: {e}", exc_info=True)
+        cached = {}
+    blocks = distance_cache.missing_blocks(len(origins), len(destinations), cached)
+
+    semaphore = semaphore or asyncio.Semaphore(settings.DISTANCE_MATRIX_CONCURRENCY)
+    fetched = await asyncio.gather(*[
+        get_distance_matrix([origins[i] for i in rows], [destinations[j] for j in cols], api_key, region, semaphore=semaphore)
+        for rows, cols in blocks
+    ])
+
+    matrix = [[cached.get((i, j), 0) for j in range(len(destinations))] for i in range(len(origins))]
+    new_entries = []
+    for (rows, cols), block in zip(blocks, fetched):
+        for i, block_row in zip(rows, block):
+            for j, meters in zip(cols, block_row):
+                matrix[i][j] = meters
+                if meters != NO_ROUTE_PENALTY: # "No route" may be transient; ask again next time
+                    new_entries.append((origins[i], destinations[j], meters))
+    if new_entries:
+        try:
+            await asyncio.to_thread(cache.put_many, new_entries)
+        except Exception as e:
+            logger.error(f"Could not store {len(new_entries)} distances in the cache: {e}", exc_info=True)
+    logger.info(f"Distance matrix {len(origins)}x{len(destinations)}: {len(cached)} pairs cached, "
+                f"{sum(len(rows) * len(cols) for rows, cols in blocks)} fetched in {len(blocks)} blocks.")
+    return matrix
+
+# --- Distance providers ---
+# The matrix comes from a pluggable provider (see distance_providers): "google" (Maps API with the
+# persistent cache), "haversine" or "road_graph" (offline). The provider is chosen per request or
+# by DISTANCE_PROVIDER; when it fails (no Maps key, API down), DISTANCE_PROVIDER_FALLBACK is used.
+
+DISTANCE_PROVIDERS = ("google",) + distance_providers.LOCAL_PROVIDERS
+
+class GoogleMapsDistanceProvider(distance_providers.DistanceProvider):
+    """Road distances from the Google Distance Matrix API, through the persistent distance cache."""
+    name = "google"
+
+    def __init__(self, api_key: Optional[str], region: str = "GH", semaphore: Optional[asyncio.Semaphore] = None):
+        self.api_key = api_key
+        self.region = region
+        self.semaphore = semaphore # Bounds requests across concurrent get_matrix calls (one per call if None)
+
+    def matrix(self, origins, destinations):
+        # The Maps client, its semaphore and the cache fetches belong to the API's event loop
+        raise NotImplementedError("The Google provider is async-only; await get_matrix() instead.")
+
+    async def get_matrix(self, origins, destinations) -> List[List[int]]:
+        if not self.api_key or self.api_key == "dummy_key": # config substitutes "dummy_key" when the key is unset
+            raise DistanceMatrixError("Google Maps API key (MAPS_API_KEY_GHANA) is not configured.")
+        return await get_cached_distance_matrix(list(origins), list(destinations), self.api_key, self.region,
+                                                semaphore=self.semaphore)
+
+def get_distance_provider(name: Optional[str] = None,
+                          semaphore: Optional[asyncio.Semaphore] = None) -> distance_providers.DistanceProvider:
+    """
+    The provider called `name` (default: DISTANCE_PROVIDER). Raises ValueError for unknown names.
+    `semaphore` bounds the Maps API requests of concurrent fetches ("google" only).
+    """
+    name = (name or settings.DISTANCE_PROVIDER).lower()
+    if name == "google":
+        return GoogleMapsDistanceProvider(settings.MAPS_API_KEY_GHANA, region="GH", semaphore=semaphore)
+    if name not in DISTANCE_PROVIDERS:
+        raise ValueError(f"Unknown distance provider {name!r}; expected one of {list(DISTANCE_PROVIDERS)}")
+    return distance_providers.create_local_provider(name, road_graph_path=settings.ROAD_GRAPH_PATH,
+                                                    circuity=settings.HAVERSINE_CIRCUITY_FACTOR)
+
+async def get_provider_distance_matrix(
+    points: List[Tuple[float, float]],
+    provider_name: Optional[str] = None,
+    semaphore: Optional[asyncio.Semaphore] = None, # See get_distance_provider
+) -> Tuple[List[List[int]], str]:
+    """
+    Full points x points matrix from the requested provider, or from DISTANCE_PROVIDER_FALLBACK if
+    that one fails. Returns (matrix, name of the provider that produced it).
+    """
+    provider = get_distance_provider(provider_name, semaphore)
+    try:
+        return await provider.get_matrix(points, points), provider.name
+    except Exception as e:
+        fallback_name = (settings.DISTANCE_PROVIDER_FALLBACK or "").lower()
+        if not fallback_name or fallback_name == provider.name:
+            raise
+        logger.warning(f"Distance provider '{provider.name}' failed ({e}); falling back to '{fallback_name}'.")
+        fallback = get_distance_provider(fallback_name, semaphore)
+        return await fallback.get_matrix(points, points), fallback.name
+
+# --- Solver process pool ---
+# OR-Tools holds the GIL for the whole search, so a solve in the API process would stall every
+# request (health checks included) for up to the time limit. Solves instead run on a serialized
+# problem (see vrp_solver) in a pool of ROUTING_SOLVER_WORKERS spawned processes; up to
+# ROUTING_SOLVER_MAX_QUEUED more may wait, beyond which requests are turned away with a 503.
+# When the client disconnects, a queued solve is dropped and a running one is stopped at the next
+# solution its search finds, through a per-slot cancel flag shared with the workers.
+# Slots are (pool generation, index) pairs: once a broken pool is replaced, late releases and
+# cancels of the old pool's slots are ignored instead of touching the new pool's free list or flags.
+
+SOLVER_DISCONNECT_POLL_SECONDS = 0.5
+
+class SolverBusyError(Exception):
+    """Every solver slot (running or queued) is taken."""
+
+class SolveCancelledError(Exception):
+    """The solve was cancelled because the client went away."""
+
+SolverSlot = Tuple[int, int] # (pool generation, cancel flag index)
+
+_solver_executor: Optional["ProcessPoolExecutor"] = None
+_solver_pool_generation = 0
+_solver_cancel_flags = None
+_solver_slots_lock = threading.Lock() # Slots are released from the executor's callback thread
+_free_solver_slots: List[SolverSlot] = []
+_solver_slot_futures: Dict[SolverSlot, Any] = {}
+
+def _get_solver_executor() -> "ProcessPoolExecutor":
+    """Lazily creates the solver process pool and its shared cancel flags."""
+    global _solver_executor, _solver_pool_generation, _solver_cancel_flags, _free_solver_slots
+    if _solver_executor is None:
+        # Imported here: multiprocessing is only needed once a route is optimized
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # spawn: workers start clean (OR-Tools only) instead of forking the API with its clients and threads
+        context = multiprocessing.get_context("spawn")
+        slots = settings.ROUTING_SOLVER_WORKERS + settings.ROUTING_SOLVER_MAX_QUEUED
+        with _solver_slots_lock:
+            _solver_pool_generation += 1
+            _solver_cancel_flags = context.RawArray("b", slots)
+            _free_solver_slots = [(_solver_pool_generation, index) for index in range(slots)]
+            _solver_slot_futures.clear()
+        _solver_executor = ProcessPoolExecutor(max_workers=settings.ROUTING_SOLVER_WORKERS, mp_context=context,
+                                               initializer=vrp_solver.init_worker, initargs=(_solver_cancel_flags,))
+    return _solver_executor
+
+def shutdown_solver_executor():
+    """Cancels queued and running solves and stops the solver pool (called on app shutdown)."""
+    global _solver_executor
+    if _solver_executor is not None:
+        for slot in range(len(_solver_cancel_flags)):
+            _solver_cancel_flags[slot] = 1
+        _solver_executor.shutdown(wait=False, cancel_futures=True)
+        _solver_executor = None
+
+def _release_solver_slot(slot: SolverSlot):
+    with _solver_slots_lock:
+        if slot[0] != _solver_pool_generation: # Belongs to a pool that was replaced
+            return
+        _solver_slot_futures.pop(slot, None)
+        _solver_cancel_flags[slot[1]] = 0
+        _free_solver_slots.append(slot)
+
+def _cancel_solve(future, slot: SolverSlot):
+    if future.cancel(): # Still queued: never starts
+        return
+    with _solver_slots_lock:
+        # Still running (the slot wasn't reused meanwhile) in the current pool
+        if slot[0] == _solver_pool_generation and _solver_slot_futures.get(slot) is future:
+            _solver_cancel_flags[slot[1]] = 1
+
+def _acquire_solver_slots(wanted: int) -> List[SolverSlot]:
+    """Takes up to `wanted` free slots (at least one, else SolverBusyError)."""
+    with _solver_slots_lock:
+        if not _free_solver_slots:
+            raise SolverBusyError(f"All {len(_solver_cancel_flags)} route solver slots are busy.")
+        slots = _free_solver_slots[-wanted:]
+        del _free_solver_slots[-wanted:]
+    return slots
+
+async def _solve_in_slot(executor, problem: Dict[str, Any], slot: SolverSlot,
+                         is_disconnected: Optional[Callable[[], Awaitable[bool]]]) -> Dict[str, Any]:
+    """
+    Solves `problem` in a slot the caller holds, and leaves it held once the result is in. If the
+    solve fails or is abandoned (client gone, task cancelled), it is cancelled and the slot is
+    released as soon as its worker lets go of it.
+    """
+    try:
+        future = executor.submit(vrp_solver.solve_in_worker, problem, slot[1])
+    except Exception:
+        _release_solver_slot(slot)
+        raise
+    with _solver_slots_lock:
+        if slot[0] == _solver_pool_generation:
+            _solver_slot_futures[slot] = future
+
+    waiter = asyncio.wrap_future(future)
+    try:
+        while True:
+            done, _ = await asyncio.wait({waiter}, timeout=SOLVER_DISCONNECT_POLL_SECONDS)
+            if done:
+                return waiter.result()
+            if is_disconnected is not None and await is_disconnected():
+                raise SolveCancelledError("Client disconnected")
+    except BaseException: # Client gone, this request's task was cancelled, or the worker failed
+        _cancel_solve(future, slot)
+        future.add_done_callback(lambda _: _release_solver_slot(slot))
+        raise
+
+async def run_solvers(problems: List[Dict[str, Any]],
+                      is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None) -> List[Dict[str, Any]]:
+    """
+    Solves serialized CVRPs (see vrp_solver) in the solver pool without blocking the event loop,
+    in parallel on up to ROUTING_SOLVER_WORKERS slots; results come back in `problems` order.
+    Raises SolverBusyError when all slots are taken, and SolveCancelledError (cancelling every
+    solve) once `is_disconnected()` reports the client has gone.
+    """
+    if settings.ROUTING_SOLVER_WORKERS <= 0: # No process pool (platforms without multiprocessing): solve in-process
+        return [await asyncio.to_thread(vrp_solver.solve_cvrp, problem) for problem in problems]
+    if not problems:
+        return []
+
+    executor = _get_solver_executor()
+    slots = _acquire_solver_slots(min(len(problems), settings.ROUTING_SOLVER_WORKERS))
+    pending = list(enumerate(problems))[::-1]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(problems)
+    handed_back = set() # Slots _solve_in_slot releases itself (solve failed or abandoned)
+
+    async def lane(slot: SolverSlot):
+        while pending:
+            index, problem = pending.pop()
+            try:
+                results[index] = await _solve_in_slot(executor, problem, slot, is_disconnected)
+            except BaseException:
+                handed_back.add(slot)
+                raise
+
+    lanes = [asyncio.create_task(lane(slot)) for slot in slots]
+    try:
+        await asyncio.gather(*lanes)
+    except BaseException: # One lane failed (or we were cancelled): stop the others before giving the slots back
+        for task in lanes:
+            task.cancel()
+        await asyncio.gather(*lanes, return_exceptions=True)
+        raise
+    finally:
+        for slot in slots:
+            if slot not in handed_back:
+                _release_solver_slot(slot)
+    return results
+
+async def run_solver(problem: Dict[str, Any], is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None) -> Dict[str, Any]:
+    """Solves one serialized CVRP in the solver pool (see run_solvers)."""
+    return (await run_solvers([problem], is_disconnected))[0]
+
+def _reset_broken_solver_pool():
+    """Drops a pool whose worker died (e.g. killed for memory) so the next solve starts a fresh one."""
+    global _solver_executor
+    if _solver_executor is not None:
+        _solver_executor.shutdown(wait=False, cancel_futures=True)
+        _solver_executor = None
+
+# --- Warm starts ---
+# Each successful optimization stores its routes (bin_ids per vehicle) per fleet and zone; the next
+# one maps them onto today's bins and hands them to the solver as the initial solution, so the
+# search starts near a good plan and ROUTING_WARM_START_TIME_LIMIT_SECONDS replaces the full limit.
+
+def map_plan_to_nodes(plan: Dict[str, Any], vehicle_ids: List[str], locations_with_ids: List[Dict[str, Any]],
+                      depot_index: int = 0) -> Optional[List[List[int]]]:
+    """
+    A stored plan's routes as today's node indexes, per vehicle in `vehicle_ids` order (bins not
+    due today dropped; new bins are inserted by the solver). None when less than
+    ROUTING_WARM_START_MIN_OVERLAP of today's stops appear in the plan.
+    """
+    node_of_bin = {loc['bin_id']: node for node, loc in enumerate(locations_with_ids) if node != depot_index}
+    routes_by_vehicle = dict(zip(plan.get("vehicle_ids", []), plan.get("routes", [])))
+    routes = [[node_of_bin[bin_id] for bin_id in routes_by_vehicle.get(vehicle_id, []) if bin_id in node_of_bin]
+              for vehicle_id in vehicle_ids]
+    known = len({node for route in routes for node in route})
+    if not node_of_bin or known / len(node_of_bin) < settings.ROUTING_WARM_START_MIN_OVERLAP:
+        return None
+    return routes
+
+# --- Cluster-first decomposition ---
+# Above ROUTING_DECOMPOSE_ABOVE_STOPS stops, one model over every bin doesn't converge within the
+# time limit. The stops are split into capacity-balanced sweep clusters (see route_decomposition),
+# solved in parallel in the solver pool with time limits proportional to their size, and the cluster
+# boundaries are repaired afterwards. Only distances within a cluster (or boundary) are fetched, for
+# all clusters at once, so the matrix, the solver time and the wall time all grow about linearly
+# with the number of bins.
+
+def _cluster_time_limit(n_stops: int) -> float:
+    return max(settings.ROUTING_CLUSTER_MIN_SECONDS, settings.ROUTING_CLUSTER_SECONDS_PER_STOP * n_stops)
+
+async def solve_decomposed(
+    coords_list: List[Tuple[float, float]],
+    demands: List[int],
+    vehicle_capacities: List[int],
+    distance_provider: Optional[str] = None,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    depot_index: int = 0,
+) -> Optional[Dict[str, Any]]:
+    """
+    Solves the CVRP cluster by cluster. Returns a result shaped like vrp_solver's (node indexes of
+    `coords_list` per vehicle), or None when the stops can't be split (the caller then solves the
+    whole problem). Raises like _fetch_distance_matrix and run_solvers.
+    """
+    started = time.perf_counter()
+    positions = route_decomposition.sweep_positions(coords_list, depot_index)
+    vehicle_stops = route_decomposition.assign_vehicles(positions, demands, vehicle_capacities)
+    if vehicle_stops is None:
+        return None
+    clusters = route_decomposition.group_clusters(vehicle_stops, settings.ROUTING_CLUSTER_MAX_STOPS)
+    routes: List[List[int]] = [[] for _ in vehicle_capacities]
+    costs = [0] * len(vehicle_capacities)
+    provider_name = distance_provider
+    semaphore = asyncio.Semaphore(settings.DISTANCE_MATRIX_CONCURRENCY)
+
+    async def solve_groups(groups: List[List[int]], repair: bool) -> bool:
+        """
+        Solves each group of vehicles over its stops (from the sweep, or, when repairing, its current
+        routes as the warm start). False if a group has no solution.
+        """
+        nonlocal provider_name
+        groups_stops = []
+        for vehicles in groups:
+            stops = [node for vehicle in vehicles for node in (routes[vehicle] if repair else vehicle_stops[vehicle])]
+            if stops:
+                groups_stops.append((vehicles, stops))
+        groups_points = [[coords_list[depot_index]] + [coords_list[node] for node in stops] for _, stops in groups_stops]
+
+        # Every group's matrix at once; their Maps API requests share one DISTANCE_MATRIX_CONCURRENCY budget
+        fetched = await asyncio.gather(*[_fetch_distance_matrix(points, provider_name, semaphore) for points in groups_points])
+        requested = (provider_name or settings.DISTANCE_PROVIDER).lower()
+        fallbacks = {provider_used for _, provider_used in fetched if provider_used != requested}
+        if fallbacks:
+            # Some groups fell back: use the fallback for all of them (and the groups after), so costs stay comparable
+            provider_name = fallbacks.pop()
+            fetched = [(distance_matrix, provider_used) if provider_used == provider_name
+                       else await _fetch_distance_matrix(points, provider_name, semaphore)
+                       for (distance_matrix, provider_used), points in zip(fetched, groups_points)]
+
+        problems = [
+            route_decomposition.build_subproblem(
+                depot_index, stops, vehicles, demands, vehicle_capacities, distance_matrix, _cluster_time_limit(len(stops)),
+                routes=[routes[vehicle] for vehicle in vehicles] if repair else None)
+            for (vehicles, stops), (distance_matrix, _) in zip(groups_stops, fetched)
+        ]
+        results = await run_solvers(problems, is_disconnected)
+        for (vehicles, stops), problem, result in zip(groups_stops, problems, results):
+            if result["status"] != "success":
+                if repair: # Keep the routes it started from
+                    continue
+                return False
+            nodes = [depot_index] + stops
+            for vehicle, local_route in zip(vehicles, result["routes"]):
+                routes[vehicle] = [nodes[local_node] for local_node in local_route]
+                costs[vehicle] = route_decomposition.route_cost(problem["distance_matrix"], local_route)
+        return True
+
+    if not await solve_groups(clusters, repair=False):
+        return {"status": "no_solution", "routes": [], "objective": None,
+                "solve_seconds": round(time.perf_counter() - started, 3), "warm_started": False}
+
+    per_side = settings.ROUTING_BOUNDARY_REPAIR_ROUTES
+    if per_side > 0:
+        # Every other boundary at a time, so that no route is in two groups solved together
+        for first in (0, 1):
+            await solve_groups([
+                route_decomposition.boundary_vehicles(clusters[k], clusters[k + 1], routes, positions, per_side)
+                for k in range(first, len(clusters) - 1, 2)
+            ], repair=True)
+
+    logger.info(f"Decomposed CVRP: {len(coords_list) - 1} stops in {len(clusters)} clusters.")
+    return {"status": "success", "routes": routes, "objective": sum(costs),
+            "solve_seconds": round(time.perf_counter() - started, 3), "warm_started": False}
 
 def create_ortools_data_model(
     demands: List[int],
@@ -108,15 +566,63 @@ def create_ortools_data_model(
     # The number of locations will be derived from the length of the distance matrix passed to solver
     return data
 
+async def _fetch_distance_matrix(coords_list: List[Tuple[float, float]], distance_provider: Optional[str],
+                                 semaphore: Optional[asyncio.Semaphore] = None) -> Tuple[List[List[int]], str]:
+    """get_provider_distance_matrix with failures turned into HTTP errors (400 for a bad provider, else 503)."""
+    try:
+        logger.info(f"Fetching distance matrix for {len(coords_list)} locations...")
+        try:
+            distance_matrix, provider_used = await get_provider_distance_matrix(coords_list, distance_provider, semaphore)
+        except ValueError as e: # Unknown provider name, or no road graph configured
+            raise HTTPException(status_code=400, detail=str(e))
+        if not distance_matrix or not distance_matrix[0]: # Check if matrix is empty or malformed
+            logger.error("Received empty or malformed distance matrix from the distance provider.")
+            raise HTTPException(status_code=503, detail="Failed to retrieve valid distance matrix.")
+        logger.info(f"Distance matrix fetched successfully (provider: {provider_used}).")
+        return distance_matrix, provider_used
+
+    except Exception as e: # Catch errors from get_distance_matrix or key error
+        # Log details if e is HTTPException, otherwise log generic
+        if isinstance(e, HTTPException):
+            logger.error(f"Failed to get distance matrix: {e.detail}", exc_info=True)
+            raise # Re-raise HTTPException
+        else:
+            logger.error(f"Failed to get distance matrix due to an unexpected error: {e}", exc_info=True)
+            raise HTTPException(status_code=503, detail=f"Distance matrix service unavailable or error: {str(e)}")
+
+async def _solve(solve: Awaitable[Any]) -> Any:
+    """Awaits a run_solver/solve_decomposed call, turning solver pool failures into HTTP errors."""
+    try:
+        return await solve
+    except HTTPException:
+        raise
+    except SolverBusyError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail="All route solvers are busy; retry shortly.")
+    except SolveCancelledError:
+        logger.info("Client disconnected; CVRP solve cancelled.")
+        raise HTTPException(status_code=499, detail="Client closed the request; solve cancelled.")
+    except Exception as e:
+        from concurrent.futures.process import BrokenProcessPool
+        if isinstance(e, BrokenProcessPool):
+            _reset_broken_solver_pool()
+        logger.error(f"CVRP solve failed: {e}", exc_info=True)
+        raise HTTPException(status_code=503, detail=f"Route solver failed: {e}")
+
 async def solve_vehicle_routing_problem(
     locations_with_ids: List[Dict[str, Any]], # e.g., [{"bin_id": "depot", "latitude": lat, "longitude": lon}, {"bin_id": "bin1", ...}, ...]
                                               # First item MUST be the depot.
     demands: List[int], # Corresponding to locations_with_ids, depot demand is demands[0] (should be 0)
     vehicle_capacities: List[int],
-    num_vehicles: int
+    num_vehicles: int,
+    distance_provider: Optional[str] = None, # "google", "haversine" or "road_graph" (default: DISTANCE_PROVIDER)
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None, # e.g. Request.is_disconnected: cancels the solve
+    vehicle_ids: Optional[List[str]] = None, # Aligned with vehicle_capacities; with plan_key, enables warm starts
+    plan_key: Optional[str] = None, # data_service.route_plan_key of this fleet and zone
+    decompose: Optional[bool] = None, # Cluster-first decomposition (default: above ROUTING_DECOMPOSE_ABOVE_STOPS stops)
 ) -> List[List[RouteStop]]: # Returns list of routes, each route is a list of RouteStop Pydantic models
     """
-    Solves the CVRP using Google OR-Tools and Google Maps API for distance matrix.
+    Solves the CVRP using Google OR-Tools, with distances from the selected distance provider.
     locations_with_ids: List of dicts, first element is depot. Each dict needs 'bin_id', 'latitude', 'longitude'.
     demands: List of demands corresponding to locations_with_ids. demands[0] is for depot (0).
     """
@@ -133,110 +639,75 @@ async def solve_vehicle_routing_problem(
     # Prepare locations for Distance Matrix API
     coords_list = [(loc['latitude'], loc['longitude']) for loc in locations_with_ids]
 
-    try:
-        # 1. Get Distance Matrix from Google Maps API
-        logger.info(f"Fetching distance matrix for {len(coords_list)} locations...")
-        if not settings.MAPS_API_KEY_GHANA:
-            logger.error("Google Maps API key (MAPS_API_KEY_GHANA) is not configured.")
-            raise HTTPException(status_code=500, detail="Maps API key not configured on server.")
-
-        distance_matrix = await get_distance_matrix(
-            coords_list,
-            coords_list,
-            settings.MAPS_API_KEY_GHANA,
-            region="GH"
-        )
-        if not distance_matrix or not distance_matrix[0]: # Check if matrix is empty or malformed
-            logger.error("Received empty or malformed distance matrix from Google Maps API.")
-            raise HTTPException(status_code=503, detail="Failed to retrieve valid distance matrix.")
-        logger.info("Distance matrix fetched successfully.")
-
-    except Exception as e: # Catch errors from get_distance_matrix or key error
-        # Log details if e is HTTPException, otherwise log generic
-        if isinstance(e, HTTPException):
-            logger.error(f"Failed to get distance matrix: {e.detail}", exc_info=True)
-            raise # Re-raise HTTPException
-        else:
-            logger.error(f"Failed to get distance matrix due to an unexpected error: {e}", exc_info=True)
-            raise HTTPException(status_code=503, detail=f"Distance matrix service unavailable or error: {str(e)}")
-
-
-    # 2. Create OR-Tools data model
-    data = create_ortools_data_model(
-        demands, vehicle_capacities, num_vehicles, depot_index
-    )
-
     # Basic validation: demand vs capacity
     max_demand = max(demands) if demands else 0
     if vehicle_capacities and max_demand > vehicle_capacities[0]: # Assuming same capacity for all for this check
          logger.error(f"Demand ({max_demand}) exceeds vehicle capacity ({vehicle_capacities[0]}).")
          raise HTTPException(status_code=400, detail=f"Demand ({max_demand}) exceeds vehicle capacity ({vehicle_capacities[0]}).")
 
+    n_stops = len(locations_with_ids) - 1
+    if decompose is None:
+        decompose = n_stops > settings.ROUTING_DECOMPOSE_ABOVE_STOPS
+    warm_start = bool(plan_key and vehicle_ids and settings.ROUTING_WARM_START)
+
+    result = None
+    if decompose: # Clusters solved separately, distances fetched per cluster (no warm start from the stored plan)
+        logger.info(f"Solving CVRP over {n_stops} stops by cluster decomposition...")
+        result = await _solve(solve_decomposed(coords_list, demands, vehicle_capacities, distance_provider,
+                                               is_disconnected, depot_index))
+        if result is None:
+            logger.info("Stops could not be split into capacity-balanced clusters; solving them as one problem.")
+
+    if result is None:
+        # 1. Get the distance matrix from the selected provider (falling back if it fails)
+        distance_matrix, _ = await _fetch_distance_matrix(coords_list, distance_provider)
+
+        # 2. Create OR-Tools data model
+        data = create_ortools_data_model(
+            demands, vehicle_capacities, num_vehicles, depot_index
+        )
 
-    # 3. Create Routing Model
-    manager = pywrapcp.RoutingIndexManager(len(distance_matrix), data['num_vehicles'], data['depot'])
-    routing = pywrapcp.RoutingModel(manager)
-
-    # Distance callback
-    def distance_callback(from_index, to_index):
-        from_node = manager.IndexToNode(from_index)
-        to_node = manager.IndexToNode(to_index)
-        return distance_matrix[from_node][to_node]
-
-    transit_callback_index = routing.RegisterTransitCallback(distance_callback)
-    routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
-
-    # Demand callback for capacity constraints
-    def demand_callback(from_index):
-        from_node = manager.IndexToNode(from_index)
-        return data['demands'][from_node]
-
-    demand_callback_index = routing.RegisterUnaryTransitCallback(demand_callback)
-    routing.AddDimensionWithVehicleCapacity(
-        demand_callback_index,
-        0,  # null capacity slack
-        data['vehicle_capacities'],
-        True,  # start cumul to zero
-        'Capacity')
-
-    # 4. Set Search Parameters and Solve
-    search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-    search_parameters.first_solution_strategy = (
-        routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC)
-    search_parameters.local_search_metaheuristic = (
-        routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH)
-    search_parameters.time_limit.FromSeconds(10) # Increased time limit slightly
-
-    logger.info("Solving CVRP with OR-Tools...")
-    solution = routing.SolveWithParameters(search_parameters)
-
-    # 5. Parse Solution and return routes
+        # 3. Solve in the solver process pool (serialized problem; the event loop keeps serving meanwhile)
+        problem = {
+            "distance_matrix": distance_matrix,
+            "demands": data['demands'],
+            "vehicle_capacities": data['vehicle_capacities'],
+            "num_vehicles": data['num_vehicles'],
+            "depot": data['depot'],
+            "time_limit_seconds": settings.ROUTING_TIME_LIMIT_SECONDS,
+        }
+        if warm_start:
+            previous_plan = await async_data_service.get_route_plan(plan_key)
+            initial_routes = map_plan_to_nodes(previous_plan, vehicle_ids, locations_with_ids, depot_index) if previous_plan else None
+            if initial_routes is not None:
+                problem["initial_routes"] = initial_routes
+                problem["warm_start_time_limit_seconds"] = settings.ROUTING_WARM_START_TIME_LIMIT_SECONDS
+        logger.info("Solving CVRP with OR-Tools...")
+        result = await _solve(run_solver(problem, is_disconnected))
+
+    # 4. Map the solver's node indexes back to stops
     output_routes: List[List[RouteStop]] = []
-    if solution:
-        logger.info("CVRP Solution found.")
-        for vehicle_id in range(data['num_vehicles']):
-            index = routing.Start(vehicle_id)
-            route_for_vehicle_stops: List[RouteStop] = []
-            while not routing.IsEnd(index):
-                node_index = manager.IndexToNode(index)
-                if node_index != data['depot']: # Exclude depot from stops list
-                    original_loc_info = locations_with_ids[node_index]
-                    route_for_vehicle_stops.append(RouteStop(
-                        requestId=original_loc_info['bin_id'], # map 'bin_id' from locations_with_ids to 'requestId'
-                        latitude=original_loc_info['latitude'],
-                        longitude=original_loc_info['longitude'],
-                        approxGarbageWeight=float(demands[node_index]) # Use the demand for this node, ensure float
-                    ))
-                previous_index = index
-                index = solution.Value(routing.NextVar(index))
-                if index == previous_index and not routing.IsEnd(index) : # Check if stuck and not at the end
-                    logger.warning(f"Routing solution for vehicle {vehicle_id} seems stuck at index {index}. Breaking to avoid infinite loop.")
-                    break # Safety break
-
+    if result["status"] == "success":
+        logger.info(f"CVRP Solution found in {result['solve_seconds']}s (objective {result['objective']}, "
+                    f"{'warm' if result.get('warm_started') else 'cold'} start).")
+        if warm_start:
+            await async_data_service.save_route_plan(
+                plan_key, vehicle_ids, [[locations_with_ids[node]['bin_id'] for node in route] for route in result["routes"]],
+                result["objective"])
+        for route_nodes in result["routes"]:
+            route_for_vehicle_stops = [
+                RouteStop(
+                    requestId=locations_with_ids[node_index]['bin_id'], # map 'bin_id' from locations_with_ids to 'requestId'
+                    latitude=locations_with_ids[node_index]['latitude'],
+                    longitude=locations_with_ids[node_index]['longitude'],
+                    approxGarbageWeight=float(demands[node_index]) # Use the demand for this node, ensure float
+                )
+                for node_index in route_nodes
+            ]
             if route_for_vehicle_stops: # Only add routes that have stops
                 output_routes.append(route_for_vehicle_stops)
         logger.info(f"Parsed {len(output_routes)} routes from solution.")
     else:
-        logger.warning("No solution found for CVRP by OR-Tools.")
+        logger.warning(f"No solution found for CVRP by OR-Tools (status: {result['status']}).")
 
     return output_routes
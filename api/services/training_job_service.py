@@ -0,0 +1,203 @@
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, Any, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from ..config import settings
+from ..database import get_collection
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+RETRAIN_JOBS_COLLECTION = "retrain_jobs"
+# Only jobs holding this slot value are "active"; a sparse unique index on it makes
+# retraining single-flight across every API worker sharing the database.
+ACTIVE_SLOT = "waste_predictor"
+
+_executor: Optional["ProcessPoolExecutor"] = None
+
+def _get_executor() -> "ProcessPoolExecutor":
+    """Lazily creates the single-worker process pool that runs model training."""
+    global _executor
+    if _executor is None:
+        # Imported here: multiprocessing is only needed once a retrain is requested
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # spawn: the child opens its own MongoDB connection instead of inheriting a forked client
+        _executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def shutdown_executor():
+    """Stops the training process pool (called on app shutdown)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def ensure_retrain_job_indexes():
+    """Creates the single-flight and TTL eviction indexes on the retrain_jobs collection."""
+    try:
+        jobs_collection = get_collection(RETRAIN_JOBS_COLLECTION)
+        jobs_collection.create_index("job_id", unique=True)
+        jobs_collection.create_index("active_slot", unique=True, sparse=True)
+        jobs_collection.create_index("finished_at", expireAfterSeconds=settings.RETRAIN_JOB_TTL_SECONDS)
+    except Exception as e:
+        logger.error(f"Error ensuring retrain job indexes: {e}", exc_info=True)
+
+def _public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Strips Mongo internals and serializes datetimes for API responses."""
+    return {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in job.items()
+        if key not in ("_id", "active_slot")
+    }
+
+def _finish_job(job_id: str, status: str, message: str, error_message: Optional[str] = None, only_if_active: bool = False):
+    """Marks a job finished and releases the active slot (with only_if_active, unless it was already released)."""
+    update = {"status": status, "finished_at": datetime.utcnow(), "message": message}
+    if error_message:
+        update["error_message"] = error_message
+    job_filter = {"job_id": job_id, "active_slot": ACTIVE_SLOT} if only_if_active else {"job_id": job_id}
+    get_collection(RETRAIN_JOBS_COLLECTION).update_one(
+        job_filter,
+        {"$set": update, "$unset": {"active_slot": ""}}
+    )
+
+def _recycle_executor():
+    """Stops this API worker's training process, if any, so a job released as stale can't keep training."""
+    global _executor
+    executor, _executor = _executor, None
+    if executor is None:
+        return
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+def _release_stale_job():
+    """
+    Fails the active job if its training process has not sent a heartbeat for
+    RETRAIN_JOB_TIMEOUT_SECONDS (the worker died or hung), and stops that process if it is ours.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.RETRAIN_JOB_TIMEOUT_SECONDS)
+    jobs_collection = get_collection(RETRAIN_JOBS_COLLECTION)
+    stale_job = jobs_collection.find_one({"active_slot": ACTIVE_SLOT, "$or": [
+        {"heartbeat_at": {"$lt": cutoff}},
+        {"heartbeat_at": {"$exists": False}, "submit_time": {"$lt": cutoff}}, # Jobs recorded before heartbeats
+    ]})
+    if stale_job:
+        logger.warning(f"Retrain job {stale_job['job_id']} sent no heartbeat for {settings.RETRAIN_JOB_TIMEOUT_SECONDS}s; releasing it.")
+        _finish_job(stale_job["job_id"], "failed", "Training job timed out or its worker died.", "timeout")
+        _recycle_executor()
+
+def _send_heartbeats(job_id: str, stop: threading.Event):
+    """
+    Runs beside the fit in the training process, refreshing the job's heartbeat_at. If the job
+    was released as stale meanwhile, the training process exits, so that a fit the API has given
+    up on never writes model files over those of the job that replaced it.
+    """
+    jobs_collection = get_collection(RETRAIN_JOBS_COLLECTION)
+    while not stop.wait(settings.RETRAIN_JOB_HEARTBEAT_SECONDS):
+        try:
+            result = jobs_collection.update_one({"job_id": job_id, "active_slot": ACTIVE_SLOT},
+                                                {"$set": {"heartbeat_at": datetime.utcnow()}})
+        except Exception as e:
+            logger.warning(f"Could not record heartbeat of retraining job {job_id}: {e}")
+            continue
+        if result.matched_count == 0:
+            logger.error(f"Retraining job {job_id} was released as stale; stopping its training.")
+            import multiprocessing
+            if multiprocessing.parent_process() is not None: # Only ever exit a pool worker
+                os._exit(1)
+            return
+
+def run_training_job(job_id: str, incremental: bool):
+    """
+    Entry point executed in the training process. Updates the persisted job record
+    itself, so status survives API worker restarts.
+    """
+    # Imported here so the API process never pays for pandas/sklearn just to schedule a job
+    from . import prediction_service
+    jobs_collection = get_collection(RETRAIN_JOBS_COLLECTION)
+    try:
+        logger.info(f"Retraining job {job_id} started.")
+        started_at = datetime.utcnow()
+        jobs_collection.update_one(
+            {"job_id": job_id},
+            {"$set": {"status": "running", "start_time": started_at, "heartbeat_at": started_at, "message": "Training in progress..."}}
+        )
+        stop_heartbeats = threading.Event()
+        threading.Thread(target=_send_heartbeats, args=(job_id, stop_heartbeats), name="retrain-heartbeat", daemon=True).start()
+        try:
+            success = prediction_service.train_waste_prediction_model(incremental=incremental)
+        finally:
+            stop_heartbeats.set()
+        if success:
+            _finish_job(job_id, "completed", "Model training completed successfully.")
+            logger.info(f"Retraining job {job_id} completed successfully.")
+        else:
+            _finish_job(job_id, "failed", "Model training failed. Check logs for details.",
+                        "Model training function reported failure.")
+            logger.error(f"Retraining job {job_id} failed as reported by training function.")
+    except Exception as e:
+        logger.error(f"Exception in retraining job {job_id}: {e}", exc_info=True)
+        _finish_job(job_id, "failed", "An unexpected error occurred during model training.", str(e))
+
+def _on_job_done(job_id: str, future):
+    """Records failures of the pool itself (e.g. the child process crashed)."""
+    exc = future.exception() if not future.cancelled() else None
+    if future.cancelled() or exc is not None:
+        logger.error(f"Retraining job {job_id} did not run to completion: {exc}")
+        try:
+            # Unless already released (e.g. as stale, which is why its process was stopped)
+            _finish_job(job_id, "failed", "Training process terminated unexpectedly.", str(exc) if exc else "cancelled",
+                        only_if_active=True)
+        except Exception as e:
+            logger.error(f"Could not record failure of retraining job {job_id}: {e}", exc_info=True)
+
+def submit_retrain_job(incremental: bool = False) -> Tuple[Dict[str, Any], bool]:
+    """
+    Starts a retraining job in the training process pool, unless one is already active.
+    Returns (job, created); when a job is in flight, that job is returned with created=False.
+    """
+    jobs_collection = get_collection(RETRAIN_JOBS_COLLECTION)
+    _release_stale_job()
+
+    submit_time = datetime.utcnow()
+    job = {
+        "job_id": str(uuid.uuid4()),
+        "active_slot": ACTIVE_SLOT,
+        "status": "pending",
+        "mode": "incremental" if incremental else "full",
+        "submit_time": submit_time,
+        "heartbeat_at": submit_time, # Refreshed by the training process once it runs
+        "message": "Retraining job accepted and pending execution.",
+    }
+    while True:
+        try:
+            jobs_collection.insert_one(job)
+            break
+        except DuplicateKeyError:
+            active_job = jobs_collection.find_one({"active_slot": ACTIVE_SLOT})
+            if active_job:
+                logger.info(f"Retraining already in progress; attaching to job {active_job['job_id']}.")
+                return _public_job(active_job), False
+            # The active job finished between our insert and lookup; try again (another
+            # request may take the slot first, in which case we attach to its job)
+            job.pop("_id", None)
+
+    future = _get_executor().submit(run_training_job, job["job_id"], incremental)
+    future.add_done_callback(lambda f: _on_job_done(job["job_id"], f))
+    logger.info(f"Model retraining job {job['job_id']} submitted to the training process.")
+    return _public_job(job), True
+
+def get_retrain_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Returns the persisted record of a retraining job, or None if unknown/evicted."""
+    job = get_collection(RETRAIN_JOBS_COLLECTION).find_one({"job_id": job_id})
+    return _public_job(job) if job else None
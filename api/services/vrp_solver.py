@@ -0,0 +1,168 @@
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# CVRP solving on a serialized problem, run in the routing solver processes (see routing_service).
+#
+# A problem is a plain dict, cheap to pickle across the process boundary:
+#   distance_matrix     n x n integer meters (node 0..n-1; the depot is `depot`)
+#   demands             n integers (the depot's is 0)
+#   vehicle_capacities  one integer per vehicle
+#   num_vehicles, depot, time_limit_seconds
+#   initial_routes      optional warm start: node indexes per vehicle from a previous plan, searched
+#                       from (for warm_start_time_limit_seconds) instead of PATH_CHEAPEST_ARC
+# and the result is {"status", "routes" (node indexes per vehicle, depot excluded), "objective",
+# "solve_seconds", "warm_started"}. Nothing here imports the API (config, database, FastAPI), so
+# worker processes start with OR-Tools only.
+
+_cancel_flags = None # Shared byte per solve slot, set by the API process to cancel a running solve
+
+def init_worker(cancel_flags):
+    """Process pool initializer: keeps the shared cancel flags (passed at process start)."""
+    global _cancel_flags
+    _cancel_flags = cancel_flags
+
+def warm_up() -> bool:
+    """Imports OR-Tools in the worker (submitted once per worker when warming up)."""
+    from ortools.constraint_solver import pywrapcp # noqa: F401
+    return True
+
+def solve_in_worker(problem: Dict[str, Any], slot: int) -> Dict[str, Any]:
+    """Pool entry point: solves `problem`, stopping early once the API sets cancel flag `slot`."""
+    flags = _cancel_flags
+    return solve_cvrp(problem, should_stop=(lambda: flags[slot] != 0) if flags is not None else None)
+
+def create_routing_model(problem: Dict[str, Any]):
+    """
+    Builds the (manager, routing model) pair. Arc costs and demands are registered as a matrix and
+    a vector, which OR-Tools evaluates natively: the search never calls back into Python (a
+    Python transit callback costs a GIL round trip per evaluation, millions of them per solve).
+    """
+    from ortools.constraint_solver import pywrapcp
+
+    manager = pywrapcp.RoutingIndexManager(len(problem["distance_matrix"]), problem["num_vehicles"], problem["depot"])
+    routing = pywrapcp.RoutingModel(manager)
+
+    transit_index = routing.RegisterTransitMatrix(problem["distance_matrix"])
+    routing.SetArcCostEvaluatorOfAllVehicles(transit_index)
+
+    demand_index = routing.RegisterUnaryTransitVector(problem["demands"])
+    routing.AddDimensionWithVehicleCapacity(
+        demand_index,
+        0,  # null capacity slack
+        problem["vehicle_capacities"],
+        True,  # start cumul to zero
+        'Capacity')
+    return manager, routing
+
+def create_search_parameters(time_limit_seconds: float):
+    """PATH_CHEAPEST_ARC first solution, improved by guided local search until the time limit."""
+    from ortools.constraint_solver import pywrapcp, routing_enums_pb2
+
+    search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+    search_parameters.first_solution_strategy = (
+        routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC)
+    search_parameters.local_search_metaheuristic = (
+        routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH)
+    search_parameters.time_limit.FromMilliseconds(int(time_limit_seconds * 1000))
+    return search_parameters
+
+def complete_initial_routes(problem: Dict[str, Any], routes: List[List[int]]) -> Optional[List[List[int]]]:
+    """
+    Turns routes from a previous plan into a complete, capacity-feasible solution of `problem`
+    (OR-Tools only accepts full solutions as a starting point): unknown and repeated nodes are
+    dropped, stops beyond a vehicle's capacity are taken out, and every node left over (new bins,
+    overflow) is placed at its cheapest feasible insertion point. Returns None if one doesn't fit.
+    """
+    distance_matrix, demands, depot = problem["distance_matrix"], problem["demands"], problem["depot"]
+    capacities = problem["vehicle_capacities"]
+    n_nodes = len(distance_matrix)
+    seen = set()
+    completed: List[List[int]] = []
+    loads: List[int] = []
+    for vehicle_id in range(problem["num_vehicles"]):
+        route, load = [], 0
+        for node in (routes[vehicle_id] if vehicle_id < len(routes) else []):
+            if node == depot or not 0 <= node < n_nodes or node in seen:
+                continue
+            if load + demands[node] > capacities[vehicle_id]:
+                continue # Left over, re-inserted below
+            seen.add(node)
+            route.append(node)
+            load += demands[node]
+        completed.append(route)
+        loads.append(load)
+
+    missing = sorted((node for node in range(n_nodes) if node != depot and node not in seen), key=lambda node: -demands[node])
+    for node in missing: # Largest demands first, while there is the most room
+        best = None
+        for vehicle_id, route in enumerate(completed):
+            if loads[vehicle_id] + demands[node] > capacities[vehicle_id]:
+                continue
+            previous = depot
+            for position, following in enumerate(route + [depot]):
+                delta = distance_matrix[previous][node] + distance_matrix[node][following] - distance_matrix[previous][following]
+                if best is None or delta < best[0]:
+                    best = (delta, vehicle_id, position)
+                previous = following
+        if best is None:
+            return None
+        _, vehicle_id, position = best
+        completed[vehicle_id].insert(position, node)
+        loads[vehicle_id] += demands[node]
+    return completed
+
+def solve_cvrp(problem: Dict[str, Any], should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+    """
+    Solves the capacitated VRP. `should_stop` is polled at every solution the search finds
+    (several per second); when it returns True the search is cancelled and the result is "cancelled".
+    """
+    started = time.perf_counter()
+    if should_stop is not None and should_stop():
+        return {"status": "cancelled", "routes": [], "objective": None, "solve_seconds": 0.0, "warm_started": False}
+
+    depot: int = problem["depot"]
+    num_vehicles: int = problem["num_vehicles"]
+    manager, routing = create_routing_model(problem)
+
+    cancelled = []
+    if should_stop is not None:
+        def at_solution():
+            if not cancelled and should_stop():
+                cancelled.append(True)
+                routing.CancelSearch()
+        routing.AddAtSolutionCallback(at_solution)
+
+    solution = None
+    warm_started = False
+    if problem.get("initial_routes"):
+        initial_routes = complete_initial_routes(problem, problem["initial_routes"])
+        if initial_routes is not None:
+            search_parameters = create_search_parameters(problem.get("warm_start_time_limit_seconds", problem["time_limit_seconds"]))
+            routing.CloseModelWithParameters(search_parameters)
+            initial_assignment = routing.ReadAssignmentFromRoutes(initial_routes, True)
+            if initial_assignment is not None:
+                warm_started = True
+                solution = routing.SolveFromAssignmentWithParameters(initial_assignment, search_parameters)
+    if not warm_started:
+        solution = routing.SolveWithParameters(create_search_parameters(problem["time_limit_seconds"]))
+    solve_seconds = round(time.perf_counter() - started, 3)
+    if cancelled:
+        return {"status": "cancelled", "routes": [], "objective": None, "solve_seconds": solve_seconds, "warm_started": warm_started}
+    if not solution:
+        return {"status": "no_solution", "routes": [], "objective": None, "solve_seconds": solve_seconds, "warm_started": warm_started}
+
+    routes = []
+    for vehicle_id in range(num_vehicles):
+        index = routing.Start(vehicle_id)
+        route = []
+        while not routing.IsEnd(index):
+            node_index = manager.IndexToNode(index)
+            if node_index != depot: # Exclude depot from stops list
+                route.append(node_index)
+            previous_index = index
+            index = solution.Value(routing.NextVar(index))
+            if index == previous_index and not routing.IsEnd(index): # Safety break if stuck
+                break
+        routes.append(route)
+    return {"status": "success", "routes": routes, "objective": solution.ObjectiveValue(), "solve_seconds": solve_seconds,
+            "warm_started": warm_started}
@@ -0,0 +1,169 @@
+import math
+
+from pymongo import InsertOne, ReplaceOne, UpdateOne, DeleteMany, DeleteOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.results import BulkWriteResult
+
+# Test helpers around mongomock.
+# mongomock's bulk_write does not understand the write-operation objects of current
+# pymongo releases, it has no geospatial query operators and no asyncio API; these
+# wrappers fill the gaps so services can be tested with the same call shapes they use
+# against a real server.
+
+EARTH_RADIUS_M = 6378100.0
+
+
+def _distance_m(a, b):
+    """Great-circle distance between two [longitude, latitude] points."""
+    lon1, lat1, lon2, lat2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(h))
+
+
+def _in_ring(point, ring):
+    """Ray casting on planar [longitude, latitude] coordinates (fine for city-sized test polygons)."""
+    x, y = point
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+    return inside
+
+
+def _geo_clause(query):
+    """Splits a query into (field, geo operator, operand, remaining query) if it has a geo clause."""
+    for field, condition in (query or {}).items():
+        if isinstance(condition, dict):
+            for operator in ("$geoWithin", "$nearSphere"):
+                if operator in condition:
+                    rest = {key: value for key, value in query.items() if key != field}
+                    return field, operator, condition[operator], rest
+    return None
+
+
+class Database:
+    """mongomock database wrapper adding list_collections (name filter only; regular collections)."""
+    def __init__(self, database):
+        self._database = database
+
+    def __getattr__(self, name):
+        return getattr(self._database, name)
+
+    def list_collections(self, filter=None, **kwargs):
+        wanted = (filter or {}).get("name")
+        return iter([{"name": name, "type": "collection", "options": {}}
+                     for name in self._database.list_collection_names() if wanted in (None, name)])
+
+
+class BulkWriteCollection:
+    """
+    mongomock collection wrapper whose bulk_write applies each operation individually.
+    Mirrors server semantics for unordered writes: errors are collected into a
+    BulkWriteError after all operations ran; ordered writes stop at the first error.
+    Its find() additionally supports the geospatial operators the services use.
+    """
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def find(self, filter=None, projection=None, *args, **kwargs):
+        """find() that also evaluates $geoWithin (Polygon) and $nearSphere (Point, $maxDistance)."""
+        clause = _geo_clause(filter)
+        if clause is None:
+            return self._collection.find(filter, projection, *args, **kwargs)
+        field, operator, operand, rest = clause
+        candidates = list(self._collection.find(rest, {field: 1}))
+        if operator == "$geoWithin":
+            ring = operand["$geometry"]["coordinates"][0]
+            ids = [doc["_id"] for doc in candidates if _in_ring(doc[field]["coordinates"], ring)]
+        else:
+            center = operand["$geometry"]["coordinates"]
+            max_distance = operand.get("$maxDistance", float("inf"))
+            distances = [(_distance_m(doc[field]["coordinates"], center), doc["_id"]) for doc in candidates]
+            ids = [_id for distance, _id in sorted(distances, key=lambda pair: pair[0]) if distance <= max_distance]
+        return [self._collection.find_one({"_id": _id}, projection) for _id in ids]
+
+    @property
+    def database(self):
+        return Database(self._collection.database)
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        counts = {"nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": [], "writeErrors": []}
+        for index, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    self._collection.insert_one(request._doc)
+                    counts["nInserted"] += 1
+                elif isinstance(request, (UpdateOne, ReplaceOne)):
+                    write = self._collection.update_one if isinstance(request, UpdateOne) else self._collection.replace_one
+                    result = write(request._filter, request._doc, upsert=request._upsert)
+                    counts["nMatched"] += result.matched_count
+                    counts["nModified"] += result.modified_count
+                    if result.upserted_id is not None:
+                        counts["nUpserted"] += 1
+                        counts["upserted"].append({"index": index, "_id": result.upserted_id})
+                elif isinstance(request, (DeleteOne, DeleteMany)):
+                    delete = self._collection.delete_one if isinstance(request, DeleteOne) else self._collection.delete_many
+                    counts["nRemoved"] += delete(request._filter).deleted_count
+                else:
+                    raise TypeError(f"Unsupported bulk operation {request!r}")
+            except DuplicateKeyError as e:
+                counts["writeErrors"].append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if counts["writeErrors"]:
+            raise BulkWriteError(counts)
+        return BulkWriteResult(counts, acknowledged=True)
+
+
+def bulk_write_db(db):
+    """Returns a get_collection replacement serving BulkWriteCollection wrappers for `db`."""
+    return lambda name: BulkWriteCollection(db[name])
+
+
+class AsyncCursor:
+    """Minimal async cursor over a mongomock cursor or result list (to_list, sort and async iteration)."""
+    def __init__(self, documents):
+        self._documents = documents
+
+    def sort(self, *args, **kwargs):
+        self._documents = self._documents.sort(*args, **kwargs)
+        return self
+
+    def limit(self, *args, **kwargs):
+        self._documents = self._documents.limit(*args, **kwargs)
+        return self
+
+    async def to_list(self, length=None):
+        documents = list(self._documents)
+        return documents if length is None else documents[:length]
+
+    def __aiter__(self):
+        self._iter = iter(self._documents)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncCollection:
+    """Mimics the pymongo AsyncCollection call shapes (find is sync, the rest are coroutines)."""
+    def __init__(self, collection):
+        self._collection = BulkWriteCollection(collection)
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self._collection.find(*args, **kwargs))
+
+    async def aggregate(self, pipeline, **kwargs):
+        return AsyncCursor(self._collection.aggregate(pipeline, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
@@ -0,0 +1,59 @@
+import asyncio
+
+import httpx
+import pytest
+
+from api.config import settings
+from api.services import routing_service
+
+
+class FakeDistanceMatrixAPI:
+    """httpx transport answering like the Distance Matrix API, with optional rate limiting and latency."""
+    def __init__(self, rate_limited_first_attempts=0, latency=0.0):
+        self.rate_limited_first_attempts = rate_limited_first_attempts
+        self.latency = latency
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.max_elements = 0
+
+    @staticmethod
+    def distance(origin, destination):
+        """Deterministic stand-in for a road distance (meters) between 'lat,lng' strings."""
+        (lat1, lng1), (lat2, lng2) = (map(float, origin.split(",")), map(float, destination.split(",")))
+        return int(abs(lat1 - lat2) * 111_000 + abs(lng1 - lng2) * 111_000)
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        request_number = self.requests
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if request_number <= self.rate_limited_first_attempts:
+                return httpx.Response(200, json={"status": "OVER_QUERY_LIMIT", "rows": []})
+            origins = request.url.params["origins"].split("|")
+            destinations = request.url.params["destinations"].split("|")
+            self.max_elements = max(self.max_elements, len(origins) * len(destinations))
+            rows = [{"elements": [{"status": "OK", "distance": {"value": self.distance(o, d)}} for d in destinations]}
+                    for o in origins]
+            return httpx.Response(200, json={"status": "OK", "rows": rows})
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def fake_api(monkeypatch) -> FakeDistanceMatrixAPI:
+    """Routes routing_service's Distance Matrix requests to a FakeDistanceMatrixAPI."""
+    api = FakeDistanceMatrixAPI()
+    monkeypatch.setattr(routing_service, '_new_http_client',
+                        lambda: httpx.AsyncClient(transport=httpx.MockTransport(api.handler)))
+    monkeypatch.setattr(routing_service, '_http_client', None)
+    monkeypatch.setattr(settings, 'DISTANCE_MATRIX_BACKOFF_SECONDS', 0.001)
+    return api
+
+
+@pytest.fixture
+def make_points():
+    """make_points(n): n distinct (lat, lng) stops along a diagonal in Accra."""
+    return lambda n: [(5.55 + i * 0.001, -0.25 + i * 0.0007) for i in range(n)]
@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+import mongomock
+from datetime import datetime
+
+from api.services import async_data_service, data_service
+from api.models_pydantic import WasteReadingDocument
+from api.tests.mongo_fakes import AsyncCollection, bulk_write_db
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    db = mongomock.MongoClient().db
+    monkeypatch.setattr(async_data_service, 'get_async_collection', lambda name: AsyncCollection(db[name]))
+    return db
+
+
+def test_get_active_fleet_vehicles_filters_inactive(mock_db):
+    mock_db[data_service.FLEET_VEHICLES_COLLECTION].insert_many([
+        {"vehicle_id": "T1", "capacity_kg": 5000, "start_depot": {"latitude": 5.6, "longitude": -0.2}, "is_active": True},
+        {"vehicle_id": "T2", "capacity_kg": 5000, "start_depot": {"latitude": 5.6, "longitude": -0.2}, "is_active": False},
+    ])
+    vehicles = asyncio.run(async_data_service.get_active_fleet_vehicles())
+    assert [v.vehicle_id for v in vehicles] == ["T1"]
+
+    assert asyncio.run(async_data_service.get_fleet_vehicle_by_id("T2")) is None
+    assert asyncio.run(async_data_service.get_fleet_vehicle_by_id("T1")).capacity_kg == 5000
+
+
+def test_get_latest_waste_readings_reads_bin_state(mock_db, monkeypatch):
+    monkeypatch.setattr(data_service, 'get_collection', bulk_write_db(mock_db))
+    data_service.update_bin_state([
+        WasteReadingDocument(bin_id="B1", reading_timestamp=datetime(2023, 1, 1, 8), fill_level_percent=10.0),
+        WasteReadingDocument(bin_id="B1", reading_timestamp=datetime(2023, 1, 1, 9), fill_level_percent=20.0),
+        WasteReadingDocument(bin_id="B2", reading_timestamp=datetime(2023, 1, 1, 7), fill_level_percent=30.0),
+        WasteReadingDocument(bin_id="B3", reading_timestamp=datetime(2023, 1, 1, 7), fill_level_percent=40.0),
+    ])
+
+    readings = asyncio.run(async_data_service.get_latest_waste_readings_for_bins(["B1", "B2"]))
+    latest = {r.bin_id: r.fill_level_percent for r in readings}
+    assert latest == {"B1": 20.0, "B2": 30.0}
+    sync_latest = {r.bin_id: r.fill_level_percent for r in data_service.get_latest_waste_readings_for_bins(["B1", "B2"])}
+    assert latest == sync_latest
+
+    assert asyncio.run(async_data_service.get_latest_waste_readings_for_bins([])) == []
+
+
+def test_get_bins(mock_db):
+    mock_db[data_service.BINS_COLLECTION].insert_many([dict(b) for b in data_service.SAMPLE_BINS_DATA[:3]])
+    assert len(asyncio.run(async_data_service.get_all_bins())) == 3
+    bins = asyncio.run(async_data_service.get_bins_by_ids(["GH-ACC-BIN-002", "missing"]))
+    assert [b.bin_id for b in bins] == ["GH-ACC-BIN-002"]
+
+
+def test_trusted_records_match_validated_documents(mock_db):
+    mock_db[data_service.BINS_COLLECTION].insert_many([dict(b) for b in data_service.SAMPLE_BINS_DATA])
+    mock_db[data_service.FLEET_VEHICLES_COLLECTION].insert_one(
+        {"vehicle_id": "T1", "capacity_kg": 5000, "start_depot": {"latitude": 5.6, "longitude": -0.2}, "is_active": True})
+
+    documents = {b.bin_id: b for b in asyncio.run(async_data_service.get_all_bins())}
+    records = asyncio.run(async_data_service.get_all_bin_records())
+    assert len(records) == len(documents)
+    for record in records:
+        document = documents[record.bin_id]
+        assert (record.longitude, record.latitude) == tuple(document.location.coordinates)
+        assert record.capacity_kg == document.capacity_kg
+        assert record.area == document.metadata.area
+
+    some_ids = list(documents)[:2]
+    assert {r.bin_id for r in asyncio.run(async_data_service.get_bin_records_by_ids(some_ids))} == set(some_ids)
+    assert asyncio.run(async_data_service.get_active_fleet_vehicle_records()) == [
+        data_service.fleet_vehicle_record({"vehicle_id": "T1", "capacity_kg": 5000, "start_depot": {"latitude": 5.6, "longitude": -0.2}})]
+
+
+def test_errors_return_empty_results(monkeypatch):
+    def broken(name):
+        raise RuntimeError("connection refused")
+    monkeypatch.setattr(async_data_service, 'get_async_collection', broken)
+    assert asyncio.run(async_data_service.get_all_bins()) == []
+    assert asyncio.run(async_data_service.get_active_fleet_vehicles()) == []
+    assert asyncio.run(async_data_service.get_fleet_vehicle_by_id("T1")) is None
+
+
+def test_record_waste_readings_updates_rollups_and_trends(mock_db):
+    readings = [
+        WasteReadingDocument(bin_id="B1", reading_timestamp=datetime(2023, 1, d, h), fill_level_percent=float(10 * h))
+        for d in (1, 2) for h in (6, 7)
+    ]
+    stored, failed = asyncio.run(async_data_service.record_waste_readings(readings))
+    assert (stored, failed) == (4, {})
+
+    daily = asyncio.run(async_data_service.get_reading_rollups("B1", "daily"))
+    assert [(b["bucket_start"], b["count"], b["sum_fill"]) for b in daily] == [
+        (datetime(2023, 1, 1), 2, 130.0), (datetime(2023, 1, 2), 2, 130.0)]
+    hourly = asyncio.run(async_data_service.get_reading_rollups("B1", "hourly", start=datetime(2023, 1, 2), end=datetime(2023, 1, 2, 7)))
+    assert [(b["bucket_start"], b["max_fill"]) for b in hourly] == [(datetime(2023, 1, 2, 6), 60.0)]
+
+
+def test_route_plans_round_trip(mock_db):
+    from api.models_pydantic import ServiceZone
+    zone = ServiceZone(radius_km=3.0)
+    key = data_service.route_plan_key(["T2", "T1"], zone)
+    assert key == data_service.route_plan_key(["T1", "T2"], ServiceZone(radius_km=3.0)) # Vehicle order doesn't matter
+    assert key != data_service.route_plan_key(["T1", "T2"], None)
+
+    assert asyncio.run(async_data_service.get_route_plan(key)) is None
+    assert asyncio.run(async_data_service.save_route_plan(key, ["T1", "T2"], [["B1", "B2"], []], 1200))
+    assert asyncio.run(async_data_service.save_route_plan(key, ["T1", "T2"], [["B2"], ["B1"]], 1100)) # Replaces the plan
+
+    plan = asyncio.run(async_data_service.get_route_plan(key))
+    assert (plan["routes"], plan["objective"], plan["bin_count"]) == ([["B2"], ["B1"]], 1100, 2)
+    assert mock_db[data_service.ROUTE_PLANS_COLLECTION].count_documents({}) == 1
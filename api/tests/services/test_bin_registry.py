@@ -0,0 +1,134 @@
+import threading
+import time
+import pytest
+import mongomock
+
+from api.services import bin_registry, data_service
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    db = mongomock.MongoClient().db
+    monkeypatch.setattr(bin_registry, 'get_collection', lambda name: db[name])
+    db[data_service.BINS_COLLECTION].insert_many([dict(b) for b in data_service.SAMPLE_BINS_DATA[:3]])
+    return db
+
+
+def _bin(bin_id, longitude=-0.19, latitude=5.6):
+    return {"bin_id": bin_id, "location": {"type": "Point", "coordinates": [longitude, latitude]}, "capacity_kg": 100}
+
+
+def test_serves_bins_from_memory_after_first_load(mock_db):
+    registry = bin_registry.BinRegistry(poll_seconds=3600)
+    assert {b.bin_id for b in registry.get_all_bins()} == {"GH-ACC-BIN-001", "GH-ACC-BIN-002", "GH-ACC-BIN-003"}
+
+    mock_db[data_service.BINS_COLLECTION].delete_many({}) # Not seen until the next sync
+    assert len(registry.get_all_bin_records()) == 3
+    assert [b.bin_id for b in registry.get_bins_by_ids(["GH-ACC-BIN-002", "GH-ACC-BIN-002"])] == ["GH-ACC-BIN-002"]
+
+    stats = registry.stats()
+    assert stats["reloads"] == 1
+    assert stats["hits"] == 3 + 3 + 1
+    assert stats["misses"] == 0
+    assert stats["size"] == 3
+
+
+def test_unknown_ids_are_read_through_and_counted_as_misses(mock_db):
+    registry = bin_registry.BinRegistry(poll_seconds=3600)
+    registry.get_all_bins()
+    mock_db[data_service.BINS_COLLECTION].insert_one(_bin("NEW-1"))
+
+    records = registry.get_bin_records_by_ids(["GH-ACC-BIN-001", "NEW-1", "NOPE"])
+    assert [r.bin_id for r in records] == ["GH-ACC-BIN-001", "NEW-1"]
+    assert registry.stats()["misses"] == 2
+    # NEW-1 is now cached
+    registry.get_bins_by_ids(["NEW-1"])
+    assert registry.stats()["misses"] == 2
+
+
+def test_unknown_ids_are_remembered_for_the_poll_interval(mock_db, monkeypatch):
+    registry = bin_registry.BinRegistry(poll_seconds=0.2)
+    registry.get_all_bins()
+    collection = mock_db[data_service.BINS_COLLECTION]
+    finds = []
+    class CountingBins:
+        def find(self, *args, **kwargs):
+            finds.append(args)
+            return collection.find(*args, **kwargs)
+    monkeypatch.setattr(bin_registry, 'get_collection', lambda name: CountingBins())
+
+    assert registry.get_bins_by_ids(["NOPE"]) == []
+    assert registry.get_bins_by_ids(["NOPE", "GH-ACC-BIN-001"])[0].bin_id == "GH-ACC-BIN-001"
+    assert len(finds) == 1 # The second request didn't ask the database again
+    assert registry.stats()["unknown_hits"] == 1
+
+    collection.insert_one(_bin("NOPE"))
+    time.sleep(0.25)
+    assert [b.bin_id for b in registry.get_bins_by_ids(["NOPE"])] == ["NOPE"] # Asked again once expired
+
+
+def test_stale_reads_serve_memory_and_reload_in_the_background(mock_db, monkeypatch):
+    registry = bin_registry.BinRegistry(poll_seconds=0.01)
+    assert len(registry.get_all_bins()) == 3
+    mock_db[data_service.BINS_COLLECTION].insert_one(_bin("NEW-1"))
+
+    release_reload = threading.Event()
+    reload = registry.reload
+    def slow_reload():
+        release_reload.wait(2)
+        reload()
+    monkeypatch.setattr(registry, 'reload', slow_reload)
+    time.sleep(0.02)
+    assert len(registry.get_all_bins()) == 3 # Served at once from the current copy
+    assert len(registry.get_all_bins()) == 3 # A single refresh is started
+    release_reload.set()
+
+    deadline = time.monotonic() + 2
+    while registry.stats()["reloads"] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    assert registry.stats()["reloads"] == 2 # Only one refresh ran
+    assert "NEW-1" in registry._index.documents
+
+
+def test_apply_change_events(mock_db):
+    registry = bin_registry.BinRegistry(poll_seconds=3600)
+    registry.reload()
+    bin_one = mock_db[data_service.BINS_COLLECTION].find_one({"bin_id": "GH-ACC-BIN-001"})
+
+    new_bin = dict(_bin("NEW-1"), _id="object-id-new")
+    assert registry.apply_change({"operationType": "insert", "fullDocument": new_bin})
+    moved = dict(bin_one, location={"type": "Point", "coordinates": [-0.1, 5.7]})
+    assert registry.apply_change({"operationType": "update", "fullDocument": moved})
+    assert registry.apply_change({"operationType": "delete", "documentKey": {"_id": "object-id-new"}})
+    renamed = dict(moved, bin_id="GH-ACC-BIN-001A")
+    assert registry.apply_change({"operationType": "replace", "fullDocument": renamed})
+    assert registry.apply_change({"operationType": "insert", "fullDocument": {"bin_id": "BROKEN"}}) # Invalid: skipped
+
+    bins = {b.bin_id: b for b in registry.get_bin_records_by_ids(["GH-ACC-BIN-001A", "GH-ACC-BIN-002"])}
+    assert set(bins) == {"GH-ACC-BIN-001A", "GH-ACC-BIN-002"}
+    assert (bins["GH-ACC-BIN-001A"].longitude, bins["GH-ACC-BIN-001A"].latitude) == (-0.1, 5.7)
+    assert "NEW-1" not in {b.bin_id for b in registry.get_all_bins()}
+    assert "BROKEN" not in {b.bin_id for b in registry.get_all_bins()}
+    assert registry.stats()["changes_applied"] == 5
+
+    assert registry.apply_change({"operationType": "invalidate"}) is False
+
+
+def test_watcher_falls_back_to_polling_without_change_streams(mock_db):
+    # mongomock has no change streams, like a standalone mongod
+    registry = bin_registry.BinRegistry(poll_seconds=0.05)
+    watcher = bin_registry.BinRegistryWatcher(registry)
+    watcher.start()
+    try:
+        deadline = time.monotonic() + 2
+        while registry.stats()["mode"] != "polling" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert registry.stats()["mode"] == "polling"
+        mock_db[data_service.BINS_COLLECTION].insert_one(_bin("NEW-1"))
+        while registry.stats()["size"] != 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert registry.stats()["size"] == 4
+    finally:
+        watcher.stop()
+    assert registry.stats()["mode"] == "lazy"
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor
+
+from api.services import compiled_model
+
+FEATURES = ['day_of_week', 'hour_of_day', 'day_of_year']
+
+
+@pytest.fixture(scope="module")
+def fitted_model():
+    """A small GBR trained on synthetic time features."""
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({
+        'day_of_week': rng.integers(0, 7, 2000),
+        'hour_of_day': rng.integers(0, 24, 2000),
+        'day_of_year': rng.integers(1, 366, 2000),
+    })
+    y = X['hour_of_day'] * 3 + X['day_of_week'] * 2 + rng.normal(0, 5, 2000)
+    return GradientBoostingRegressor(n_estimators=30, max_depth=3, random_state=42).fit(X, y)
+
+
+def _random_inputs(n=500):
+    rng = np.random.default_rng(1)
+    # Include out-of-range and exact-threshold-adjacent values
+    return np.column_stack([rng.integers(-1, 9, n), rng.integers(-1, 26, n), rng.integers(0, 370, n)]).astype(float)
+
+
+def test_lookup_table_matches_sklearn(fitted_model):
+    compiled = compiled_model.compile_gradient_boosting(fitted_model)
+    assert compiled.cell_table is not None
+    X = _random_inputs()
+    expected = fitted_model.predict(pd.DataFrame(X, columns=FEATURES))
+    np.testing.assert_allclose(compiled.predict(X), expected, rtol=0, atol=1e-9)
+
+
+def test_tree_traversal_matches_sklearn(fitted_model):
+    compiled = compiled_model.compile_gradient_boosting(fitted_model)
+    traversal_only = compiled_model.CompiledTreeEnsemble(compiled_model._flatten_trees(fitted_model))
+    assert traversal_only.build_lookup_table(max_cells=1) is False
+    X = _random_inputs()
+    expected = fitted_model.predict(pd.DataFrame(X, columns=FEATURES))
+    np.testing.assert_allclose(traversal_only.predict(X), expected, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(traversal_only.predict(X), compiled.predict(X), rtol=0, atol=1e-9) # Same as the lookup table
+
+
+def test_export_round_trip(fitted_model, tmp_path):
+    path = str(tmp_path / "model.npz")
+    compiled_model.export_gradient_boosting(fitted_model, path)
+    loaded = compiled_model.CompiledTreeEnsemble.from_file(path)
+    assert loaded.feature_names == FEATURES
+    X = _random_inputs(50)
+    np.testing.assert_allclose(loaded.predict(X), fitted_model.predict(pd.DataFrame(X, columns=FEATURES)), rtol=0, atol=1e-9)
+
+
+def test_predict_rejects_wrong_feature_count(fitted_model):
+    compiled = compiled_model.compile_gradient_boosting(fitted_model)
+    with pytest.raises(ValueError):
+        compiled.predict(np.zeros((3, 2)))
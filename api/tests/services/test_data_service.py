@@ -0,0 +1,277 @@
+import os
+import uuid
+import pytest
+import mongomock
+from datetime import datetime, timedelta
+
+from api.models_pydantic import ServiceZone, WasteReadingDocument
+from api.services import data_service
+from api.tests.mongo_fakes import bulk_write_db
+
+# Set to a disposable MongoDB (e.g. mongodb://localhost:27017) to run the explain-plan checks.
+MONGODB_TEST_URI = os.getenv("MONGODB_TEST_URI")
+
+
+def _collection_scans(explain_output):
+    """Returns every COLLSCAN stage in the winning plan(s) of an explain() result."""
+    scans = []
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get("stage") == "COLLSCAN":
+                scans.append(node)
+            for key, value in node.items():
+                if key != "rejectedPlans":
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+    walk(explain_output)
+    return scans
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    db = mongomock.MongoClient().db
+    monkeypatch.setattr(data_service, 'get_collection', bulk_write_db(db))
+    return db
+
+
+def _reading(bin_id, hour, fill):
+    return WasteReadingDocument(bin_id=bin_id, reading_timestamp=datetime(2023, 1, 1, hour), fill_level_percent=fill)
+
+
+def _bin_state(db):
+    return {doc["bin_id"]: doc for doc in db[data_service.BIN_STATE_COLLECTION].find({}, data_service.BIN_STATE_PROJECTION)}
+
+
+def test_ensure_indexes_applies_index_specs(mock_db):
+    data_service.ensure_indexes()
+    data_service.ensure_indexes() # Idempotent on restart
+
+    for collection_name, index_models in data_service.INDEX_SPECS.items():
+        existing = mock_db[collection_name].index_information()
+        for index_model in index_models:
+            assert index_model.document["name"] in existing
+    assert mock_db[data_service.BINS_COLLECTION].index_information()["bin_id_unique"]["unique"] is True
+
+
+def test_ensure_indexes_continues_after_a_failing_collection(mock_db):
+    # Duplicate bin_ids block the unique index; the other collections still get theirs
+    mock_db[data_service.BINS_COLLECTION].insert_many([{"bin_id": "B1"}, {"bin_id": "B1"}])
+    data_service.ensure_indexes()
+    assert "bin_id_unique" not in mock_db[data_service.BINS_COLLECTION].index_information()
+    assert "is_active" in mock_db[data_service.FLEET_VEHICLES_COLLECTION].index_information()
+    assert "bin_id_reading_timestamp_desc" in mock_db[data_service.WASTE_READINGS_COLLECTION].index_information()
+
+
+def test_record_waste_readings_advances_bin_state(mock_db):
+    data_service.ensure_indexes()
+    inserted = data_service.record_waste_readings([_reading("B1", 8, 80.0), _reading("B1", 9, 90.0), _reading("B2", 8, 15.0)])
+    assert inserted == 3
+    assert mock_db[data_service.WASTE_READINGS_COLLECTION].count_documents({}) == 3
+
+    state = _bin_state(mock_db)
+    assert state["B1"]["fill_level_percent"] == 90.0
+    assert state["B1"]["reading_timestamp"] == datetime(2023, 1, 1, 9)
+    assert state["B1"]["last_emptied"] is None
+
+    # A large drop marks the bin as emptied; an out-of-order older reading is ignored
+    data_service.record_waste_readings([_reading("B1", 10, 5.0), _reading("B2", 7, 60.0)])
+    state = _bin_state(mock_db)
+    assert state["B1"]["fill_level_percent"] == 5.0
+    assert state["B1"]["last_emptied"] == datetime(2023, 1, 1, 10)
+    assert state["B2"]["fill_level_percent"] == 15.0
+    assert state["B2"]["reading_timestamp"] == datetime(2023, 1, 1, 8)
+
+    latest = {r.bin_id: r.fill_level_percent for r in data_service.get_latest_waste_readings_for_bins(["B1", "B2", "B9"])}
+    assert latest == {"B1": 5.0, "B2": 15.0}
+
+
+def test_update_bin_state_ignores_concurrent_newer_state(mock_db):
+    data_service.ensure_indexes()
+    data_service.update_bin_state([_reading("B1", 8, 40.0)])
+    # Another writer advanced the bin between our read and our write: the stale upsert must not win
+    mock_db[data_service.BIN_STATE_COLLECTION].update_one(
+        {"bin_id": "B1"}, {"$set": {"reading_timestamp": datetime(2023, 1, 1, 12), "fill_level_percent": 70.0}})
+    stale_write = data_service._bin_state_write({"bin_id": "B1", "fill_level_percent": 50.0,
+                                                 "reading_timestamp": datetime(2023, 1, 1, 9), "last_emptied": None})
+    data_service._apply_bin_state_writes(data_service.get_collection(data_service.BIN_STATE_COLLECTION), [stale_write])
+    assert _bin_state(mock_db)["B1"]["fill_level_percent"] == 70.0
+    assert mock_db[data_service.BIN_STATE_COLLECTION].count_documents({}) == 1
+
+
+def test_rebuild_bin_state_from_history(mock_db, monkeypatch):
+    data_service.ensure_indexes()
+    mock_db[data_service.WASTE_READINGS_COLLECTION].insert_many([
+        r.dict() for r in [_reading("B1", 8, 85.0), _reading("B1", 9, 10.0), _reading("B1", 10, 20.0), _reading("B2", 8, 50.0)]
+    ])
+    # Stale entry for a bin with no readings left is removed
+    mock_db[data_service.BIN_STATE_COLLECTION].insert_one(
+        {"bin_id": "GONE", "fill_level_percent": 1.0, "reading_timestamp": datetime(2022, 1, 1), "updated_at": datetime(2022, 1, 1)})
+    monkeypatch.setattr(data_service, 'BIN_STATE_WRITE_BATCH_SIZE', 1) # Exercise batch flushing
+
+    assert data_service.rebuild_bin_state() == 2
+    state = _bin_state(mock_db)
+    assert set(state) == {"B1", "B2"}
+    assert state["B1"]["fill_level_percent"] == 20.0
+    assert state["B1"]["last_emptied"] == datetime(2023, 1, 1, 9)
+    assert state["B2"]["fill_level_percent"] == 50.0
+
+
+def test_rebuild_bin_state_keeps_registered_bins_whose_readings_expired(mock_db):
+    data_service.ensure_indexes()
+    mock_db[data_service.BINS_COLLECTION].insert_one({"bin_id": "OLD"})
+    data_service.record_waste_readings([_reading("OLD", 8, 70.0), _reading("B1", 9, 40.0)])
+    mock_db[data_service.WASTE_READINGS_COLLECTION].delete_many({"bin_id": "OLD"}) # Expired under the raw TTL
+
+    assert data_service.rebuild_bin_state() == 1
+    state = _bin_state(mock_db)
+    assert set(state) == {"OLD", "B1"}
+    assert state["OLD"]["fill_level_percent"] == 70.0
+
+
+def test_record_waste_readings_maintains_rollups(mock_db):
+    data_service.ensure_indexes()
+    # Out of order and split across calls: bucket aggregates are commutative
+    data_service.record_waste_readings([_reading("B1", 9, 30.0), _reading("B1", 8, 10.0)])
+    data_service.record_waste_readings([
+        WasteReadingDocument(bin_id="B1", reading_timestamp=datetime(2023, 1, 1, 8, 30), fill_level_percent=20.0),
+    ])
+
+    hourly = {doc["bucket_start"]: doc for doc in mock_db[data_service.WASTE_READINGS_HOURLY_COLLECTION].find({"bin_id": "B1"})}
+    assert set(hourly) == {datetime(2023, 1, 1, 8), datetime(2023, 1, 1, 9)}
+    eight = hourly[datetime(2023, 1, 1, 8)]
+    assert (eight["count"], eight["sum_fill"], eight["min_fill"], eight["max_fill"]) == (2, 30.0, 10.0, 20.0)
+    assert eight["offsets_s"] == [0, 1800] and eight["fills"] == [10.0, 20.0]
+    assert eight["last_reading_timestamp"] == datetime(2023, 1, 1, 8, 30)
+
+    daily = list(mock_db[data_service.WASTE_READINGS_DAILY_COLLECTION].find({"bin_id": "B1"}))
+    assert len(daily) == 1
+    assert (daily[0]["bucket_start"], daily[0]["count"], daily[0]["sum_fill"]) == (datetime(2023, 1, 1), 3, 60.0)
+    assert "fills" not in daily[0]
+
+
+def test_rebuild_reading_rollups_keeps_buckets_older_than_raw_retention(mock_db):
+    data_service.ensure_indexes()
+    hourly = mock_db[data_service.WASTE_READINGS_HOURLY_COLLECTION]
+    # A bucket whose raw readings already expired, and a corrupted bucket within the raw window
+    hourly.insert_one({"bin_id": "B1", "bucket_start": datetime(2022, 12, 1, 8), "count": 4, "sum_fill": 100.0})
+    hourly.insert_one({"bin_id": "B1", "bucket_start": datetime(2023, 1, 1, 8), "count": 99, "sum_fill": 1.0})
+    mock_db[data_service.WASTE_READINGS_COLLECTION].insert_many([r.dict() for r in [_reading("B1", 8, 10.0), _reading("B1", 8, 30.0)]])
+
+    assert data_service.rebuild_reading_rollups() == 2
+    buckets = {doc["bucket_start"]: doc for doc in hourly.find()}
+    assert buckets[datetime(2022, 12, 1, 8)]["count"] == 4
+    assert (buckets[datetime(2023, 1, 1, 8)]["count"], buckets[datetime(2023, 1, 1, 8)]["sum_fill"]) == (2, 40.0)
+
+
+def test_ensure_waste_readings_storage_applies_raw_ttl(mock_db, monkeypatch):
+    # mongomock can't create time-series collections, which exercises the regular-collection fallback
+    monkeypatch.setattr(data_service.settings, 'RAW_READINGS_TTL_DAYS', 30)
+    data_service.ensure_waste_readings_storage()
+    ttl_index = mock_db[data_service.WASTE_READINGS_COLLECTION].index_information()[data_service.RAW_READINGS_TTL_INDEX]
+    assert ttl_index["expireAfterSeconds"] == 30 * 24 * 3600
+
+    monkeypatch.setattr(data_service.settings, 'RAW_READINGS_TTL_DAYS', 0)
+    data_service.ensure_waste_readings_storage()
+    assert data_service.RAW_READINGS_TTL_INDEX not in mock_db[data_service.WASTE_READINGS_COLLECTION].index_information()
+
+
+def test_collection_scan_detection_on_canned_plans():
+    collscan_plan = {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "COLLSCAN"}}}}
+    ixscan_plan = {"queryPlanner": {
+        "winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "bin_id_unique"}},
+        "rejectedPlans": [{"stage": "COLLSCAN"}],
+    }}
+    aggregate_plan = {"stages": [{"$cursor": {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}}, {"$group": {}}]}
+    assert len(_collection_scans(collscan_plan)) == 1
+    assert _collection_scans(ixscan_plan) == []
+    assert len(_collection_scans(aggregate_plan)) == 1
+
+
+@pytest.fixture
+def live_db(monkeypatch):
+    """A throwaway database on a real MongoDB server, seeded and indexed like production."""
+    if not MONGODB_TEST_URI:
+        pytest.skip("MONGODB_TEST_URI not set; explain-plan checks need a real MongoDB server")
+    from pymongo import MongoClient
+    client = MongoClient(MONGODB_TEST_URI, serverSelectionTimeoutMS=3000)
+    db = client[f"stagreen_index_test_{uuid.uuid4().hex[:8]}"]
+    monkeypatch.setattr(data_service, 'get_collection', lambda name: db[name])
+
+    db[data_service.BINS_COLLECTION].insert_many([dict(b) for b in data_service.SAMPLE_BINS_DATA])
+    data_service.ensure_sample_fleet_vehicles()
+    start = datetime(2023, 1, 1)
+    db[data_service.WASTE_READINGS_COLLECTION].insert_many([
+        {"bin_id": b["bin_id"], "reading_timestamp": start + timedelta(hours=h), "fill_level_percent": float(h % 100)}
+        for b in data_service.SAMPLE_BINS_DATA for h in range(50)
+    ])
+    data_service.ensure_indexes()
+    data_service.rebuild_bin_state()
+    data_service.rebuild_reading_rollups()
+    yield db
+    client.drop_database(db.name)
+    client.close()
+
+
+def _hot_query_plans(db):
+    """explain() output for the hot queries, built exactly as data_service issues them."""
+    bin_ids = [b["bin_id"] for b in data_service.SAMPLE_BINS_DATA[:3]]
+    return {
+        "get_latest_waste_readings_for_bins": db[data_service.BIN_STATE_COLLECTION].find(
+            {"bin_id": {"$in": bin_ids}}, data_service.BIN_STATE_PROJECTION).explain(),
+        "rebuild_bin_state": db[data_service.WASTE_READINGS_COLLECTION].find({}).sort(
+            [("bin_id", -1), ("reading_timestamp", 1)]).explain(),
+        "get_bins_by_ids": db[data_service.BINS_COLLECTION].find({"bin_id": {"$in": bin_ids}}).explain(),
+        "get_reading_rollups": db[data_service.WASTE_READINGS_DAILY_COLLECTION].find(
+            {"bin_id": bin_ids[0], "bucket_start": {"$gte": datetime(2023, 1, 1)}}).sort("bucket_start", 1).explain(),
+        "fetch_waste_readings_data(hourly, incremental)": db[data_service.WASTE_READINGS_HOURLY_COLLECTION].find(
+            {"bucket_start": {"$gt": datetime(2023, 1, 2)}}).explain(),
+        "get_bins_within_polygon": db[data_service.BINS_COLLECTION].find(
+            data_service.bins_within_polygon_query([[-0.191, 5.603], [-0.183, 5.603], [-0.183, 5.611]])).explain(),
+        "get_bins_near": db[data_service.BINS_COLLECTION].find(data_service.bins_near_query(-0.187, 5.605, 600)).explain(),
+        "get_active_fleet_vehicles": db[data_service.FLEET_VEHICLES_COLLECTION].find({"is_active": True}).explain(),
+        "get_fleet_vehicle_by_id": db[data_service.FLEET_VEHICLES_COLLECTION].find(
+            {"vehicle_id": "GH-TRUCK-01", "is_active": True}).explain(),
+    }
+
+
+def test_hot_queries_do_not_collection_scan(live_db):
+    for query_name, plan in _hot_query_plans(live_db).items():
+        assert _collection_scans(plan) == [], f"{query_name} falls back to a COLLSCAN"
+
+
+OSU_LABADI = [[-0.191, 5.603], [-0.183, 5.603], [-0.183, 5.611], [-0.191, 5.611]] # [lon, lat], open ring
+
+
+def test_zone_queries(mock_db):
+    mock_db[data_service.BINS_COLLECTION].insert_many([dict(b) for b in data_service.SAMPLE_BINS_DATA])
+
+    inside = {b.bin_id for b in data_service.get_bins_within_polygon(OSU_LABADI)}
+    assert inside == {"GH-ACC-BIN-001", "GH-ACC-BIN-002"}
+
+    near = data_service.get_bins_near(-0.187, 5.605, 600)
+    assert [b.bin_id for b in near][0] == "GH-ACC-BIN-001" # Nearest first
+    assert {b.bin_id for b in near} == {"GH-ACC-BIN-001", "GH-ACC-BIN-010"}
+
+    # Radius zones default to the depot; an explicit center wins
+    zone = ServiceZone(radius_km=0.6)
+    records = data_service.get_bin_records_in_zone(data_service.service_zone_query(zone, 5.605, -0.187))
+    assert {r.bin_id for r in records} == {b.bin_id for b in near}
+    zone = ServiceZone(radius_km=0.6, center={"latitude": 5.595, "longitude": -0.195})
+    records = data_service.get_bin_records_in_zone(data_service.service_zone_query(zone, 5.605, -0.187))
+    assert [r.bin_id for r in records] == ["GH-ACC-BIN-005"]
+
+
+def test_service_zone_query_validation():
+    with pytest.raises(ValueError):
+        data_service.service_zone_query(ServiceZone())
+    with pytest.raises(ValueError):
+        data_service.service_zone_query(ServiceZone(polygon=OSU_LABADI, radius_km=1))
+    with pytest.raises(ValueError):
+        data_service.service_zone_query(ServiceZone(radius_km=1)) # No center, no depot
+    with pytest.raises(ValueError):
+        data_service.bins_within_polygon_query([[0, 0], [1, 1]])
+
+    ring = data_service.bins_within_polygon_query(OSU_LABADI)["location"]["$geoWithin"]["$geometry"]["coordinates"][0]
+    assert ring[0] == ring[-1] and len(ring) == 5
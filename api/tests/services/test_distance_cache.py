@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+
+from api.services import distance_cache, routing_service
+from api.services.distance_cache import DistanceCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DistanceCache(str(tmp_path / "distances.sqlite3"), ttl_seconds=3600, max_entries=1000)
+    yield cache
+    cache.close()
+
+
+def test_get_many_returns_stored_pairs_by_index(cache, make_points):
+    a, b, c = make_points(3)
+    cache.put_many([(a, b, 100), (b, a, 120), (a, a, 0)])
+
+    assert cache.get_many([a, b], [a, b, c]) == {(0, 0): 0, (0, 1): 100, (1, 0): 120}
+    # Coordinates are quantized, so float noise below the precision still hits
+    assert cache.get_many([(a[0] + 1e-7, a[1] - 1e-7)], [b]) == {(0, 0): 100}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stores"]) == (4, 3, 3)
+
+
+def test_expired_and_excess_pairs_are_evicted(cache, make_points, monkeypatch):
+    points = make_points(30)
+    now = [1_000_000.0]
+    monkeypatch.setattr(distance_cache.time, "time", lambda: now[0])
+
+    cache.put_many([(points[0], points[1], 5)])
+    now[0] += 3601
+    assert cache.get_many([points[0]], [points[1]]) == {} # Past the TTL
+
+    cache.max_entries = 20
+    cache.put_many([(points[0], destination, 1) for destination in points]) # 30 > 20 pairs
+    assert len(cache.get_many([points[0]], points)) == 18 # Evicted down to 90% of max_entries
+    assert cache.stats()["evictions"] == 12 # The expired pair was refreshed by this write
+
+
+def test_missing_blocks_group_origins_by_missing_destinations():
+    cached = {(i, j): 1 for i in range(3) for j in range(3)} # 3 old points fully cached, 2 new ones
+    blocks = distance_cache.missing_blocks(5, 5, cached)
+    assert sorted(blocks) == [([0, 1, 2], [3, 4]), ([3, 4], [0, 1, 2, 3, 4])]
+    assert distance_cache.missing_blocks(2, 2, {(0, 0): 1, (0, 1): 1, (1, 0): 1, (1, 1): 1}) == []
+
+
+def test_cached_matrix_fetches_only_missing_pairs(fake_api, cache, make_points, monkeypatch):
+    monkeypatch.setattr(distance_cache, "_distance_cache", cache)
+    points = make_points(12)
+
+    first = asyncio.run(routing_service.get_cached_distance_matrix(points, points, "key"))
+    assert first == asyncio.run(routing_service.get_distance_matrix(points, points, "key"))
+    fake_api.requests = 0
+
+    # Same stops again: served entirely from the cache
+    assert asyncio.run(routing_service.get_cached_distance_matrix(points, points, "key")) == first
+    assert fake_api.requests == 0
+
+    # Two new stops: only the 12x2 + 2x14 pairs involving them are requested
+    more = points + make_points(14)[12:]
+    fake_api.max_elements = 0
+    matrix = asyncio.run(routing_service.get_cached_distance_matrix(more, more, "key"))
+    assert [row[:12] for row in matrix[:12]] == first
+    assert fake_api.requests == 2 and fake_api.max_elements == 28
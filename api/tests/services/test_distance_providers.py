@@ -0,0 +1,83 @@
+import asyncio
+import math
+import pytest
+
+from api.config import settings
+from api.services import distance_providers, routing_service
+from api.services.distance_providers import HaversineDistanceProvider, RoadGraph, RoadGraphDistanceProvider
+
+
+def _haversine_m(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * distance_providers.EARTH_RADIUS_M * math.asin(math.sqrt(h))
+
+
+def _street(coordinates, oneway=None):
+    properties = {"oneway": oneway} if oneway else {}
+    return {"type": "Feature", "properties": properties,
+            "geometry": {"type": "LineString", "coordinates": [[lon, lat] for lat, lon in coordinates]}}
+
+
+# A---B---C along one street, D reachable from C only through a one-way street (C -> D), E isolated
+A, B, C, D, E = (5.600, -0.200), (5.600, -0.190), (5.600, -0.180), (5.610, -0.180), (5.700, -0.100)
+STREETS = {"type": "FeatureCollection", "features": [
+    _street([A, B, C]),
+    _street([C, D], oneway="yes"),
+    _street([E, (5.7001, -0.1001)]),
+]}
+
+
+def test_haversine_matrix_matches_scalar_formula():
+    points = [(5.55 + i * 0.013, -0.25 + i * 0.007) for i in range(30)]
+    matrix = HaversineDistanceProvider().matrix(points, points[:10])
+    assert matrix.shape == (30, 10)
+    assert all(abs(matrix[i][j] - _haversine_m(points[i], points[j])) <= 0.5 for i in range(30) for j in range(10))
+    assert all(matrix[i][i] == 0 for i in range(10))
+    assert HaversineDistanceProvider(circuity=1.3).matrix([A], [B])[0][0] == round(_haversine_m(A, B) * 1.3)
+
+
+def test_road_graph_shortest_paths_respect_one_way_streets(tmp_path):
+    graph = RoadGraph.from_geojson(STREETS)
+    assert graph.n_nodes == 6 and graph.n_edges == 2 * 2 + 1 + 2
+
+    matrix = RoadGraphDistanceProvider(graph=graph).matrix([A, C, D, E], [A, C, D, E])
+    a_to_c = _haversine_m(A, B) + _haversine_m(B, C)
+    assert abs(matrix[0][1] - a_to_c) <= 1
+    assert abs(matrix[0][2] - (a_to_c + _haversine_m(C, D))) <= 1 # A -> C -> D, with the flow
+    assert matrix[2][0] == distance_providers.NO_ROUTE_PENALTY # D -> C is against the one-way
+    assert matrix[0][3] == matrix[3][0] == distance_providers.NO_ROUTE_PENALTY # E is disconnected
+    assert [matrix[i][i] for i in range(4)] == [0, 0, 0, 0]
+
+    # Points off the graph are snapped to their nearest node; the snap distance is included
+    near_a = (5.6005, -0.200)
+    assert abs(RoadGraphDistanceProvider(graph=graph).matrix([near_a], [C])[0][0] - (_haversine_m(near_a, A) + a_to_c)) <= 2
+
+    path = str(tmp_path / "streets.npz")
+    graph.save_npz(path)
+    assert (RoadGraphDistanceProvider(path).matrix([A, D], [C, D]) == matrix[[0, 2]][:, [1, 2]]).all()
+
+
+def test_provider_selection_and_fallback(monkeypatch):
+    points = [A, B, C]
+    monkeypatch.setattr(settings, 'MAPS_API_KEY_GHANA', "dummy_key")
+    monkeypatch.setattr(settings, 'DISTANCE_PROVIDER', "google")
+    monkeypatch.setattr(settings, 'DISTANCE_PROVIDER_FALLBACK', "haversine")
+
+    # No Maps key: the Google provider fails and the haversine fallback answers
+    matrix, provider_used = asyncio.run(routing_service.get_provider_distance_matrix(points))
+    assert provider_used == "haversine"
+    assert matrix == HaversineDistanceProvider().matrix(points, points).tolist()
+
+    matrix, provider_used = asyncio.run(routing_service.get_provider_distance_matrix(points, "haversine"))
+    assert provider_used == "haversine"
+
+    with pytest.raises(ValueError):
+        routing_service.get_distance_provider("carrier-pigeon")
+
+    monkeypatch.setattr(settings, 'DISTANCE_PROVIDER_FALLBACK', "")
+    with pytest.raises(routing_service.DistanceMatrixError):
+        asyncio.run(routing_service.get_provider_distance_matrix(points))
+
+    with pytest.raises(NotImplementedError, match="get_matrix"): # Async-only, never asyncio.run inside the API's loop
+        routing_service.get_distance_provider("google").matrix(points, points)
@@ -0,0 +1,116 @@
+import asyncio
+import gzip
+import json
+import pytest
+import mongomock
+from datetime import datetime, timedelta
+
+from api.services import export_service, data_service, prediction_service
+from api.tests.mongo_fakes import AsyncCollection
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    db = mongomock.MongoClient().db
+    monkeypatch.setattr(export_service, 'get_async_collection', lambda name: AsyncCollection(db[name]))
+    db[data_service.BINS_COLLECTION].insert_many([dict(b) for b in data_service.SAMPLE_BINS_DATA])
+    start = datetime(2023, 1, 1)
+    # Two bins share every timestamp, so pages must break ties on _id
+    db[data_service.WASTE_READINGS_COLLECTION].insert_many([
+        {"bin_id": bin_id, "reading_timestamp": start + timedelta(hours=h), "fill_level_percent": float(h)}
+        for h in range(10) for bin_id in ("GH-ACC-BIN-001", "GH-ACC-BIN-002")
+    ])
+    return db
+
+
+def _collect(pages):
+    async def run():
+        return [page async for page in pages]
+    return asyncio.run(run())
+
+
+def _lines(chunks, compressed=False):
+    body = b"".join(chunks)
+    if compressed:
+        body = gzip.decompress(body)
+    return [json.loads(line) for line in body.decode().splitlines()]
+
+
+def test_bin_pages_walk_keyset_in_order(mock_db):
+    pages = _collect(export_service.iter_bin_pages(page_size=3))
+    assert [len(page) for page in pages] == [3, 3, 3, 1]
+    bin_ids = [doc["bin_id"] for page in pages for doc in page]
+    assert bin_ids == sorted(b["bin_id"] for b in data_service.SAMPLE_BINS_DATA)
+
+    resumed = _collect(export_service.iter_bin_pages(after=bin_ids[6], fields=["capacity_kg"], limit=2, page_size=3))
+    assert resumed == [[{"bin_id": bin_ids[7], "capacity_kg": 200}, {"bin_id": bin_ids[8], "capacity_kg": 150}]]
+
+
+def test_reading_pages_break_timestamp_ties_on_id(mock_db):
+    pages = _collect(export_service.iter_reading_pages(page_size=3))
+    readings = [doc for page in pages for doc in page]
+    assert len(readings) == 20
+    keys = [(doc["reading_timestamp"], doc["_id"]) for doc in readings]
+    assert keys == sorted(keys) and len(set(keys)) == 20
+
+    # Resuming from the 5th line returns exactly the rest
+    after = (readings[4]["reading_timestamp"], str(readings[4]["_id"]))
+    rest = [doc for page in _collect(export_service.iter_reading_pages(after=after, page_size=4)) for doc in page]
+    assert [doc["_id"] for doc in rest] == [doc["_id"] for doc in readings[5:]]
+
+    one_bin = _collect(export_service.iter_reading_pages(bin_id="GH-ACC-BIN-002", start=datetime(2023, 1, 1, 5),
+                                                         fields=["fill_level_percent"], page_size=100))
+    assert [doc["fill_level_percent"] for doc in one_bin[0]] == [5.0, 6.0, 7.0, 8.0, 9.0]
+    assert set(one_bin[0][0]) == {"_id", "reading_timestamp", "fill_level_percent"}
+
+
+def test_projection_validation():
+    with pytest.raises(ValueError):
+        export_service.iter_bin_pages(fields=["bin_id", "secret"])
+    with pytest.raises(ValueError):
+        export_service.iter_reading_pages(after=(datetime(2023, 1, 1), "not-an-object-id"))
+
+
+def test_ndjson_stream_plain_and_gzip(mock_db):
+    plain = _lines(_collect(export_service.ndjson_stream(export_service.iter_reading_pages(page_size=7))))
+    compressed = _lines(_collect(export_service.ndjson_stream(export_service.iter_reading_pages(page_size=7), compress=True)),
+                        compressed=True)
+    assert plain == compressed
+    assert len(plain) == 20
+    assert plain[0]["reading_timestamp"] == "2023-01-01T00:00:00"
+    assert isinstance(plain[0]["_id"], str)
+
+
+def test_prediction_pages(mock_db, monkeypatch):
+    calls = []
+    def fake_predict(items):
+        calls.append(len(items))
+        return [50.0] * len(items)
+    monkeypatch.setattr(prediction_service, 'predict_fill_levels_batch', fake_predict)
+
+    target = datetime(2023, 2, 1, 12)
+    pages = _collect(export_service.iter_prediction_pages(target, page_size=4))
+    assert calls == [4, 4, 2] # One model call per page
+    assert pages[0][0] == {"bin_id": "GH-ACC-BIN-001", "timestamp": target, "predicted_fill_level_percent": 50.0}
+
+
+def test_export_endpoints(mock_db):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from api.routers import export_router
+
+    app = FastAPI()
+    app.include_router(export_router.router)
+    client = TestClient(app)
+
+    response = client.get("/export/bins", params={"fields": "bin_id", "limit": 3}, headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert _lines([response.content]) == [{"bin_id": f"GH-ACC-BIN-00{i}"} for i in (1, 2, 3)]
+
+    response = client.get("/export/readings", params={"bin_id": "GH-ACC-BIN-001"}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(_lines([response.content])) == 10 # The test client decompresses transparently
+
+    assert client.get("/export/bins", params={"fields": "nope"}).status_code == 400
+    assert client.get("/export/readings", params={"after_id": "abc"}).status_code == 400
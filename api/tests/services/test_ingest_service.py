@@ -0,0 +1,87 @@
+import asyncio
+import json
+import pytest
+import mongomock
+from datetime import datetime
+
+from api.services import async_data_service, data_service, ingest_service
+from api.tests.mongo_fakes import AsyncCollection
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    db = mongomock.MongoClient().db
+    db[data_service.BIN_STATE_COLLECTION].create_index("bin_id", unique=True)
+    monkeypatch.setattr(async_data_service, 'get_async_collection', lambda name: AsyncCollection(db[name]))
+    return db
+
+
+async def _chunks(payload: bytes, chunk_size: int):
+    for start in range(0, len(payload), chunk_size):
+        yield payload[start:start + chunk_size]
+
+
+def _reading(bin_id, hour, fill):
+    return {"bin_id": bin_id, "reading_timestamp": f"2023-01-01T{hour:02d}:00:00", "fill_level_percent": fill}
+
+
+def test_ingest_ndjson_reports_per_batch_counts(mock_db):
+    lines = [json.dumps(_reading("B1", h, 10.0 * h)) for h in range(1, 6)]
+    lines.insert(2, "{not json")
+    lines.insert(4, json.dumps({"bin_id": "B2", "reading_timestamp": "2023-01-01T01:00:00", "fill_level_percent": 150}))
+    lines.append("") # Trailing newline / blank lines are ignored
+    payload = "\n".join(lines).encode()
+
+    # Small chunks split lines across reads
+    result = asyncio.run(ingest_service.ingest_ndjson(_chunks(payload, 7), batch_size=3, max_in_flight=2))
+
+    assert (result.received, result.accepted, result.rejected) == (7, 5, 2)
+    assert [(b.received, b.accepted, b.rejected) for b in result.batches] == [(3, 2, 1), (3, 2, 1), (1, 1, 0)]
+    assert result.batches[0].errors[0].position == 3 and "invalid JSON" in result.batches[0].errors[0].error
+    assert result.batches[1].errors[0].position == 5 and "fill_level_percent" in result.batches[1].errors[0].error
+
+    assert mock_db[data_service.WASTE_READINGS_COLLECTION].count_documents({}) == 5
+    state = mock_db[data_service.BIN_STATE_COLLECTION].find_one({"bin_id": "B1"})
+    assert state["fill_level_percent"] == 50.0
+    assert state["reading_timestamp"] == datetime(2023, 1, 1, 5)
+
+
+def test_ingest_json_array(mock_db):
+    body = json.dumps([_reading("B1", 1, 10.0), {"bin_id": "B1"}, _reading("B2", 2, 20.0)]).encode()
+    result = asyncio.run(ingest_service.ingest_json_array(body, batch_size=2))
+    assert (result.accepted, result.rejected) == (2, 1)
+    assert result.batches[0].errors[0].position == 1
+
+    with pytest.raises(ValueError):
+        asyncio.run(ingest_service.ingest_json_array(b'{"bin_id": "B1"}'))
+
+
+def test_ingest_bounds_in_flight_batches(monkeypatch):
+    in_flight, peak = 0, 0
+
+    async def slow_record(readings):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return len(readings), {}
+
+    monkeypatch.setattr(async_data_service, 'record_waste_readings', slow_record)
+    payload = "\n".join(json.dumps(_reading(f"B{i}", 1, 10.0)) for i in range(40)).encode()
+    result = asyncio.run(ingest_service.ingest_ndjson(_chunks(payload, 64), batch_size=4, max_in_flight=2))
+
+    assert result.accepted == 40 and len(result.batches) == 10
+    assert peak == 2
+
+
+def test_write_errors_are_reported_as_rejections(monkeypatch):
+    async def partially_failing_record(readings):
+        return len(readings) - 1, {0: "E11000 duplicate key"}
+
+    monkeypatch.setattr(async_data_service, 'record_waste_readings', partially_failing_record)
+    body = json.dumps([{"bin_id": "B1"}, _reading("B1", 1, 10.0), _reading("B1", 2, 20.0)]).encode()
+    result = asyncio.run(ingest_service.ingest_json_array(body))
+    # Item 0 fails validation; the first *valid* reading (position 1) fails the write
+    assert {(e.position, e.error.startswith("E11000")) for e in result.batches[0].errors} == {(0, False), (1, True)}
+    assert result.accepted == 1
@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock # For mocking DB and joblib
@@ -14,6 +15,9 @@ from api.services import prediction_service
 # Ensure MODEL_DIR and MODEL_PATH are aligned with the service for testing
 TEST_MODEL_DIR = "api/models_ml_test" # Use a separate dir for test models
 TEST_MODEL_PATH = os.path.join(TEST_MODEL_DIR, "waste_predictor_ghana_test.joblib")
+TEST_STATE_PATH = os.path.join(TEST_MODEL_DIR, "waste_predictor_ghana_test.state.json")
+TEST_COMPILED_PATH = os.path.join(TEST_MODEL_DIR, "waste_predictor_ghana_test.npz")
+TEST_ARTIFACT_PATHS = (TEST_MODEL_PATH, TEST_STATE_PATH, TEST_COMPILED_PATH)
 
 @pytest.fixture(autouse=True)
 def setup_test_environment(monkeypatch):
@@ -22,19 +26,26 @@ def setup_test_environment(monkeypatch):
     monkeypatch.setattr(prediction_service, 'MODEL_DIR', TEST_MODEL_DIR)
     monkeypatch.setattr(prediction_service, 'MODEL_PATH', TEST_MODEL_PATH)
 
+    # Start every test with empty model caches
+    prediction_service.model_cache.reset()
+    prediction_service.compiled_model_cache.reset()
+    prediction_service.prediction_memo.clear()
+
     # Create the test model directory if it doesn't exist
     os.makedirs(TEST_MODEL_DIR, exist_ok=True)
 
-    # Clean up any test model file before each test
-    if os.path.exists(TEST_MODEL_PATH):
-        os.remove(TEST_MODEL_PATH)
+    # Clean up any test model file (and its training state) before each test
+    for path in TEST_ARTIFACT_PATHS:
+        if os.path.exists(path):
+            os.remove(path)
 
     yield # Test runs here
 
     # Clean up after tests if needed (e.g., remove TEST_MODEL_DIR)
-    # For now, just removing the model file is fine.
-    if os.path.exists(TEST_MODEL_PATH):
-        os.remove(TEST_MODEL_PATH)
+    # For now, just removing the model and state files is fine.
+    for path in TEST_ARTIFACT_PATHS:
+        if os.path.exists(path):
+            os.remove(path)
     # Consider removing TEST_MODEL_DIR if it was created and is empty
     # if os.path.exists(TEST_MODEL_DIR) and not os.listdir(TEST_MODEL_DIR):
     #     os.rmdir(TEST_MODEL_DIR)
@@ -85,7 +96,25 @@ def test_fetch_waste_readings_data_with_data(monkeypatch, sample_raw_df):
     df = prediction_service.fetch_waste_readings_data()
     assert not df.empty
     assert len(df) == len(sample_raw_df)
-    pd.testing.assert_frame_equal(df, sample_raw_df, check_dtype=False) # Dtypes might differ slightly after mongo roundtrip if not careful
+    # Only the projected training columns come back (no _id / bin_id)
+    expected_df = sample_raw_df[['reading_timestamp', 'fill_level_percent']]
+    pd.testing.assert_frame_equal(df, expected_df, check_dtype=False) # Dtypes might differ slightly after mongo roundtrip if not careful
+    _, projection = mock_collection.find.call_args[0]
+    assert projection == prediction_service.TRAINING_DATA_PROJECTION
+
+def test_fetch_waste_readings_data_grows_across_batches(monkeypatch):
+    """Readings spanning several cursor batches are all written into the NumPy columns in order."""
+    start = datetime(2023, 1, 1)
+    docs = [{"reading_timestamp": start + timedelta(hours=i), "fill_level_percent": float(i % 100)} for i in range(25)]
+    mock_collection = MagicMock()
+    mock_collection.find.return_value = iter(docs)
+    monkeypatch.setattr(prediction_service, 'get_collection', MagicMock(return_value=mock_collection))
+
+    df = prediction_service.fetch_waste_readings_data(batch_size=4)
+    assert len(df) == 25
+    assert df['fill_level_percent'].tolist() == [float(i) for i in range(25)]
+    assert df['reading_timestamp'].iloc[-1] == pd.Timestamp(start + timedelta(hours=24))
+    assert mock_collection.find.call_args[1]['batch_size'] == 4
 
 def test_engineer_features_empty_df():
     """Test feature engineering with an empty DataFrame."""
@@ -137,7 +166,7 @@ def test_train_waste_prediction_model_success(
     mock_engineer_features.return_value = sample_featured_df[
         ['day_of_week', 'hour_of_day', 'day_of_year', 'fill_level_percent']
     ].copy() # Use .copy() to avoid modifying the fixture if it's used elsewhere after this
-
+    mock_joblib_dump.side_effect = lambda model, path: open(path, "wb").close()
 
     result = prediction_service.train_waste_prediction_model()
 
@@ -152,7 +181,9 @@ def test_train_waste_prediction_model_success(
 
     mock_joblib_dump.assert_called_once()
     args, _ = mock_joblib_dump.call_args
-    assert args[1] == TEST_MODEL_PATH
+    assert args[1] == TEST_MODEL_PATH + ".tmp" # Written aside, then moved into place
+    assert os.path.exists(TEST_MODEL_PATH) and os.path.exists(TEST_STATE_PATH)
+    assert not any(os.path.exists(path + ".tmp") for path in TEST_ARTIFACT_PATHS)
 
 
 @patch('api.services.prediction_service.fetch_waste_readings_data')
@@ -239,3 +270,237 @@ def test_predict_fill_levels_feature_engineering_fails_for_prediction(
         future_timestamp=datetime(2023, 1, 3, 10, 0, 0)
     )
     assert prediction is None
+
+
+@patch('joblib.load')
+@patch('os.path.exists')
+def test_predict_fill_levels_uses_cached_model(mock_os_exists, mock_joblib_load):
+    """Repeated predictions load the model once; invalidation forces a reload."""
+    mock_os_exists.return_value = True
+    mock_model = MagicMock()
+    mock_model.predict.return_value = [40.0]
+    mock_joblib_load.return_value = mock_model
+
+    for hour in range(5):
+        assert prediction_service.predict_fill_levels("B001", datetime(2023, 1, 3, hour, 0, 0)) == 40.0
+
+    stats = prediction_service.get_model_cache_stats()
+    assert mock_joblib_load.call_count == 1
+    assert stats["reloads"] == 1
+    assert stats["hits"] == 4
+
+    prediction_service.model_cache.invalidate()
+    prediction_service.predict_fill_levels("B001", datetime(2023, 1, 3, 10, 0, 0))
+    assert mock_joblib_load.call_count == 2
+    assert prediction_service.get_model_cache_stats()["reloads"] == 2
+
+
+def test_model_cache_reloads_when_file_changes():
+    """A new artifact on disk (different mtime/size) is picked up after the check interval."""
+    cache = prediction_service.ModelCache(check_interval_seconds=0)
+    joblib.dump({"v": 1}, TEST_MODEL_PATH)
+    assert cache.get(TEST_MODEL_PATH) == {"v": 1}
+    assert cache.get(TEST_MODEL_PATH) == {"v": 1}
+    assert cache.reloads == 1 and cache.hits == 1
+
+    joblib.dump({"v": 2, "padding": "x" * 64}, TEST_MODEL_PATH)
+    assert cache.get(TEST_MODEL_PATH)["v"] == 2
+    assert cache.reloads == 2
+
+
+@patch('joblib.load')
+@patch('os.path.exists')
+def test_predict_fill_levels_batch_single_model_call(mock_os_exists, mock_joblib_load):
+    """Batch prediction calls the model once, keeps input order and clamps to 0-100."""
+    mock_os_exists.return_value = True
+    mock_model = MagicMock()
+    # Predicted value = hour_of_day * 10, so order and clamping are easy to check
+    mock_model.predict.side_effect = lambda X: (X['hour_of_day'] * 10.0 - 5.0).to_numpy()
+    mock_joblib_load.return_value = mock_model
+
+    items = [
+        ("B001", datetime(2023, 1, 3, 12, 0, 0)),
+        ("B002", datetime(2023, 1, 3, 0, 0, 0)),
+        ("B003", datetime(2023, 1, 3, 5, 0, 0)),
+    ]
+    predictions = prediction_service.predict_fill_levels_batch(items)
+
+    assert predictions == [100.0, 0.0, 45.0]
+    mock_model.predict.assert_called_once()
+    assert len(mock_model.predict.call_args[0][0]) == len(items)
+
+
+def test_predict_fill_levels_batch_empty():
+    assert prediction_service.predict_fill_levels_batch([]) == []
+
+
+def _readings_df(start, hours):
+    """Synthetic readings: one per hour starting at `start`."""
+    timestamps = [start + timedelta(hours=h) for h in range(hours)]
+    return pd.DataFrame({
+        'reading_timestamp': timestamps,
+        'fill_level_percent': [float((t.hour * 4) % 100) for t in timestamps],
+    })
+
+
+@patch('api.services.prediction_service.fetch_waste_readings_data')
+def test_train_incremental_uses_watermark(mock_fetch_data):
+    """Incremental retraining fetches only readings after the watermark and warm-starts the model."""
+    mock_fetch_data.return_value = _readings_df(datetime(2023, 1, 1), 48)
+    assert prediction_service.train_waste_prediction_model() is True
+    state = prediction_service.load_training_state()
+    assert state["mode"] == "full"
+    assert state["watermark"] == datetime(2023, 1, 2, 23, 0, 0)
+
+    mock_fetch_data.reset_mock()
+    mock_fetch_data.return_value = _readings_df(datetime(2023, 1, 3), 6)
+    assert prediction_service.train_waste_prediction_model(incremental=True) is True
+
+    mock_fetch_data.assert_called_once_with({"reading_timestamp": {"$gt": datetime(2023, 1, 2, 23, 0, 0)}})
+    model = joblib.load(TEST_MODEL_PATH)
+    assert model.n_estimators == 100 + prediction_service.INCREMENTAL_ESTIMATORS
+    state = prediction_service.load_training_state()
+    assert state["mode"] == "incremental"
+    assert state["watermark"] == datetime(2023, 1, 3, 5, 0, 0)
+
+
+@patch('api.services.prediction_service.fetch_waste_readings_data')
+def test_train_incremental_falls_back_to_full_refit(mock_fetch_data):
+    """Without a saved model/watermark, incremental mode performs a full refit."""
+    mock_fetch_data.return_value = _readings_df(datetime(2023, 1, 1), 24)
+    assert prediction_service.train_waste_prediction_model(incremental=True) is True
+    mock_fetch_data.assert_called_once_with(None)
+    assert prediction_service.load_training_state()["mode"] == "full"
+
+
+@patch('api.services.prediction_service.fetch_waste_readings_data')
+def test_predictions_use_compiled_model_after_training(mock_fetch_data):
+    """Training exports the compiled model, and predictions then skip joblib/sklearn entirely."""
+    mock_fetch_data.return_value = _readings_df(datetime(2023, 1, 1), 72)
+    assert prediction_service.train_waste_prediction_model() is True
+    assert os.path.exists(TEST_COMPILED_PATH)
+
+    sklearn_model = joblib.load(TEST_MODEL_PATH)
+    timestamps = [datetime(2023, 1, 5, hour, 0, 0) for hour in range(24)]
+    features = prediction_service.engineer_features(pd.DataFrame({'reading_timestamp': timestamps}))
+    expected = np.round(np.clip(sklearn_model.predict(features[prediction_service.PREDICTION_FEATURES]), 0, 100), 2)
+
+    with patch('joblib.load') as mock_joblib_load:
+        predictions = prediction_service.predict_fill_levels_batch([("B001", ts) for ts in timestamps])
+    mock_joblib_load.assert_not_called()
+    assert predictions == expected.tolist()
+    assert prediction_service.get_model_cache_stats()["compiled"]["reloads"] == 1
+
+
+@patch('joblib.load')
+@patch('os.path.exists')
+def test_predict_fill_levels_batch_memoizes_by_feature_vector(mock_os_exists, mock_joblib_load):
+    """Identical feature vectors are predicted once; repeated requests are served from the memo."""
+    mock_os_exists.return_value = True
+    mock_model = MagicMock()
+    mock_model.predict.side_effect = lambda X: np.full(len(X), 55.0)
+    mock_joblib_load.return_value = mock_model
+
+    horizon = datetime(2023, 1, 3, 18, 0, 0)
+    items = [(f"B{i:04d}", horizon) for i in range(1000)]
+    assert prediction_service.predict_fill_levels_batch(items) == [55.0] * 1000
+    assert len(mock_model.predict.call_args[0][0]) == 1 # 1000 bins, one distinct feature row
+
+    assert prediction_service.predict_fill_levels_batch(items) == [55.0] * 1000
+    assert mock_model.predict.call_count == 1
+    memo_stats = prediction_service.get_model_cache_stats()["predictions"]
+    assert memo_stats["hits"] == 1 and memo_stats["misses"] == 1
+
+    # Retraining invalidates memoized predictions
+    prediction_service._invalidate_model_caches()
+    prediction_service.predict_fill_levels_batch(items)
+    assert mock_model.predict.call_count == 2
+
+
+def test_prediction_memo_lru_and_ttl():
+    memo = prediction_service.PredictionMemo(max_entries=2, ttl_seconds=60)
+    memo.put(("a",), 1.0)
+    memo.put(("b",), 2.0)
+    assert memo.get(("a",)) == 1.0 # "a" becomes most recently used
+    memo.put(("c",), 3.0)
+    assert memo.get(("b",)) is None # Least recently used entry evicted
+    assert memo.get(("a",)) == 1.0 and memo.get(("c",)) == 3.0
+
+    expired = prediction_service.PredictionMemo(max_entries=10, ttl_seconds=0)
+    expired.put(("a",), 1.0)
+    assert expired.get(("a",)) is None
+    assert expired.stats()["size"] == 0
+
+
+def test_training_on_hourly_rollups_matches_raw_readings(monkeypatch):
+    """A count-weighted fit on hourly rollups gives the same model as a fit on the raw readings."""
+    import mongomock
+    from api.services import data_service
+    from api.models_pydantic import WasteReadingDocument
+    from api.tests.mongo_fakes import bulk_write_db
+
+    db = mongomock.MongoClient().db
+    monkeypatch.setattr(data_service, 'get_collection', bulk_write_db(db))
+    monkeypatch.setattr(prediction_service, 'get_collection', bulk_write_db(db))
+    rng = np.random.default_rng(0)
+    readings = [
+        WasteReadingDocument(bin_id=f"B{b}", reading_timestamp=datetime(2023, 1, 1) + timedelta(minutes=20 * i + b),
+                             fill_level_percent=float(rng.uniform(0, 100)))
+        for i in range(3 * 24 * 4) for b in range(3)
+    ]
+    data_service.record_waste_readings(readings)
+
+    hourly = prediction_service.fetch_waste_readings_data(source="hourly")
+    assert len(hourly) == 3 * 96 # 3 bins x 96 hours, 3 readings per bin-hour
+    assert hourly['reading_count'].sum() == len(readings)
+
+    predictions = {}
+    for source in ("raw", "hourly"):
+        monkeypatch.setattr(prediction_service.settings, 'TRAINING_DATA_SOURCE', source)
+        assert prediction_service.train_waste_prediction_model() is True
+        model = joblib.load(TEST_MODEL_PATH)
+        X = prediction_service._time_feature_matrix([datetime(2023, 1, 5, h) for h in range(24)])
+        predictions[source] = model.predict(pd.DataFrame(X, columns=prediction_service.PREDICTION_FEATURES))
+    np.testing.assert_allclose(predictions["hourly"], predictions["raw"], rtol=1e-9, atol=1e-9)
+
+
+def test_incremental_hourly_training_waits_for_buckets_to_close(monkeypatch):
+    """Readings appended to the still-open hour after a training run are trained once that hour closes."""
+    import mongomock
+    from api.services import data_service
+    from api.models_pydantic import WasteReadingDocument
+    from api.tests.mongo_fakes import bulk_write_db
+
+    db = mongomock.MongoClient().db
+    monkeypatch.setattr(data_service, 'get_collection', bulk_write_db(db))
+    monkeypatch.setattr(prediction_service, 'get_collection', bulk_write_db(db))
+    monkeypatch.setattr(prediction_service.settings, 'TRAINING_DATA_SOURCE', 'hourly')
+    start = datetime(2023, 1, 1)
+    def record(minutes):
+        data_service.record_waste_readings([
+            WasteReadingDocument(bin_id="B0", reading_timestamp=start + timedelta(minutes=m), fill_level_percent=float(m % 100))
+            for m in minutes])
+
+    fetched = []
+    fetch = prediction_service.fetch_waste_readings_data
+    def recording_fetch(query=None, **kwargs):
+        df = fetch(query, **kwargs)
+        fetched.append(df)
+        return df
+    monkeypatch.setattr(prediction_service, 'fetch_waste_readings_data', recording_fetch)
+
+    # 48 hours of readings; the clock is in the last hour, whose bucket is still open
+    record(range(0, 48 * 60, 20))
+    monkeypatch.setattr(prediction_service, '_open_hour_start', lambda: start + timedelta(hours=47))
+    assert prediction_service.train_waste_prediction_model() is True
+    assert prediction_service.load_training_state()["watermark"] == start + timedelta(hours=46)
+
+    # More readings land in that hour, then it closes
+    record([47 * 60 + 50, 47 * 60 + 55])
+    monkeypatch.setattr(prediction_service, '_open_hour_start', lambda: start + timedelta(hours=48))
+    assert prediction_service.train_waste_prediction_model(incremental=True) is True
+
+    last_hour = fetched[-1]
+    assert list(last_hour['reading_timestamp']) == [start + timedelta(hours=47)]
+    assert last_hour['reading_count'].sum() == 3 + 2 # Readings from before and after the first run
+    assert prediction_service.load_training_state()["watermark"] == start + timedelta(hours=47)
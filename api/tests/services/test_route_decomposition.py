@@ -0,0 +1,56 @@
+import math
+import random
+
+from api.services import route_decomposition
+
+
+DEPOT = (5.6037, -0.1870)
+
+
+def _city(n_stops, seed=7):
+    rng = random.Random(seed)
+    points = [DEPOT] + [(5.53 + rng.random() * 0.15, -0.27 + rng.random() * 0.15) for _ in range(n_stops)]
+    demands = [0] + [rng.randint(5, 40) for _ in range(n_stops)]
+    return points, demands
+
+
+def test_sweep_starts_after_the_widest_empty_sector():
+    # Stops east, north and west of the depot; nothing to the south
+    points = [(0.0, 0.0), (0.0, 1.0), (1.0, 0.0), (0.0, -1.0)]
+    positions = route_decomposition.sweep_positions(points)
+    assert positions == {1: 0.0, 2: math.pi / 2, 3: math.pi} # East to west; the empty southern half closes the sweep
+
+
+def test_vehicles_get_balanced_sweep_sectors_within_capacity():
+    points, demands = _city(300)
+    capacities = [1000] * 8
+    positions = route_decomposition.sweep_positions(points)
+    vehicle_stops = route_decomposition.assign_vehicles(positions, demands, capacities)
+
+    assert sorted(node for stops in vehicle_stops for node in stops) == list(range(1, 301))
+    loads = [sum(demands[node] for node in stops) for stops in vehicle_stops]
+    assert all(load <= 1000 for load in loads)
+    target = sum(demands) / len(capacities)
+    assert all(load >= target * 0.9 for load in loads[:-1]) # Balanced, not filled to capacity one by one
+    # Each vehicle covers one contiguous sector
+    for first, second in zip(vehicle_stops, vehicle_stops[1:]):
+        if first and second:
+            assert max(positions[node] for node in first) <= min(positions[node] for node in second)
+
+    assert route_decomposition.assign_vehicles(positions, demands, [100] * 8) is None # Not enough capacity
+
+
+def test_clusters_group_neighbouring_vehicles():
+    vehicle_stops = [[1] * 40, [2] * 40, [3] * 40, [4] * 40, [5] * 70, []]
+    assert route_decomposition.group_clusters(vehicle_stops, 100) == [[0, 1], [2, 3], [4, 5]]
+    assert route_decomposition.group_clusters([[1] * 300], 100) == [[0]] # A vehicle is never split
+
+
+def test_subproblem_maps_nodes_and_warm_starts():
+    demands = [0, 5, 6, 7, 8]
+    matrix = [[0, 10, 20], [10, 0, 15], [20, 15, 0]] # Depot, node 3, node 1
+    problem = route_decomposition.build_subproblem(0, [3, 1], [1], demands, [50, 30], matrix, 2.0, routes=[[1, 3]])
+    assert problem["demands"] == [0, 7, 5]
+    assert problem["vehicle_capacities"] == [30] and problem["num_vehicles"] == 1
+    assert problem["initial_routes"] == [[2, 1]]
+    assert route_decomposition.route_cost(matrix, [2, 1]) == 20 + 15 + 10
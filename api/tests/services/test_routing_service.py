@@ -0,0 +1,274 @@
+import asyncio
+import time
+import pytest
+import httpx
+
+from api.config import settings
+from api.services import routing_service
+
+
+def test_plan_distance_matrix_tiles_respects_limits():
+    for n_origins, n_destinations in [(200, 200), (1, 200), (200, 3), (7, 7), (26, 26)]:
+        tiles = routing_service.plan_distance_matrix_tiles(n_origins, n_destinations, max_elements=100)
+        covered = {(i, j) for rows, cols in tiles for i in rows for j in cols}
+        assert len(covered) == n_origins * n_destinations == sum(len(r) * len(c) for r, c in tiles)
+        assert all(len(rows) * len(cols) <= 100 and len(rows) <= 25 and len(cols) <= 25 for rows, cols in tiles)
+    assert len(routing_service.plan_distance_matrix_tiles(200, 200, max_elements=100)) == 400
+    assert len(routing_service.plan_distance_matrix_tiles(1, 200, max_elements=100)) == 8 # 1x25 tiles
+
+
+def test_tiles_are_fetched_concurrently_and_stitched(fake_api, make_points, monkeypatch):
+    monkeypatch.setattr(settings, 'DISTANCE_MATRIX_CONCURRENCY', 4)
+    fake_api.latency = 0.005
+    points = make_points(45)
+
+    matrix = asyncio.run(routing_service.get_distance_matrix(points, points, "key"))
+
+    fmt = lambda point: f"{point[0]:.6f},{point[1]:.6f}"
+    assert matrix == [[fake_api.distance(fmt(o), fmt(d)) for d in points] for o in points]
+    assert fake_api.requests == 25 # 5x5 tiles of 10x10 (one tile row/column is partial)
+    assert fake_api.max_elements <= settings.DISTANCE_MATRIX_MAX_ELEMENTS
+    assert 1 < fake_api.max_in_flight <= 4
+
+
+def test_over_query_limit_is_retried(fake_api, make_points):
+    fake_api.rate_limited_first_attempts = 3
+    points = make_points(12)
+    matrix = asyncio.run(routing_service.get_distance_matrix(points, points, "key"))
+    assert len(matrix) == 12 and all(len(row) == 12 for row in matrix)
+    assert fake_api.requests == 4 + 3 # 4 tiles plus the rate-limited attempts
+
+
+def test_non_retryable_status_fails_fast(make_points, monkeypatch):
+    requests = []
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"status": "REQUEST_DENIED", "error_message": "bad key"})
+    monkeypatch.setattr(routing_service, '_new_http_client', lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(routing_service, '_http_client', None)
+
+    with pytest.raises(routing_service.DistanceMatrixError, match="REQUEST_DENIED"):
+        asyncio.run(routing_service.get_distance_matrix(make_points(3), make_points(3), "key"))
+    assert len(requests) == 1
+
+
+def test_element_without_route_gets_penalty(make_points, monkeypatch):
+    def handler(request):
+        return httpx.Response(200, json={"status": "OK", "rows": [
+            {"elements": [{"status": "OK", "distance": {"value": 0}}, {"status": "ZERO_RESULTS"}]},
+            {"elements": [{"status": "NOT_FOUND"}, {"status": "OK", "distance": {"value": 0}}]},
+        ]})
+    monkeypatch.setattr(routing_service, '_new_http_client', lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(routing_service, '_http_client', None)
+    matrix = asyncio.run(routing_service.get_distance_matrix(make_points(2), make_points(2), "key"))
+    assert matrix == [[0, routing_service.NO_ROUTE_PENALTY], [routing_service.NO_ROUTE_PENALTY, 0]]
+
+
+def _cvrp_problem(n_stops=60, num_vehicles=3, capacity=25, time_limit_seconds=1):
+    points = [(5.55, -0.25)] + [(5.55 + (i % 8) * 0.004, -0.25 + (i // 8) * 0.003) for i in range(n_stops)]
+    return {
+        "distance_matrix": [[int(abs(a[0] - b[0]) * 111_000 + abs(a[1] - b[1]) * 111_000) for b in points] for a in points],
+        "demands": [0] + [1] * n_stops,
+        "vehicle_capacities": [capacity] * num_vehicles,
+        "num_vehicles": num_vehicles,
+        "depot": 0,
+        "time_limit_seconds": time_limit_seconds,
+    }
+
+
+@pytest.fixture
+def solver_pool(monkeypatch):
+    pytest.importorskip("ortools")
+    monkeypatch.setattr(settings, 'ROUTING_SOLVER_WORKERS', 1)
+    monkeypatch.setattr(settings, 'ROUTING_SOLVER_MAX_QUEUED', 0)
+    routing_service.shutdown_solver_executor()
+    yield
+    routing_service.shutdown_solver_executor()
+
+
+def test_solve_cvrp_visits_every_stop_within_capacity():
+    pytest.importorskip("ortools")
+    from api.services import vrp_solver
+    result = vrp_solver.solve_cvrp(_cvrp_problem())
+    assert result["status"] == "success"
+    assert sorted(node for route in result["routes"] for node in route) == list(range(1, 61))
+    assert all(len(route) <= 25 for route in result["routes"]) # Unit demands
+    assert vrp_solver.solve_cvrp(_cvrp_problem(), should_stop=lambda: True)["status"] == "cancelled"
+
+
+def test_solver_pool_stays_off_the_event_loop_and_cancels(solver_pool):
+    async def run():
+        lags = []
+        async def ticker():
+            while True:
+                started = time.perf_counter()
+                await asyncio.sleep(0.02)
+                lags.append(time.perf_counter() - started - 0.02)
+        ticking = asyncio.create_task(ticker())
+
+        result = await routing_service.run_solver(_cvrp_problem())
+        assert result["status"] == "success"
+
+        # A long solve; the only slot is taken, so another request is turned away
+        disconnected = asyncio.Event()
+        async def is_disconnected():
+            return disconnected.is_set()
+        long_solve = asyncio.create_task(routing_service.run_solver(_cvrp_problem(time_limit_seconds=60), is_disconnected))
+        await asyncio.sleep(0.5)
+        with pytest.raises(routing_service.SolverBusyError):
+            await routing_service.run_solver(_cvrp_problem())
+
+        # The client goes away: the solve is cancelled and its slot comes back well before the time limit
+        started = time.perf_counter()
+        disconnected.set()
+        with pytest.raises(routing_service.SolveCancelledError):
+            await long_solve
+        while not routing_service._free_solver_slots:
+            assert time.perf_counter() - started < 10
+            await asyncio.sleep(0.05)
+
+        ticking.cancel()
+        return max(lags)
+
+    assert asyncio.run(run()) < 0.5 # The loop kept ticking while the solver worked
+
+
+def test_replaced_pool_ignores_late_releases_and_cancels_of_its_slots(monkeypatch):
+    from concurrent import futures
+    from concurrent.futures.process import BrokenProcessPool
+
+    class ManualExecutor:
+        """Stands in for the process pool; the test settles each solve's future itself."""
+        def __init__(self, **kwargs):
+            self.futures = []
+        def submit(self, fn, *args):
+            future = futures.Future()
+            future.set_running_or_notify_cancel() # Running: can only be stopped through its cancel flag
+            self.futures.append(future)
+            return future
+        def shutdown(self, wait=True, cancel_futures=False):
+            pass
+
+    monkeypatch.setattr(futures, 'ProcessPoolExecutor', ManualExecutor)
+    monkeypatch.setattr(settings, 'ROUTING_SOLVER_WORKERS', 1)
+    monkeypatch.setattr(settings, 'ROUTING_SOLVER_MAX_QUEUED', 0)
+    monkeypatch.setattr(routing_service, 'SOLVER_DISCONNECT_POLL_SECONDS', 0.01)
+    routing_service.shutdown_solver_executor()
+
+    async def run():
+        disconnected = asyncio.Event()
+        async def is_disconnected():
+            return disconnected.is_set()
+        old_executor = routing_service._get_solver_executor()
+        old_solve = asyncio.create_task(routing_service.run_solver({}, is_disconnected))
+        await asyncio.sleep(0.05)
+
+        # The pool breaks and is replaced while the old solve still holds the only slot
+        routing_service._reset_broken_solver_pool()
+        new_executor = routing_service._get_solver_executor()
+        new_solve = asyncio.create_task(routing_service.run_solver({}))
+        await asyncio.sleep(0.05)
+        assert routing_service._free_solver_slots == []
+
+        # The old solve is abandoned and its worker dies late: neither touches the new pool's slot
+        disconnected.set()
+        with pytest.raises(routing_service.SolveCancelledError):
+            await old_solve
+        assert routing_service._solver_cancel_flags[0] == 0
+        old_executor.futures[0].set_exception(BrokenProcessPool("worker died"))
+        await asyncio.sleep(0.05)
+        assert routing_service._free_solver_slots == []
+
+        new_executor.futures[0].set_result({"status": "success"})
+        assert (await new_solve)["status"] == "success"
+        assert len(routing_service._free_solver_slots) == 1 # Given back once, not duplicated
+
+    try:
+        asyncio.run(run())
+    finally:
+        routing_service.shutdown_solver_executor()
+
+
+def test_complete_initial_routes_repairs_a_previous_plan():
+    from api.services import vrp_solver
+    problem = _cvrp_problem(n_stops=12, num_vehicles=2, capacity=7)
+    # Node 99 no longer exists, 3 is repeated, vehicle 0 is over capacity, and nodes 9-12 are new
+    previous = [[1, 2, 3, 4, 5, 6, 7, 8], [3, 99]]
+    routes = vrp_solver.complete_initial_routes(problem, previous)
+    assert routes[0][:7] == [1, 2, 3, 4, 5, 6, 7] # Kept in order up to capacity
+    assert sorted(node for route in routes for node in route) == list(range(1, 13))
+    assert all(len(route) <= 7 for route in routes)
+    assert vrp_solver.complete_initial_routes(_cvrp_problem(n_stops=12, num_vehicles=2, capacity=5), previous) is None
+
+
+def test_warm_start_searches_from_the_previous_plan():
+    pytest.importorskip("ortools")
+    from api.services import vrp_solver
+    cold = vrp_solver.solve_cvrp(_cvrp_problem(time_limit_seconds=1))
+    assert cold["warm_started"] is False
+
+    warm_problem = dict(_cvrp_problem(time_limit_seconds=30), initial_routes=cold["routes"], warm_start_time_limit_seconds=0.3)
+    started = time.perf_counter()
+    warm = vrp_solver.solve_cvrp(warm_problem)
+    assert warm["warm_started"] is True and time.perf_counter() - started < 5 # The warm start's own time limit applies
+    assert warm["objective"] <= cold["objective"] # Search never ends worse than where it started
+
+
+def test_map_plan_to_nodes_follows_vehicles_and_todays_bins(monkeypatch):
+    monkeypatch.setattr(settings, 'ROUTING_WARM_START_MIN_OVERLAP', 0.5)
+    locations = [{"bin_id": "DEPOT_01"}] + [{"bin_id": f"B{i}"} for i in range(1, 5)]
+    plan = {"vehicle_ids": ["T1", "T2", "T9"], "routes": [["B2", "B1"], ["B3", "B-gone"], ["B4"]]}
+
+    assert routing_service.map_plan_to_nodes(plan, ["T2", "T1"], locations) == [[3], [2, 1]]
+    monkeypatch.setattr(settings, 'ROUTING_WARM_START_MIN_OVERLAP', 0.9) # Only 3 of today's 4 bins are in the plan
+    assert routing_service.map_plan_to_nodes(plan, ["T2", "T1"], locations) is None
+
+
+def test_decomposed_solve_covers_every_stop_with_parallel_cluster_solves(solver_pool, monkeypatch):
+    from api.services import route_decomposition
+    monkeypatch.setattr(settings, 'ROUTING_SOLVER_WORKERS', 2)
+    monkeypatch.setattr(settings, 'ROUTING_CLUSTER_MAX_STOPS', 25)
+    monkeypatch.setattr(settings, 'ROUTING_CLUSTER_SECONDS_PER_STOP', 0.01)
+    monkeypatch.setattr(settings, 'ROUTING_CLUSTER_MIN_SECONDS', 0.2)
+    points = [(5.6037, -0.1870)] + [(5.56 + (i % 10) * 0.008, -0.23 + (i // 10) * 0.008) for i in range(100)]
+    demands = [0] + [1 + i % 3 for i in range(100)]
+
+    solved = []
+    run_solvers = routing_service.run_solvers
+    async def recording_run_solvers(problems, is_disconnected=None):
+        solved.append([len(problem["demands"]) - 1 for problem in problems])
+        return await run_solvers(problems, is_disconnected)
+    monkeypatch.setattr(routing_service, 'run_solvers', recording_run_solvers)
+
+    result = asyncio.run(routing_service.solve_decomposed(points, demands, [30] * 8, "haversine"))
+
+    assert result["status"] == "success"
+    assert sorted(node for route in result["routes"] for node in route) == list(range(1, 101))
+    assert all(sum(demands[node] for node in route) <= 30 for route in result["routes"])
+    assert all(size <= 25 for size in solved[0]) and len(solved[0]) > 1 # Small clusters, solved together
+    assert len(solved) == 3 # Clusters, then the two alternating sets of boundaries
+
+    matrix = routing_service.get_distance_provider("haversine").matrix(points, points).tolist()
+    assert result["objective"] == sum(route_decomposition.route_cost(matrix, route) for route in result["routes"])
+    assert routing_service._free_solver_slots # Slots given back
+
+
+def test_decomposed_solve_fetches_cluster_matrices_concurrently(fake_api, monkeypatch):
+    monkeypatch.setattr(settings, 'MAPS_API_KEY_GHANA', 'key')
+    monkeypatch.setattr(settings, 'DISTANCE_CACHE_PATH', '')
+    monkeypatch.setattr(settings, 'DISTANCE_MATRIX_CONCURRENCY', 3)
+    monkeypatch.setattr(settings, 'ROUTING_CLUSTER_MAX_STOPS', 9) # Each cluster matrix fits one request
+    monkeypatch.setattr(settings, 'ROUTING_BOUNDARY_REPAIR_ROUTES', 0)
+    fake_api.latency = 0.02
+    points = [(5.6037, -0.1870)] + [(5.56 + (i % 6) * 0.01, -0.23 + (i // 6) * 0.01) for i in range(36)]
+
+    async def no_stops_solved(problems, is_disconnected=None):
+        return [{"status": "success", "routes": [[] for _ in range(problem["num_vehicles"])], "objective": 0}
+                for problem in problems]
+    monkeypatch.setattr(routing_service, 'run_solvers', no_stops_solved)
+
+    result = asyncio.run(routing_service.solve_decomposed(points, [0] + [1] * 36, [9] * 4, "google"))
+
+    assert result["status"] == "success"
+    assert fake_api.requests == 4 # One per cluster
+    assert fake_api.max_in_flight == 3 # Together, within DISTANCE_MATRIX_CONCURRENCY
@@ -0,0 +1,161 @@
+import threading
+import time
+
+import pytest
+import mongomock
+from datetime import datetime, timedelta
+from unittest.mock import patch, MagicMock
+
+from api.services import training_job_service
+
+
+@pytest.fixture
+def jobs_collection(monkeypatch):
+    """A mongomock retrain_jobs collection with the service's indexes applied."""
+    db = mongomock.MongoClient().db
+    monkeypatch.setattr(training_job_service, 'get_collection', lambda name: db[name])
+    training_job_service.ensure_retrain_job_indexes()
+    return db[training_job_service.RETRAIN_JOBS_COLLECTION]
+
+
+@pytest.fixture
+def mock_executor(monkeypatch):
+    """Captures submitted jobs instead of starting a real process pool."""
+    executor = MagicMock()
+    monkeypatch.setattr(training_job_service, '_get_executor', lambda: executor)
+    return executor
+
+
+def test_submit_retrain_job_is_single_flight(jobs_collection, mock_executor):
+    """A second submit while a job is active attaches to it instead of starting another fit."""
+    job, created = training_job_service.submit_retrain_job(incremental=True)
+    assert created is True
+    assert job["status"] == "pending"
+    assert "_id" not in job and "active_slot" not in job
+
+    second_job, second_created = training_job_service.submit_retrain_job(incremental=False)
+    assert second_created is False
+    assert second_job["job_id"] == job["job_id"]
+    mock_executor.submit.assert_called_once_with(training_job_service.run_training_job, job["job_id"], True)
+    assert jobs_collection.count_documents({}) == 1
+
+
+def test_run_training_job_persists_status_and_releases_slot(jobs_collection, mock_executor):
+    job, _ = training_job_service.submit_retrain_job(incremental=True)
+
+    with patch('api.services.prediction_service.train_waste_prediction_model', return_value=True) as mock_train:
+        training_job_service.run_training_job(job["job_id"], True)
+    mock_train.assert_called_once_with(incremental=True)
+
+    status = training_job_service.get_retrain_job(job["job_id"])
+    assert status["status"] == "completed"
+    assert "finished_at" in status
+
+    # The slot is free again, so a new submit starts a new job
+    new_job, created = training_job_service.submit_retrain_job()
+    assert created is True
+    assert new_job["job_id"] != job["job_id"]
+
+
+def test_run_training_job_records_failure(jobs_collection, mock_executor):
+    job, _ = training_job_service.submit_retrain_job()
+    with patch('api.services.prediction_service.train_waste_prediction_model', side_effect=RuntimeError("boom")):
+        training_job_service.run_training_job(job["job_id"], True)
+
+    status = training_job_service.get_retrain_job(job["job_id"])
+    assert status["status"] == "failed"
+    assert status["error_message"] == "boom"
+
+
+def test_stale_active_job_does_not_block_new_jobs(jobs_collection, mock_executor, monkeypatch):
+    jobs_collection.insert_one({
+        "job_id": "stale", "active_slot": training_job_service.ACTIVE_SLOT, "status": "running",
+        "submit_time": datetime.utcnow() - timedelta(days=2), "heartbeat_at": datetime.utcnow() - timedelta(hours=1),
+    })
+    worker = MagicMock()
+    old_executor = MagicMock(_processes={1234: worker})
+    monkeypatch.setattr(training_job_service, '_executor', old_executor)
+
+    job, created = training_job_service.submit_retrain_job()
+    assert created is True
+    assert training_job_service.get_retrain_job("stale")["status"] == "failed"
+    # The stale job's training process is stopped, so it can't overwrite the next model
+    old_executor.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+    worker.terminate.assert_called_once_with()
+    assert training_job_service._executor is None
+
+
+def test_long_running_job_with_recent_heartbeat_still_blocks_new_jobs(jobs_collection, mock_executor):
+    jobs_collection.insert_one({
+        "job_id": "long", "active_slot": training_job_service.ACTIVE_SLOT, "status": "running",
+        "submit_time": datetime.utcnow() - timedelta(days=2), "heartbeat_at": datetime.utcnow(),
+    })
+    job, created = training_job_service.submit_retrain_job()
+    assert created is False
+    assert job["job_id"] == "long" and job["status"] == "running"
+
+
+def test_heartbeats_stop_once_the_job_is_released(jobs_collection, mock_executor, monkeypatch):
+    from api.config import settings
+    monkeypatch.setattr(settings, 'RETRAIN_JOB_HEARTBEAT_SECONDS', 0.01)
+    job, _ = training_job_service.submit_retrain_job()
+    submitted_heartbeat = jobs_collection.find_one({"job_id": job["job_id"]})["heartbeat_at"]
+
+    stop = threading.Event()
+    heartbeats = threading.Thread(target=training_job_service._send_heartbeats, args=(job["job_id"], stop))
+    heartbeats.start()
+    try:
+        deadline = time.monotonic() + 5
+        while jobs_collection.find_one({"job_id": job["job_id"]})["heartbeat_at"] == submitted_heartbeat:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        training_job_service._finish_job(job["job_id"], "failed", "Released.", "timeout")
+        heartbeats.join(timeout=5)
+        assert not heartbeats.is_alive() # Not a pool worker here, so it returns instead of exiting
+    finally:
+        stop.set()
+
+
+def test_get_retrain_job_unknown(jobs_collection):
+    assert training_job_service.get_retrain_job("missing") is None
+
+
+def test_retrain_endpoint_refits_fully_unless_incremental_is_requested(jobs_collection, mock_executor, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from api.config import settings
+    from api.routers import prediction_router
+
+    monkeypatch.setattr(settings, 'RETRAIN_API_KEY', 'secret')
+    app = FastAPI()
+    app.include_router(prediction_router.router)
+    client = TestClient(app)
+
+    response = client.post("/predict/retrain", headers={"X-Retrain-Key": "secret"})
+    assert response.status_code == 202
+    full_job_id = response.json()["job_id"]
+    assert training_job_service.get_retrain_job(full_job_id)["mode"] == "full"
+    mock_executor.submit.assert_called_with(training_job_service.run_training_job, full_job_id, False)
+    training_job_service._finish_job(full_job_id, "completed", "done")
+
+    response = client.post("/predict/retrain", params={"incremental": "true"}, headers={"X-Retrain-Key": "secret"})
+    incremental_job_id = response.json()["job_id"]
+    assert training_job_service.get_retrain_job(incremental_job_id)["mode"] == "incremental"
+    mock_executor.submit.assert_called_with(training_job_service.run_training_job, incremental_job_id, True)
+
+
+def test_submit_attaches_when_the_slot_changes_hands_during_the_retry(monkeypatch, mock_executor):
+    """Slot freed between our insert and lookup, then taken by a third request before our retry."""
+    from pymongo.errors import DuplicateKeyError
+    collection = MagicMock()
+    collection.insert_one.side_effect = DuplicateKeyError("active_slot")
+    third_job = {"_id": "x", "job_id": "third", "active_slot": training_job_service.ACTIVE_SLOT, "status": "pending"}
+    collection.find_one.side_effect = [None, third_job]
+    monkeypatch.setattr(training_job_service, 'get_collection', lambda name: collection)
+    monkeypatch.setattr(training_job_service, '_release_stale_job', lambda: None)
+
+    job, created = training_job_service.submit_retrain_job()
+
+    assert created is False and job["job_id"] == "third"
+    assert collection.insert_one.call_count == 2
+    mock_executor.submit.assert_not_called()
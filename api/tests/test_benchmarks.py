@@ -0,0 +1,69 @@
+import pytest
+
+from api.benchmarks import bench_prediction_service as bench
+from api.services import prediction_service
+
+
+def test_synthetic_collection_honours_projection_and_watermark():
+    collection = bench.SyntheticReadingsCollection(n_rows=2000, n_bins=10)
+    docs = list(collection.find({}, prediction_service.TRAINING_DATA_PROJECTION))
+    assert len(docs) == 2000
+    assert set(docs[0]) == {"reading_timestamp", "fill_level_percent"}
+
+    watermark = docs[999]["reading_timestamp"]
+    newer = list(collection.find({"reading_timestamp": {"$gt": watermark}}, prediction_service.TRAINING_DATA_PROJECTION))
+    assert newer and all(doc["reading_timestamp"] > watermark for doc in newer)
+
+
+def test_run_single_size_smoke(monkeypatch):
+    """Runs the whole measurement pipeline on a tiny dataset (keeps the suite from rotting)."""
+    # Let monkeypatch restore the globals the benchmark overrides
+    for name in ("get_collection", "MODEL_DIR", "MODEL_PATH"):
+        monkeypatch.setattr(prediction_service, name, getattr(prediction_service, name))
+    monkeypatch.setattr(prediction_service, "prediction_memo", prediction_service.PredictionMemo())
+    monkeypatch.setattr(prediction_service, "model_cache", prediction_service.ModelCache())
+    monkeypatch.setattr(prediction_service, "compiled_model_cache", prediction_service.CompiledModelCache())
+
+    result = bench.run_single_size(2000, latency_iterations=5, batch_size=50)
+    assert result["rows"] == 2000
+    assert result["train_seconds"] > 0
+    assert result["batch_predictions_per_second"] > 0
+    assert set(result["single_prediction"]) == {"p50_ms", "p95_ms", "mean_ms"}
+
+
+def test_compare_reports_relative_change():
+    def report(train_seconds):
+        return {"results": [{
+            "rows": 10, "train_seconds": train_seconds, "peak_rss_mb": 100.0,
+            "single_prediction": {"p50_ms": 1.0}, "batch_predictions_per_second": 1000.0,
+        }]}
+    lines = bench.compare(report(1.5), report(2.0))
+    assert any("train_seconds" in line and "-25.0%" in line for line in lines)
+
+
+def test_trusted_reads_smoke():
+    from api.benchmarks import bench_trusted_reads
+
+    result = bench_trusted_reads.run(200, repeat=1)
+    assert set(result["reads_us_per_document"]) == {"validated_model_us", "model_construct_us", "trusted_record_us"}
+    assert result["read_speedup"] > 0 and result["response_speedup"] > 0
+
+
+def test_model_json_response_matches_fastapi_encoding():
+    import json
+    from fastapi.encoders import jsonable_encoder
+    from api.benchmarks.bench_trusted_reads import synthetic_optimization_response
+    from api.responses import ModelJSONResponse
+
+    response = synthetic_optimization_response(50)
+    assert json.loads(ModelJSONResponse(response).body) == jsonable_encoder(response)
+    assert json.loads(ModelJSONResponse({"status": "ok"}).body) == {"status": "ok"}
+
+
+def test_routing_transit_smoke():
+    pytest.importorskip("ortools")
+    from api.benchmarks import bench_routing_transit
+
+    result = bench_routing_transit.run(30, seconds=0.5)
+    for variant in ("python_callbacks", "registered_matrix"):
+        assert result[variant]["objective"] is not None and result[variant]["solutions_per_second"] > 0
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+# Cold-start guard: importing the FastAPI app must not pull in the heavy ML/routing stack,
+# and its measured `python -X importtime` cost must stay within budget.
+HEAVY_MODULES = ("numpy", "pandas", "sklearn", "scipy", "joblib", "ortools", "httpx")
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _import_api_index():
+    """Imports api.index in a fresh interpreter with -X importtime; returns (stdout, stderr)."""
+    code = "import sys, api.index; print('loaded:' + ','.join(sorted(m for m in sys.modules if m.split('.')[0] in %r)))" % (HEAVY_MODULES,)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    return result.stdout, result.stderr
+
+
+def _cumulative_import_us(importtime_output: str, module: str) -> int:
+    """Extracts the cumulative import time (microseconds) of `module` from -X importtime output."""
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = [part.strip() for part in line[len("import time:"):].split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise AssertionError(f"{module} not found in importtime output")
+
+
+def test_api_index_import_is_light():
+    stdout, stderr = _import_api_index()
+    # config may print warnings to stdout, so pick out our own line
+    loaded_line = next(line for line in stdout.splitlines() if line.startswith("loaded:"))
+    loaded_heavy_modules = [name for name in loaded_line[len("loaded:"):].split(",") if name]
+    assert loaded_heavy_modules == [], f"Heavy modules imported eagerly by api.index: {loaded_heavy_modules}"
+
+    import_ms = _cumulative_import_us(stderr, "api.index") / 1000
+    print(f"api.index cumulative import time: {import_ms:.1f} ms (budget {IMPORT_TIME_BUDGET_MS:.0f} ms)")
+    assert import_ms <= IMPORT_TIME_BUDGET_MS
@@ -1,18 +1,12 @@
 import json
-import math
+import os
 import sys
 from ortools.constraint_solver import routing_enums_pb2
 from ortools.constraint_solver import pywrapcp
 
-def haversine_distance(lat1, lon1, lat2, lon2):
-    R = 6371
-    lat1_rad, lon1_rad = math.radians(lat1), math.radians(lon1)
-    lat2_rad, lon2_rad = math.radians(lat2), math.radians(lon2)
-    dlon = lon2_rad - lon1_rad
-    dlat = lat2_rad - lat1_rad
-    a = math.sin(dlat / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
+# Distance providers are shared with the API (api/services/distance_providers.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.services.distance_providers import create_local_provider
 
 def create_data_model(pickups, num_vehicles, vehicle_capacities, depot_lat_lon):
     data = {}
@@ -25,38 +19,22 @@ def create_data_model(pickups, num_vehicles, vehicle_capacities, depot_lat_lon):
     data['pickups_info'] = [None] + pickups
     return data
 
-def create_distance_matrix(locations):
-    distance_matrix = [[0] * len(locations) for _ in range(len(locations))]
-    for from_node in range(len(locations)):
-        for to_node in range(len(locations)):
-            if from_node == to_node:
-                continue
-            dist = haversine_distance(
-                locations[from_node][0], locations[from_node][1],
-                locations[to_node][0], locations[to_node][1]
-            )
-            distance_matrix[from_node][to_node] = int(dist * 1000)
-    return distance_matrix
-
-def solve_cvrp(data):
+def create_distance_matrix(locations, provider=None):
+    # Haversine (straight-line) meters unless another provider (e.g. a road graph) is given
+    provider = provider or create_local_provider("haversine")
+    return provider.matrix(locations, locations).tolist()
+
+def solve_cvrp(data, provider=None):
     manager = pywrapcp.RoutingIndexManager(len(data['locations']),
                                        data['num_vehicles'], data['depot'])
     routing = pywrapcp.RoutingModel(manager)
 
-    distance_matrix = create_distance_matrix(data['locations'])
-    def distance_callback(from_index, to_index):
-        from_node = manager.IndexToNode(from_index)
-        to_node = manager.IndexToNode(to_index)
-        return distance_matrix[from_node][to_node]
-
-    transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+    distance_matrix = create_distance_matrix(data['locations'], provider)
+    # Registered as a matrix/vector (not Python callbacks) so OR-Tools evaluates them natively during the search
+    transit_callback_index = routing.RegisterTransitMatrix(distance_matrix)
     routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
-    def demand_callback(from_index):
-        from_node = manager.IndexToNode(from_index)
-        return data['demands'][from_node]
-
-    demand_callback_index = routing.RegisterUnaryTransitCallback(demand_callback)
+    demand_callback_index = routing.RegisterUnaryTransitVector(data['demands'])
     routing.AddDimensionWithVehicleCapacity(
         demand_callback_index,
         0,
@@ -108,6 +86,9 @@ if __name__ == "__main__":
         vehicle_capacity = input_data.get('vehicle_capacity_kg', 2000)
         vehicle_capacities = [vehicle_capacity] * num_vehicles
         depot_lat_lon = tuple(input_data['depot_location'])
+        # "haversine" (default) or "road_graph" (with road_graph_path: GeoJSON street extract or .npz)
+        provider = create_local_provider(input_data.get('distance_provider', 'haversine'),
+                                         road_graph_path=input_data.get('road_graph_path'))
 
         if not pickups:
             print(json.dumps({"routes": [], "status": "success_no_pickups"}))
@@ -128,7 +109,7 @@ if __name__ == "__main__":
              sys.exit(0)
 
 
-        routes = solve_cvrp(data_model)
+        routes = solve_cvrp(data_model, provider)
         print(json.dumps({"routes": routes, "status": "success"}))
 
     except Exception as e:
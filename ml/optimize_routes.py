@@ -1,33 +1,21 @@
 import pandas as pd
 import numpy as np
 from sklearn.metrics.pairwise import haversine_distances # Corrected import
+import os
 import sys
 import json
 
-def haversine_distance(lat1, lon1, lat2, lon2):
-    """
-    Calculate the great circle distance in kilometers between two points
-    on the earth (specified in decimal degrees).
-    """
-    # Convert decimal degrees to radians
-    lat1_rad = np.radians(lat1)
-    lon1_rad = np.radians(lon1)
-    lat2_rad = np.radians(lat2)
-    lon2_rad = np.radians(lon2)
-
-    # Haversine formula
-    dlon = lon2_rad - lon1_rad
-    dlat = lat2_rad - lat1_rad
-    a = np.sin(dlat / 2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2)**2
-    c = 2 * np.arcsin(np.sqrt(a))
-    r = 6371  # Radius of Earth in kilometers.
-    return c * r
-
-def create_routes_for_area(pickup_df, depot_location, truck_capacity_kg, max_stops_per_route=10):
+# Distance providers are shared with the API (api/services/distance_providers.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.services.distance_providers import create_local_provider
+
+def create_routes_for_area(pickup_df, depot_location, truck_capacity_kg, max_stops_per_route=10, distance_provider=None):
     """
     Creates optimized routes for a given area using a greedy nearest neighbor approach.
     Expects pickup_df to have 'latitude', 'longitude', 'approxGarbageWeight', 'requestId'.
+    Distances come from `distance_provider` (default: haversine).
     """
+    distance_provider = distance_provider or create_local_provider("haversine")
     if not isinstance(pickup_df, pd.DataFrame):
         # This check is important if the input might not be a DataFrame
         raise ValueError("Input pickup_data must be a pandas DataFrame.")
@@ -64,14 +52,10 @@ def create_routes_for_area(pickup_df, depot_location, truck_capacity_kg, max_sto
             if remaining_pickups.empty:
                 break
 
-            # Calculate distances from current_location to all remaining_pickups
-            # haversine_distances expects input in radians for its own calculation,
-            # but our helper takes degrees. We need to apply our helper row-wise.
-
-            distances = remaining_pickups.apply(
-                lambda row: haversine_distance(current_location[0], current_location[1],
-                                               row['latitude'], row['longitude']),
-                axis=1
+            # Distances from current_location to all remaining_pickups, in one vectorized call
+            distances = pd.Series(
+                distance_provider.matrix([current_location], remaining_pickups[['latitude', 'longitude']].to_numpy())[0],
+                index=remaining_pickups.index
             )
 
             if distances.empty: # Should not happen if remaining_pickups is not empty
@@ -147,6 +131,9 @@ if __name__ == '__main__':
         depot_location_list = input_data.get('depot_location')
         truck_capacity_kg = input_data.get('truck_capacity_kg')
         max_stops = input_data.get('max_stops_per_route', 10) # Default if not provided
+        # "haversine" (default) or "road_graph" (with road_graph_path: GeoJSON street extract or .npz)
+        distance_provider = create_local_provider(input_data.get('distance_provider', 'haversine'),
+                                                  road_graph_path=input_data.get('road_graph_path'))
 
         # Validate presence of required parameters
         missing_params = []
@@ -195,7 +182,8 @@ if __name__ == '__main__':
             pickup_df,
             depot_location,
             truck_capacity_kg,
-            max_stops_per_route=max_stops
+            max_stops_per_route=max_stops,
+            distance_provider=distance_provider
         )
         # Output success as JSON to stdout
         print(json.dumps({"routes": generated_routes, "status": "success"}))